@@ -3,12 +3,14 @@ from pathlib import Path
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 
 from app.core.config import settings
 from app.core.text_types import TextType
 from app.db.schemas.user import UserBase
 from app.services.directories.models import FilesAndDirsOut
+from app.services.directories.path_index import get_directory_index
 from app.services.directories import utils
 from app.services.auth.utils import get_current_user
 from app.services.directories.remover import Remover
@@ -40,130 +42,43 @@ async def search_path_tree(
         dict: Object containing matching directories with their parent trees
     """
 
-    def search_directories(root_dir: Path, search_name: str, exact: bool = False) -> list[Path]:
-        """
-        Recursively search for directories matching the search criteria.
-
-        Args:
-            root_dir: Root directory to start searching from
-            search_name: Directory name to search for
-            exact: Whether to use exact matching or partial matching
-
-        Returns:
-            List of Path objects that match the search criteria
-        """
-        matching_dirs = []
-
-        def recursive_search(current_path: Path):
-            """Recursively traverse directories to find matches."""
-            try:
-                for item in current_path.iterdir():
-                    if item.is_dir():
-                        # Skip TextType directories at root level
-                        if (current_path == root_dir and
-                            item.name in {text_type.value for text_type in TextType}):
-                            recursive_search(item)
-                            continue
-
-                        # Check if current directory matches search criteria
-                        if exact:
-                            if item.name == search_name:
-                                matching_dirs.append(item)
-                        else:
-                            if search_name.lower() in item.name.lower():
-                                matching_dirs.append(item)
-
-                        # Continue searching in subdirectories
-                        recursive_search(item)
-
-            except (PermissionError, OSError) as e:
-                # Skip directories that can't be accessed
-                print(f"Warning: Cannot access {current_path}: {e}")
-
-        recursive_search(root_dir)
-        return matching_dirs
-
-    def get_parent_tree(target_path: Path) -> list[str]:
+    def get_parent_tree(relative_path: Path) -> list[str]:
         """
         Get all parent directories for a given path.
 
         Args:
-            target_path: The target directory path
+            relative_path: The target directory path relative to WORK_DIR
 
         Returns:
             List of parent directory paths from root to immediate parent
         """
         parents = []
-        try:
-            relative_path = target_path.relative_to(settings.WORK_DIR)
-
-            # Get all parent directories
-            current_parent = relative_path.parent
-            while str(current_parent) != ".":
-                parents.append(f"{current_parent}/")
-                current_parent = current_parent.parent
-
-            # Reverse to show from root to immediate parent
-            parents.reverse()
-
-        except ValueError:
-            # Path is not relative to WORK_DIR
-            pass
+        current_parent = relative_path.parent
+        while str(current_parent) != ".":
+            parents.append(f"{current_parent}/")
+            current_parent = current_parent.parent
 
+        # Reverse to show from root to immediate parent
+        parents.reverse()
         return parents
 
-    def get_directory_info(dir_path: Path) -> dict:
-        """
-        Get detailed information about a directory.
-
-        Args:
-            dir_path: Directory path to analyze
-
-        Returns:
-            Dictionary with directory information
-        """
-        try:
-            relative_path = str(dir_path.relative_to(settings.WORK_DIR))
-            parent_tree = get_parent_tree(dir_path)
-
-            # Count immediate children
-            child_dirs = 0
-            child_files = 0
-
-            try:
-                for item in dir_path.iterdir():
-                    if item.is_dir():
-                        if item.name not in {text_type.value for text_type in TextType}:
-                            child_dirs += 1
-                    elif item.is_file():
-                        child_files += 1
-            except (PermissionError, OSError):
-                pass
-
-            return {
+    # Matches and child counts come from the directory index, which is only built by the
+    # first search after a commit, pull or checkout.
+    index = await run_in_threadpool(get_directory_index)
+    all_matches = []
+    for relative_path in index.search(search_path, exact_match):
+        entry = index.entries[relative_path]
+        all_matches.append(
+            {
                 "path": f"{relative_path}/",
-                "name": dir_path.name,
-                "parent_tree": parent_tree,
+                "name": entry.name,
+                "parent_tree": get_parent_tree(Path(relative_path)),
                 "depth": len(relative_path.split("/")),
-                "child_directories": child_dirs,
-                "child_files": child_files,
-                "total_children": child_dirs + child_files
+                "child_directories": entry.child_directories,
+                "child_files": entry.child_files,
+                "total_children": entry.child_directories + entry.child_files,
             }
-
-        except ValueError:
-            return None
-
-    # Perform the search
-    all_matches = []
-
-    # Search in the entire work directory
-    matching_paths = search_directories(settings.WORK_DIR, search_path, exact_match)
-
-    # Process each match
-    for match_path in matching_paths:
-        dir_info = get_directory_info(match_path)
-        if dir_info:
-            all_matches.append(dir_info)
+        )
 
     # Sort matches by depth and then by path
     all_matches.sort(key=lambda x: (x["depth"], x["path"]))
@@ -202,32 +117,17 @@ async def get_root_content(user: Annotated[UserBase, Depends(get_current_user)])
 async def get_dir_content(
     user: Annotated[UserBase, Depends(get_current_user)], target_path: Path = Depends(utils.validate_dir_path)
 ):
-    from app.db.database import get_sess
-    from app.db.models.translation_progress import TranslationProgress
-
     base = str(target_path.relative_to(settings.WORK_DIR)) + "/"
     directories = []
     files = []
     files_with_progress = []
+    pending_paths = []
 
     is_translation_dir = base.startswith("translation/")
 
-    progress_cache = {}
-    if is_translation_dir:
-        with get_sess() as db:
-            # Query all progress records for files in this directory
-            like_pattern = base + "%"
-            cached_records = db.query(TranslationProgress).filter(
-                TranslationProgress.file_path.like(like_pattern)
-            ).all()
-            for record in cached_records:
-                file_name = Path(record.file_path).name
-                progress_cache[file_name] = {
-                    "name": file_name,
-                    "progress": record.progress,
-                    "total_keys": record.total_keys,
-                    "translated_keys": record.translated_keys,
-                }
+    # Progress is never computed here: files without a stored value are reported as pending
+    # and computed by one background job for the whole directory.
+    progress_cache = await run_in_threadpool(utils.get_stored_progress, base) if is_translation_dir else {}
 
     for p in target_path.iterdir():
         if p.is_dir() and p.name not in {item.value for item in TextType}:
@@ -242,13 +142,11 @@ async def get_dir_content(
                 if file_name in progress_cache:
                     files_with_progress.append(progress_cache[file_name])
                 else:
-                    progress_info = utils.calculate_file_progress(p)
-                    files_with_progress.append(progress_info)
-                    if progress_info["progress"] is not None and progress_info["progress"] >= 0:
-                        from app.tasks import update_file_translation_progress
-                        update_file_translation_progress.delay(
-                            str(p.relative_to(settings.WORK_DIR))
-                        )
+                    files_with_progress.append({"name": file_name, "pending": True})
+                    pending_paths.append(file_path)
+
+    if pending_paths:
+        await utils.schedule_progress_update(base, pending_paths)
 
     directories.sort(key=lambda s: [int(c) if c.isdigit() else c for c in re.split('(\d+)', s)])
     files.sort(key=lambda s: [int(c) if c.isdigit() else c for c in re.split('(\d+)', s)])
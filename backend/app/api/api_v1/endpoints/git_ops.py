@@ -2,7 +2,6 @@ import hashlib
 import hmac
 import json
 import logging
-import subprocess
 import urllib.parse
 from pathlib import Path
 from typing import Annotated
@@ -12,28 +11,23 @@ from app.db.models.user import Role
 from app.db.schemas.user import UserBase
 from app.services.auth import utils
 from app.services.auth.schema import TokenData
+from app.services.git.commit_scheduler import schedule_commit
 from app.services.git.manager import GitManager
+from app.services.git.status import get_worktree_status
 from app.services.users import permissions
 from app.services.users.utils import get_user
-from app.tasks import commit, pull, push
+from app.tasks import pull, push
 from search.utils import get_json_data, muid_from_relative_path
 from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
-from pygit2 import (
-    GitError,
-    Repository,
-    GIT_STATUS_INDEX_NEW,
-    GIT_STATUS_INDEX_MODIFIED,
-    GIT_STATUS_INDEX_DELETED,
-    GIT_STATUS_WT_MODIFIED,
-    GIT_STATUS_WT_NEW,
-    GIT_STATUS_WT_DELETED,
-)
+from fastapi.concurrency import run_in_threadpool
+from pygit2 import GitError, GIT_STATUS_INDEX_NEW, GIT_STATUS_WT_NEW
 from pydantic import BaseModel, ValidationError
 from app.services.git.utils import (
     ensure_safe_directory,
     FileStatus,
     GitStatusResponse,
     FileDiffResponse,
+    SegmentDiffResponse,
     get_status_name
 )
 
@@ -131,19 +125,6 @@ def _is_meaningful_untracked_file(repo_path: Path, file_path: str) -> bool:
     return _has_meaningful_json_value(data)
 
 
-def _get_base_published_ref(repo_path: Path, repo: Repository | None = None) -> str:
-    """Return the base published reference to compare against ('origin/published', 'published', or 'HEAD')."""
-    if repo is not None:
-        try:
-            if "refs/remotes/origin/published" in repo.references:
-                return "origin/published"
-            if "refs/heads/published" in repo.references:
-                return "published"
-        except Exception:
-            pass
-    return "origin/published" if (repo_path / ".git" / "refs" / "remotes" / "origin" / "published").exists() else "HEAD"
-
-
 @router.get(
     "/status",
     response_model=GitStatusResponse,
@@ -171,62 +152,10 @@ async def get_git_status(
         projects = get_json_data(settings.WORK_DIR / "_project-v2.json")
 
     try:
-        repo = Repository(str(repo_path))
-        file_status_map: dict[str, tuple[str, int]] = {}
-        base_ref = _get_base_published_ref(repo_path, repo)
-
-        # 1. Check branch differences against base published ref
-        if base_ref != "HEAD":
-            try:
-                diff_res = subprocess.run(
-                    ["git", "diff", "--name-status", base_ref],
-                    cwd=repo_path,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    check=False,
-                )
-            except subprocess.TimeoutExpired:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="Git branch diff timed out",
-                )
-            if diff_res.returncode != 0:
-                logger.error(
-                    "git diff --name-status %s failed in %s: %s",
-                    base_ref,
-                    repo_path,
-                    diff_res.stderr[:500],
-                )
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Failed to compare against published branch: {diff_res.stderr[:200]}",
-                )
-            if diff_res.returncode == 0:
-                status_code_map = {
-                    "M": ("modified", GIT_STATUS_WT_MODIFIED),
-                    "A": ("staged_new", GIT_STATUS_INDEX_NEW),
-                    "D": ("deleted", GIT_STATUS_WT_DELETED),
-                }
-                for line in diff_res.stdout.strip().splitlines():
-                    if not line:
-                        continue
-                    parts = line.split(maxsplit=1)
-                    code = parts[0][0]
-                    filepath = parts[1].split("\t")[-1].strip()
-                    status_name, status_code = status_code_map.get(code, ("modified", GIT_STATUS_WT_MODIFIED))
-                    file_status_map[filepath] = (status_name, status_code)
-
-        # 2. Check local working tree status (for uncommitted or newly created files)
-        status_dict = repo.status(untracked_files="all")
-        for filepath, status_code in status_dict.items():
-            if status_code == 0:
-                continue
-            status_name = get_status_name(status_code)
-            file_status_map[filepath] = (status_name, status_code)
+        status_by_path: dict[str, int] = await run_in_threadpool(get_worktree_status().status)
 
         files = []
-        for filepath, (status_name, status_code) in file_status_map.items():
+        for filepath, status_code in status_by_path.items():
             if not fileFilter(Path(filepath)):
                 continue
             if not show_other_users:
@@ -245,7 +174,7 @@ async def get_git_status(
                 continue
             files.append(FileStatus(
                 path=filepath,
-                status=status_name,
+                status=get_status_name(status_code),
                 status_code=status_code
             ))
 
@@ -288,9 +217,6 @@ async def get_file_diff(
     """Get the diff of the specified file relative to the published base branch.
 
     Non-admin users can only view diffs of files in their own namespace.
-
-    Performance optimized: uses git command instead of pygit2
-    diff iteration.
     """
     current_user: UserBase = get_user(int(token_data.github_id))
     is_admin = current_user.role in [Role.ADMIN.value, Role.SUPERUSER.value]
@@ -305,137 +231,20 @@ async def get_file_diff(
         )
 
     try:
-        repo = None
-        try:
-            repo = Repository(str(repo_path))
-        except Exception:
-            pass
-        base_ref = _get_base_published_ref(repo_path, repo)
-        ref_to_use = base_ref if base_ref != "HEAD" else "HEAD"
-
-        # Quick check file status using git command (faster than pygit2)
-        try:
-            result = subprocess.run(
-                ["git", "status", "--porcelain", "--", file_path],
-                cwd=repo_path,
-                capture_output=True,
-                text=True,
-                timeout=5,
-                check=False
-            )
-        except subprocess.TimeoutExpired:
+        worktree_status = get_worktree_status()
+        status_code = await run_in_threadpool(worktree_status.file_status, file_path)
+        if not status_code:
             raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail=f"Status check timed out for: {file_path}"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File has no changes: {file_path}"
             )
-
-        # Keep leading spaces because porcelain status uses them as signal.
-        status_output = result.stdout.rstrip()
-
-        # Parse status code (first 2 characters)
-        status_code = (
-            status_output[:2] if len(status_output) >= 2 else "  "
-        )
-
-        # Map git status to our status names
-        status_map = {
-            ' M': 'modified',
-            'M ': 'staged_modified',
-            'MM': 'modified',
-            '??': 'untracked',
-            ' D': 'deleted',
-            'D ': 'staged_deleted',
-            'A ': 'staged_new',
-            'AM': 'staged_modified',
-        }
-        status_name = status_map.get(status_code, 'modified')
-
-        # When working tree is clean, infer status from branch diff
-        if not status_output:
-            try:
-                branch_diff = subprocess.run(
-                    ["git", "diff", "--name-status", ref_to_use, "--", file_path],
-                    cwd=repo_path,
-                    capture_output=True,
-                    text=True,
-                    timeout=5,
-                    check=False,
-                )
-                if branch_diff.returncode == 0 and branch_diff.stdout.strip():
-                    branch_code = branch_diff.stdout.strip().split()[0][0]
-                    branch_status_map = {
-                        'A': 'staged_new',
-                        'M': 'modified',
-                        'D': 'deleted',
-                    }
-                    status_name = branch_status_map.get(branch_code, 'modified')
-            except subprocess.TimeoutExpired:
-                pass
-
-        # Get diff using git command (5-10x faster than pygit2 iteration)
-        diff_text = ""
-
-        try:
-            if '?' in status_code:
-                # New untracked file: show full content as diff
-                result = subprocess.run(
-                    ["git", "diff", "--no-index", "--", "/dev/null", file_path],
-                    cwd=repo_path,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    check=False
-                )
-                diff_text = result.stdout
-            elif 'D' in status_code:
-                # Deleted file: show what was removed
-                result = subprocess.run(
-                    ["git", "diff", ref_to_use, "--", file_path],
-                    cwd=repo_path,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    check=False
-                )
-                diff_text = result.stdout
-            else:
-                # Modified or committed file: show changes relative to base_ref / HEAD
-                result = subprocess.run(
-                    ["git", "diff", ref_to_use, "--", file_path],
-                    cwd=repo_path,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    check=False
-                )
-                diff_text = result.stdout
-
-                if not status_output and not diff_text:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"File has no changes: {file_path}"
-                    )
-
-        except subprocess.TimeoutExpired:
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail=f"Diff generation timed out for: {file_path}"
-            )
-
         # Limit diff size to prevent frontend freezing on huge files
-        max_lines = 5000
-        lines = diff_text.split('\n')
-        if len(lines) > max_lines:
-            truncated_count = len(lines) - max_lines
-            diff_text = (
-                '\n'.join(lines[:max_lines]) +
-                f'\n\n... (truncated, {truncated_count} more lines)'
-            )
+        diff_text = await run_in_threadpool(worktree_status.diff, file_path, max_lines=5000)
 
         return FileDiffResponse(
             path=file_path,
             diff=diff_text,
-            status=status_name
+            status=get_status_name(status_code)
         )
 
     except HTTPException:
@@ -447,6 +256,50 @@ async def get_file_diff(
         )
 
 
+@router.get(
+    "/segment-diff/{file_path:path}",
+    response_model=SegmentDiffResponse,
+    description="Get the segments of the specified JSON file that differ from published",
+    dependencies=[Depends(permissions.is_user_active)],
+)
+async def get_segment_diff(
+    file_path: str,
+    token_data: Annotated[TokenData, Depends(utils.get_current_user)],
+    inline: bool = False,
+) -> SegmentDiffResponse:
+    """Get only the changed, added and removed segments of a file, with word level changes if inline is set.
+
+    Non-admin users can only view diffs of files in their own namespace.
+    """
+    current_user: UserBase = get_user(int(token_data.github_id))
+    is_admin = current_user.role in [Role.ADMIN.value, Role.SUPERUSER.value]
+
+    file_path = _validate_file_path(file_path, settings.WORK_DIR)
+
+    if not is_admin and not _can_user_access_file(file_path, current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to view this file's diff",
+        )
+
+    worktree_status = get_worktree_status()
+    try:
+        status_code = await run_in_threadpool(worktree_status.file_status, file_path)
+        if not status_code:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File has no changes: {file_path}"
+            )
+        changes = await run_in_threadpool(worktree_status.segment_diff, file_path, inline)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not a segment file: {file_path}",
+        ) from e
+
+    return SegmentDiffResponse(path=file_path, status=get_status_name(status_code), changes=changes)
+
+
 @router.post("/sync", status_code=status.HTTP_201_CREATED, description="Pull data from GitHub")
 async def github_webhook(
     request: Request,
@@ -573,9 +426,9 @@ async def commit_files(
         )
 
     user_data = get_user(int(user.github_id))
-    result = commit.delay(user_data.model_dump(), request.file_paths, request.message, add=True)
+    task_id = schedule_commit(user_data.model_dump(), request.file_paths, request.message, add=True)
 
     return CommitResponse(
-        task_id=result.id,
+        task_id=task_id,
         detail=f"Commit task has been triggered for {len(request.file_paths)} file(s)"
     )
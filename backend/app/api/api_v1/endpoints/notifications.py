@@ -1,7 +1,7 @@
 import asyncio
 import json
 import subprocess
-import re
+import time
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
@@ -10,20 +10,24 @@ from pydantic_core import ValidationError
 from app.db.database import get_sess
 from app.core.config import settings
 from app.services.auth import utils as auth_utils
+from app.services.notifications.broadcaster import NotificationBroadcaster, publish_user_event
+from app.services.notifications.commit_index import CommitIds, get_commit_index
 from app.services.notifications.models import (
     GitCommitInfoOut,
     NotificationDonePayload,
     NotificationDoneOut,
     NotificationFeedOut,
+    SegmentChangesOut,
 )
 from app.db.models.notification import Notification, RemarkNotification
 from app.db.models.user_preference import UserPreference as UserPreferenceModel
 from app.db.schemas.user_preference import UserPreference, UserPreferenceUpdate
+from pygit2 import GitError
 
 
 router = APIRouter(prefix="/notifications")
 
-# '30 seconds balances server load with real-time updates and prevents Nginx 60s timeout'
+# Keepalive interval; 30 seconds stays well below the Nginx 60s timeout
 NOTIFICATION_STREAM_POLL_SECONDS = 30
 NOTIFICATION_STREAM_MAX_RUNTIME_SECONDS = 3600
 
@@ -54,41 +58,9 @@ def _get_selected_authors_and_days(user: str) -> tuple[list[str], int]:
 
 def _count_unread_git_updates(user: str) -> int:
     selected_authors, selected_days = _get_selected_authors_and_days(user)
-    done_commit_ids = set(get_all_commit_ids_in_db(user.github_id))
-
-    working_directory = settings.WORK_DIR
-    git_base_cmd = ["git", "-c", f"safe.directory={working_directory}"]
-    git_log_cmd = git_base_cmd + [
-        "log",
-        "--pretty=format:%h|%an <%ae>",
-        f"--since={selected_days} days ago",
-        "--no-merges",
-    ]
-
-    result = subprocess.run(
-        git_log_cmd,
-        cwd=working_directory,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-
-    if result.returncode != 0:
-        return 0
-
-    unread_count = 0
-    for raw_line in result.stdout.split("\n"):
-        if not raw_line.strip() or "|" not in raw_line:
-            continue
-
-        commit_id, author = raw_line.split("|", 1)
-        if commit_id in done_commit_ids:
-            continue
-
-        if any(selected_author in author for selected_author in selected_authors):
-            unread_count += 1
-
-    return unread_count
+    done_commit_ids = CommitIds(get_all_commit_ids_in_db(user.github_id))
+    commits = get_commit_index().get_commits(selected_days, selected_authors)
+    return sum(1 for entry in commits if entry not in done_commit_ids)
 
 
 def _count_unread_remark_notifications(github_id: int) -> int:
@@ -107,35 +79,37 @@ def get_unread_notification_count(user: str) -> int:
     )
 
 
+broadcaster = NotificationBroadcaster(get_unread_notification_count)
+
+
 @router.get("/stream")
 async def stream_notification_count(
     request: Request,
     user: str = Depends(auth_utils.get_current_user),
 ):
     async def event_generator():
-        previous_count = None
         loop = asyncio.get_running_loop()
         stream_deadline = (
             loop.time() + NOTIFICATION_STREAM_MAX_RUNTIME_SECONDS
         )
+        # Counts are pushed by the broadcaster when a commit, pull or notification write
+        # changes them; the stream itself only sends keepalives in between.
+        queue = await broadcaster.subscribe(user)
+        try:
+            while loop.time() < stream_deadline:
+                if await request.is_disconnected():
+                    break
 
-        while loop.time() < stream_deadline:
-            if await request.is_disconnected():
-                break
-
-            try:
-                current_count = get_unread_notification_count(user)
-                if previous_count is None or current_count != previous_count:
-                    payload = json.dumps({"unread_count": current_count})
-                    yield f"event: unread_count\ndata: {payload}\n\n"
-                    previous_count = current_count
-                else:
+                try:
+                    event, payload = await asyncio.wait_for(
+                        queue.get(), timeout=NOTIFICATION_STREAM_POLL_SECONDS
+                    )
+                except asyncio.TimeoutError:
                     yield ": keepalive\n\n"
-            except Exception as error:
-                payload = json.dumps({"error": str(error)})
-                yield f"event: stream_error\ndata: {payload}\n\n"
-
-            await asyncio.sleep(NOTIFICATION_STREAM_POLL_SECONDS)
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            broadcaster.unsubscribe(user, queue)
 
     return StreamingResponse(
         event_generator(),
@@ -156,6 +130,23 @@ def get_unread_git_updates(
     )
 
 
+@router.get("/git/{commit_id}/segments/{file_path:path}", response_model=SegmentChangesOut)
+def get_commit_segment_changes(
+    commit_id: str,
+    file_path: str,
+    inline: bool = False,
+    user: str = Depends(auth_utils.get_current_user),
+):
+    """Segments of a JSON file changed by a commit, instead of the line diff of the feed."""
+    try:
+        changes = get_commit_index().get_segment_changes(commit_id, file_path, inline)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Commit {commit_id} not found") from e
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return SegmentChangesOut(commit_id=commit_id, file_path=file_path, changes=changes)
+
+
 def get_unread_git_update_items(user: str, limit: int | None = None):
     return get_git_update_items(user, include_done=False, limit=limit)
 
@@ -166,169 +157,82 @@ def get_git_update_items(
     limit: int | None = None,
 ):
     recent_commits = []
-    working_directory = settings.WORK_DIR
-
-    # Get user preferences from database
-    with get_sess() as sess:
-        preference = (
-            sess.query(UserPreferenceModel)
-            .filter(UserPreferenceModel.github_id == user.github_id)
-            .first()
-        )
-
-        if preference:
-            selected_authors = get_notification_authors_or_default(
-                preference.notification_authors
-            )
-            selected_days = preference.notification_days or 360
-        else:
-            # Use default values
-            selected_authors = ["sujato"]
-            selected_days = 360
-
-    git_base_cmd = ["git", "-c", f"safe.directory={working_directory}"]
-    git_log_cmd = git_base_cmd + [
-        "log",
-        "--oneline",
-        "--abbrev-commit",
-        "--pretty=format:%h %s (%cr)",
-        f"--since={selected_days} days ago",
-        "--no-merges"
-    ]
-
+    selected_authors, selected_days = _get_selected_authors_and_days(user)
+    commit_index = get_commit_index()
     try:
-        git_log_cmd_process = subprocess.Popen(
-            git_log_cmd,
-            cwd=working_directory,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        git_log_output, error = git_log_cmd_process.communicate()
-    except subprocess.CalledProcessError as e:
-        print(f"Git error: {e.stderr}")
+        commits = commit_index.get_commits(selected_days, selected_authors)
+    except GitError as e:
+        print(f"Git error: {e}")
         return []
 
-    if git_log_cmd_process.returncode == 0:
-        all_done_commit_ids = set(get_all_commit_ids_in_db(user.github_id))
-        git_commits = git_log_output.decode('utf-8').split("\n")
-        for git_commit in git_commits:
-            if not git_commit.strip():
-                continue
-
-            commit_hash = git_commit.split(" ")[0]
-            git_show_name_only_cmd = git_base_cmd + [
-                "show", "--name-only", commit_hash
-            ]
-            git_show_cmd_process = subprocess.Popen(
-                git_show_name_only_cmd,
-                cwd=working_directory,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            git_show_output, error = git_show_cmd_process.communicate()
-
-            git_show_stdout = git_show_output.decode('utf-8')
-
-            if git_show_stdout.strip() == "":
-                continue
-
-            commit_match = re.search(r'commit (\w+)', git_show_stdout)
-            author_match = re.search(r'Author: (.+)', git_show_stdout)
-            date_match = re.search(r'Date:\s+(.+)', git_show_stdout)
-
-            commit = commit_match[1] if commit_match else None
-            author = author_match[1] if author_match else None
-            date = date_match[1] if date_match else None
-
-            # Skip if this line was a file path (not a real commit) — author will be None
-            if not author or not commit:
-                continue
+    all_done_commit_ids = CommitIds(get_all_commit_ids_in_db(user.github_id))
+    now = time.time()
+    for entry in commits:
+        commit = entry.short_id
+        is_done = entry in all_done_commit_ids
+        if not include_done and is_done:
+            continue
 
-            # Check if author is in selected authors list
-            author_match_found = any(
-                selected_author in author
-                for selected_author in selected_authors
-            )
-            if not author_match_found:
+        formatted_json_files = []
+        for file_path, change_detail in commit_index.get_changes(entry).items():
+            if not file_path.endswith(".json"):
                 continue
-
-            git_show_diff_cmd = git_base_cmd + ["show", commit_hash]
-            git_show_cmd_process = subprocess.Popen(
-                git_show_diff_cmd,
-                cwd=working_directory,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+            file_name = file_path.split("/")[-1]
+            file_type = ''
+            uid = file_name.split("_")[0]
+            muids = file_name.split("_")[1].split(".")[0].split('-')
+            author_id = ''
+            lang = ''
+            if len(muids) == 3:
+                author_id = muids[2]
+                lang = muids[1]
+                file_type = muids[0]
+
+            if not file_type:
+                file_type = file_name.split('_')[1].split('.')[0]
+
+            formatted_json_files.append(
+                {
+                    'file_name': file_name,
+                    'file_type': file_type,
+                    'uid': uid,
+                    'author': author_id,
+                    'lang': lang,
+                    'sc_url': build_suttacentral_url(
+                        uid,
+                        lang,
+                        author_id
+                    ),
+                    'change_detail': format_diff_as_html(
+                        change_detail,
+                        file_name,
+                    ),
+                }
             )
-            git_show_diff_output, error = git_show_cmd_process.communicate()
-            git_show_details = git_show_diff_output.decode("utf-8")
-            parsed_git_show_details = parse_git_show_details(git_show_details)
-
-            json_files = re.findall(r'[\w/.-]+\.json', git_show_stdout)
-
-            formatted_json_files = []
-            for json_file in json_files:
-                file_name = json_file.split("/")[-1]
-                file_type = ''
-                uid = file_name.split("_")[0]
-                muids = file_name.split("_")[1].split(".")[0].split('-')
-                author_id = ''
-                lang = ''
-                if len(muids) == 3:
-                    author_id = muids[2]
-                    lang = muids[1]
-                    file_type = muids[0]
-
-                if not file_type:
-                    file_type = file_name.split('_')[1].split('.')[0]
-
-                change_detail = get_change_detail(
-                    file_name, parsed_git_show_details
-                )
-
-                formatted_json_files.append(
-                    {
-                        'file_name': file_name,
-                        'file_type': file_type,
-                        'uid': uid,
-                        'author': author_id,
-                        'lang': lang,
-                        'sc_url': build_suttacentral_url(
-                            uid,
-                            lang,
-                            author_id
-                        ),
-                        'change_detail': format_diff_as_html(
-                            change_detail,
-                            file_name,
-                        ),
-                    }
-                )
 
-            parts = git_commit.split(" ", 3)
-            commit = parts[0] if parts else ""
+        info = entry.info(now)
+        parts = info.split(" ", 3)
 
-            if len(parts) >= 3:
-                message = " ".join(parts[1:3])
-            elif len(parts) == 2:
-                message = parts[1]
-            else:
-                message = ""
+        if len(parts) >= 3:
+            message = " ".join(parts[1:3])
+        elif len(parts) == 2:
+            message = parts[1]
+        else:
+            message = ""
 
-            git_detail = {
-                'info': git_commit,
+        recent_commits.append(
+            {
+                'info': info,
                 'commit': commit,
                 'message': message,
-                'author': author,
-                'date': date,
+                'author': entry.author,
+                'date': entry.date,
                 'effected_files': formatted_json_files,
-                'is_done': commit in all_done_commit_ids,
+                'is_done': is_done,
             }
-            if include_done or commit not in all_done_commit_ids:
-                recent_commits.append(git_detail)
-                if limit is not None and len(recent_commits) >= limit:
-                    break
-    else:
-        print(f"Error: {error.decode('utf-8')}")
+        )
+        if limit is not None and len(recent_commits) >= limit:
+            break
     return recent_commits
 
 
@@ -447,40 +351,6 @@ def build_suttacentral_url(uid: str, lang: str, author_id: str) -> str:
     return f'https://suttacentral.net/{uid}/{lang}/{author_id}'
 
 
-def parse_git_show_details(git_show_details_text):
-    file_change_detail = []
-    diff_git_pattern = re.compile(r"^diff --git a/([^\s]+)", re.MULTILINE)
-    diff_git_matches = list(diff_git_pattern.finditer(git_show_details_text))
-
-    for i, match in enumerate(diff_git_matches):
-        section_end = (
-            diff_git_matches[i + 1].start()
-            if i + 1 < len(diff_git_matches)
-            else len(git_show_details_text)
-        )
-        section = git_show_details_text[match.start():section_end]
-        change_match = re.search(r"@@.*?@@(.*)", section, re.DOTALL)
-        change_detail = change_match.group(1).strip() if change_match else ""
-        file_change_detail.append(
-            {
-                "file_name": match.group(1).split("/")[-1],
-                "change_detail": change_detail,
-            }
-        )
-    return file_change_detail
-
-
-def get_change_detail(file_name, parsed_git_show_details):
-    return next(
-        (
-            detail["change_detail"]
-            for detail in parsed_git_show_details
-            if detail["file_name"] == file_name
-        ),
-        None,
-    )
-
-
 def format_diff_as_html(change_detail, file_name):
     if not change_detail:
         return None
@@ -537,6 +407,7 @@ async def mark_notification_as_done(
                 ),
             ) from e
 
+    publish_user_event([user.github_id])
     return NotificationDoneOut(success=True)
 
 
@@ -572,6 +443,7 @@ async def mark_notification_as_done_by_type(
             notification.is_done = True
             sess.commit()
 
+        publish_user_event([user.github_id])
         return NotificationDoneOut(success=True)
 
     raise HTTPException(
@@ -667,6 +539,7 @@ def update_user_preferences(
             existing.notification_days = preferences.notification_days
             sess.commit()
             sess.refresh(existing)
+            publish_user_event([user.github_id])
 
             return UserPreference(
                 id=existing.id,
@@ -684,6 +557,7 @@ def update_user_preferences(
             sess.add(new_preference)
             sess.commit()
             sess.refresh(new_preference)
+            publish_user_event([user.github_id])
 
             return UserPreference(
                 id=new_preference.id,
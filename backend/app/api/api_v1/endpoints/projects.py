@@ -44,11 +44,12 @@ from app.services.users.permissions import (
     is_user_active,
 )
 from app.services.users.utils import get_user
-from app.tasks import commit
+from app.services.git.commit_scheduler import schedule_commit
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, ValidationError
-from search.search import Search
+from search.async_search import AsyncSearch
 from search.utils import (
     find_root_path,
     get_filename,
@@ -60,7 +61,7 @@ from search.utils import (
 
 router = APIRouter(prefix="/projects")
 
-search = Search()
+search = AsyncSearch()
 
 
 PROJECT_V2_FILE = settings.WORK_DIR / "_project-v2.json"
@@ -77,8 +78,8 @@ def _write_project_v2(data: list[dict]):
         f.write("\n")
 
 
-def _get_project_file_paths(muid: str, prefix: str) -> set[str]:
-    file_paths: set[str] = search.get_file_paths(muid=muid, prefix=prefix, exact=True, _type="file_path")
+async def _get_project_file_paths(muid: str, prefix: str) -> set[str]:
+    file_paths: set[str] = await search.get_file_paths(muid=muid, prefix=prefix, exact=True, _type="file_path")
     if file_paths:
         return file_paths
 
@@ -86,7 +87,7 @@ def _get_project_file_paths(muid: str, prefix: str) -> set[str]:
     if not file_path:
         return set()
 
-    search.add_to_index(file_path)
+    await search.add_to_index(file_path)
     return {str(file_path)}
 
 
@@ -154,13 +155,13 @@ async def publish_project_entries(
 ):
     """Commit and push _project-v2.json to GitHub."""
     user_data = get_user(int(user.github_id))
-    result = commit.delay(
+    task_id = schedule_commit(
         user_data.model_dump(),
         ["_project-v2.json"],
         "Update project metadata",
         add=True,
     )
-    return {"task_id": result.id, "detail": "Publish task triggered"}
+    return {"task_id": task_id, "detail": "Publish task triggered"}
 
 
 @router.put("/project-entries/{project_uid}")
@@ -202,9 +203,9 @@ async def get_projects(
     user: Annotated[UserBase, Depends(utils.get_current_user)],
     prefix: str | None = None,
 ) -> ProjectsOut:
-    projects = search.find_unique_data(field="muid", prefix=prefix)
+    projects = await search.find_unique_data(field="muid", prefix=prefix)
     if not projects:
-        projects = search.get_distinct_data(field="muid", prefix=prefix)
+        projects = await search.get_distinct_data(field="muid", prefix=prefix)
 
     # Auto-discover unindexed tag files on disk
     if prefix and not any(p.startswith("tag") for p in projects):
@@ -212,7 +213,7 @@ async def get_projects(
         if tag_dir.exists():
             for f in yield_file_path(tag_dir, level=1):
                 if get_prefix(f) == prefix:
-                    success, _ = search.add_to_index(f)
+                    success, _ = await search.add_to_index(f)
                     if success:
                         projects.append(get_muid(f))
                     break
@@ -228,7 +229,7 @@ async def get_projects(
 )
 async def merge_segments(user: Annotated[UserBase, Depends(utils.get_current_user)], payload: MergeIn):
     file_path = Path(
-        list(search.get_file_paths(muid=payload.muid, prefix=payload.prefix, exact=True, _type="file_path"))[0]
+        list(await search.get_file_paths(muid=payload.muid, prefix=payload.prefix, exact=True, _type="file_path"))[0]
     )
     affected_paths_data_before = {}
     related = get_matches(file_path, True)
@@ -301,7 +302,7 @@ async def merge_segments(user: Annotated[UserBase, Depends(utils.get_current_use
 )
 async def split_segments(user: Annotated[UserBase, Depends(utils.get_current_user)], payload: SplitIn):
     file_path = Path(
-        list(search.get_file_paths(muid=payload.muid, prefix=payload.prefix, exact=True, _type="file_path"))[0]
+        list(await search.get_file_paths(muid=payload.muid, prefix=payload.prefix, exact=True, _type="file_path"))[0]
     )
     uid_expander = UIDExpander(user, file_path, payload.splitter_uid)
     data, main_task_id, related_task_id = uid_expander.expand()
@@ -347,7 +348,7 @@ async def get_paths_for_project(
     prefix: str | None = None,
     _type: Literal["root_path", "file_path"] = "root_path",
 ) -> PathsOut:
-    data: list[str] = sort_paths(search.get_file_paths(muid=muid, _type=_type, prefix=prefix))
+    data: list[str] = sort_paths(await search.get_file_paths(muid=muid, _type=_type, prefix=prefix))
     if not data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project '{muid}' not found")
     return PathsOut(paths=data)
@@ -361,7 +362,7 @@ async def get_paths_for_project2(
     _type: Literal["root_path", "file_path"] = "root_path",
 ) -> PathsOut:
     data: list[str] = sort_paths(
-        search.get_file_paths_for_split_merge(muid=muid, _type=_type, prefix=prefix)
+        await search.get_file_paths_for_split_merge(muid=muid, _type=_type, prefix=prefix)
     )
     if not data:
         raise HTTPException(
@@ -379,7 +380,7 @@ async def get_can_edit(user: Annotated[UserBase, Depends(utils.get_current_user)
 async def get_json_data_for_prefix_in_project(
     user: Annotated[UserBase, Depends(utils.get_current_user)], muid: str, prefix: str
 ) -> JSONDataOut:
-    file: set[str] = _get_project_file_paths(muid, prefix)
+    file: set[str] = await _get_project_file_paths(muid, prefix)
 
     if not file:
         raise HTTPException(
@@ -408,7 +409,7 @@ async def validate_html_project(
             detail="HTML validation is only available for html projects",
         )
 
-    files = _get_project_file_paths(muid, prefix)
+    files = await _get_project_file_paths(muid, prefix)
     if not files:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -461,7 +462,7 @@ async def update_json_data_for_prefix_in_project(
                     detail=f"Invalid tags: {', '.join(invalid_tags)}. Tags must be defined in the tag list.",
                 )
 
-    file: set[str] = _get_project_file_paths(muid, prefix)
+    file: set[str] = await _get_project_file_paths(muid, prefix)
 
     if not file:
         raise HTTPException(
@@ -469,8 +470,8 @@ async def update_json_data_for_prefix_in_project(
             detail=f"Data for project '{muid}' and prefix '{prefix}' not found",
         )
     path: Path = Path(file.pop())
-    root_path: set[str] = search.get_file_paths(muid=muid, prefix=prefix, exact=True)
-    updated, error, task_id = update_file(path, data, Path(root_path.pop()), user)
+    root_path: set[str] = await search.get_file_paths(muid=muid, prefix=prefix, exact=True)
+    updated, error, task_id = await run_in_threadpool(update_file, path, data, Path(root_path.pop()), user)
     if error:
         code = status.HTTP_500_INTERNAL_SERVER_ERROR
         if isinstance(error, KeyError):
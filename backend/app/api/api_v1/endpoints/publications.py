@@ -11,7 +11,7 @@ from app.services.users.permissions import (
     is_user_active,
 )
 from app.services.users.utils import get_user
-from app.tasks import commit as commit_task
+from app.services.git.commit_scheduler import schedule_commit
 
 router = APIRouter(prefix="/publications")
 
@@ -85,13 +85,13 @@ async def publish_to_github(
     _active=Depends(is_user_active),
 ):
     user_data = get_user(int(user.github_id))
-    result = commit_task.delay(
+    task_id = schedule_commit(
         user_data.model_dump(),
         ["_publication-v2.json"],
         "Update publication metadata",
         add=True,
     )
-    return {"task_id": result.id, "detail": "Publish task triggered"}
+    return {"task_id": task_id, "detail": "Publish task triggered"}
 
 
 @router.get("/")
@@ -3,19 +3,22 @@ from typing import Annotated
 from app.db.schemas.user import UserBase
 from app.services.auth.utils import get_current_user
 from app.services.search.models import SearchSegmentOut, TranslationHintsOut
-from app.services.users.permissions import is_user_active
+from app.services.users.permissions import is_admin_or_superuser, is_user_active
+from app.tasks import reindex
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from search.search import Search
+from search import cache
+from search.async_search import AsyncSearch
 
 router = APIRouter(prefix="/search")
 
-es = Search()
+es = AsyncSearch()
 
 
 @router.get(
     "/",
-    description="This endpoint accepts any number of query parameters. Append them to the URL like this: ?muid1=value1&muid2=value2",  # noqa: 501
+    description="This endpoint accepts any number of query parameters. Append them to the URL like this: ?muid1=value1&muid2=value2. Pass cursor (empty for the first page, then the returned next token) to page with cursors instead of page numbers.",  # noqa: 501
     response_model=SearchSegmentOut,
+    response_model_exclude_none=True,
 )
 async def search(
     user: Annotated[UserBase, Depends(get_current_user)],
@@ -23,11 +26,13 @@ async def search(
     uid: str | None = None,
     size: int = 10,
     page: int = 0,
+    cursor: str | None = None,
 ) -> SearchSegmentOut:
     params: dict[str, str] = {**request.query_params}
     size = int(params.pop("size", size))
     page = int(params.pop("page", page))
     uid = params.pop("uid", uid)
+    cursor = params.pop("cursor", cursor)
     if uid and not params:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,21 +44,41 @@ async def search(
             detail="No query parameters provided",
         )
     params["uid"] = uid
-    return SearchSegmentOut(results=es.get_segments(size, page, params))
+    if cursor is None:
+        return SearchSegmentOut(results=await es.get_segments(size, page, params))
+    try:
+        results, next_cursor = await es.get_segments_page(size, cursor, params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return SearchSegmentOut(results=results, next=next_cursor)
 
 
 @router.get("/hints/", response_model=list[TranslationHintsOut], dependencies=[Depends(is_user_active)])
 async def get_translation_hints(
     source_muid: str, target_muid: str, segment_id: str, text_value: str
 ) -> list[TranslationHintsOut]:
-    similar_phrases: list[dict] = es.get_phrase_similar_segments(text_value, source_muid)
-    translation_hints = es.get_segment_value_for_uids_and_muid(
-        [phrase_dict.get("uid") for phrase_dict in similar_phrases], target_muid
-    )
-    similar_phrases_with_translation = es.merge_segments_with_translation_hints(similar_phrases, translation_hints)
-    translation_hints = es.aggregate_similar_segments(similar_phrases_with_translation)
+    translation_hints: list[dict] = await es.get_translation_hints(text_value, source_muid, target_muid)
     return [
         TranslationHintsOut(**hint)
         for hint in translation_hints
         if hint.get("uid") != segment_id and hint.get("translation_hints")
     ]
+
+
+@router.get(
+    "/cache/stats/",
+    dependencies=[Depends(is_admin_or_superuser), Depends(is_user_active)],
+)
+async def get_cache_stats() -> dict:
+    return await cache.get_stats()
+
+
+@router.post(
+    "/reindex/",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(is_admin_or_superuser), Depends(is_user_active)],
+)
+async def reindex_search(keep_old: bool = False) -> dict:
+    """Rebuild both indexes in the background and swap them in once they are complete."""
+    result = reindex.delay(keep_old)
+    return {"task_id": result.id, "detail": "Reindex task has been queued."}
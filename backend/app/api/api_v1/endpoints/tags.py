@@ -8,7 +8,7 @@ from app.db.schemas.user import UserBase
 from app.services.auth import utils
 from app.services.users.permissions import is_admin_or_superuser, is_user_active
 from fastapi import APIRouter, Depends, HTTPException, status
-from search.search import Search
+from search.async_search import AsyncSearch
 from search.utils import find_root_path, get_json_data, get_prefix, yield_file_path
 
 router = APIRouter(prefix="/tags")
@@ -17,7 +17,7 @@ TAGS_FILE = settings.WORK_DIR / "_tags.json"
 
 TAG_NAME_PATTERN = re.compile(r"^[a-z0-9]+(-[a-z0-9]+)*$")
 
-search = Search()
+search = AsyncSearch()
 
 
 def _read_tags() -> list[dict]:
@@ -261,11 +261,11 @@ async def create_tag_data_file(
         for f in yield_file_path(tag_dir, level=1):
             if get_prefix(f) == prefix:
                 # File exists — ensure it's indexed and return
-                search.add_to_index(f)
+                await search.add_to_index(f)
                 return {"detail": f"Tag data file for '{prefix}' already exists", "path": str(f)}
 
     # Find root file to get segment keys and directory structure
-    root_files: set[str] = search.get_file_paths(muid="root-pli-ms", prefix=prefix, exact=True, _type="file_path")
+    root_files: set[str] = await search.get_file_paths(muid="root-pli-ms", prefix=prefix, exact=True, _type="file_path")
     if not root_files:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -289,7 +289,7 @@ async def create_tag_data_file(
         json.dump(tag_data, f, indent=2, ensure_ascii=False)
 
     # Index in ES
-    search.add_to_index(tag_file_path)
+    await search.add_to_index(tag_file_path)
 
     return {"detail": f"Tag data file created for '{prefix}'", "path": str(tag_file_path)}
 
@@ -308,7 +308,7 @@ async def reindex_tag_files(
 
     indexed_count = 0
     for f in yield_file_path(tag_dir, level=1):
-        success, error = search.add_to_index(f)
+        success, error = await search.add_to_index(f)
         if success:
             indexed_count += 1
 
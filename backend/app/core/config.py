@@ -1,8 +1,10 @@
+import inspect
 import secrets
 from datetime import timedelta
 from pathlib import Path
 from typing import List, Union
 
+import pygit2
 from pydantic import AnyHttpUrl, ConfigDict, EmailStr, field_validator
 from pydantic_settings import BaseSettings
 
@@ -25,6 +27,13 @@ class Settings(BaseSettings):
     ES_INDEX: str
     ES_SEGMENTS_INDEX: str
     ES_HOST: str
+    ES_BULK_CHUNK_SIZE: int = 500
+    ES_BULK_MAX_CHUNK_BYTES: int = 10 * 1024 * 1024
+    ES_BULK_THREAD_COUNT: int = 4
+    ES_INDEX_WORKERS: int = 0
+    ES_SCRIPTED_SEGMENT_UPDATES: bool = False
+    ES_ASYNC_CONNECTIONS_PER_NODE: int = 25
+    ES_ASYNC_REQUEST_TIMEOUT: float = 10.0
     GITHUB_CLIENT_ID: str
     GITHUB_CLIENT_SECRET: str
     ACCESS_TOKEN_EXPIRE_MINUTES: timedelta = timedelta(minutes=30)
@@ -41,15 +50,36 @@ class Settings(BaseSettings):
     POSTGRESQL_PASSWORD: str
     POSTGRESQL_PORT: int
     POSTGRESQL_HOSTNAME: str
+    PROGRESS_CHUNK_SIZE: int = 1000
+    PROGRESS_WORKERS: int = 0
+    PROGRESS_PENDING_TTL: int = 60
     GITHUB_USERNAME: str
     GITHUB_EMAIL: EmailStr
     GITHUB_TOKEN: str
     GITHUB_REPO: str
+    GITHUB_POOL_SIZE: int = 10
     CELERY_BROKER_URL: str
     CELERY_BACKEND_URL: str
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_PASSWORD: str
+    GIT_EVENTS_MAXLEN: int = 100_000
+    GIT_EVENTS_CLAIM_IDLE_SECONDS: int = 300
+    COMMIT_BATCH_WINDOW_SECONDS: int = 5
+    COMMIT_BATCH_MAX_SIZE: int = 50
+    # Longest a task may hold the lock on the unpublished checkout, and wait for it.
+    WORK_DIR_LOCK_TIMEOUT: int = 10 * 60
+    SEGMENT_DIFF_CACHE_SIZE: int = 512
+    # Commits of history fetched by a pull; 0 fetches everything, more needs pygit2 1.14 or later.
+    GIT_FETCH_DEPTH: int = 0
+    SEARCH_CACHE_ENABLED: bool = True
+    # Entries are invalidated by generation; the TTL only bounds memory held by cold queries.
+    SEARCH_CACHE_TTL: int = 24 * 60 * 60
+    # At least the refresh interval of the indexes, so a write is searchable before results are cached again.
+    SEARCH_CACHE_SETTLE_SECONDS: float = 2
+    SEARCH_BOOTSTRAP_ON_STARTUP: bool = True
+    # Upper bound on a full population; the lock expires after this if its holder dies.
+    SEARCH_BOOTSTRAP_LOCK_TIMEOUT: int = 2 * 60 * 60
 
     @field_validator("BACKEND_CORS_ORIGINS", mode="before")
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
@@ -59,6 +89,17 @@ class Settings(BaseSettings):
             return v
         raise ValueError(v)
 
+    @field_validator("GIT_FETCH_DEPTH")
+    def check_fetch_depth(cls, v: int) -> int:
+        # Rejected here rather than by the first pull, where the TypeError would be retried.
+        if v < 0:
+            raise ValueError("GIT_FETCH_DEPTH must be 0 or more")
+        if v > 0 and "depth" not in inspect.signature(pygit2.Remote.fetch).parameters:
+            raise ValueError(
+                f"GIT_FETCH_DEPTH needs pygit2 1.14 or later, {pygit2.__version__} is installed; set it to 0"
+            )
+        return v
+
     # TODO remove extra
     model_config = ConfigDict(
         case_sensitive=True,
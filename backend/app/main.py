@@ -1,4 +1,7 @@
+import logging
+
 from app.api.api_v1.api import api_router
+from app.api.api_v1.endpoints import notifications
 from app.core.config import settings
 from app.db.database import Base, engine
 from app.db.models.notification import Notification, RemarkNotification
@@ -7,7 +10,10 @@ from app.db.models.user import User
 from app.db.models.user_preference import UserPreference
 from app.db.models.dictionary_note import DictionaryNote
 from app.db.models.dictionary_hidden_word import DictionaryHiddenWord
+from app.tasks import bootstrap_search
 from fastapi import FastAPI
+from search import cache
+from search.async_search import AsyncSearch
 from sqlalchemy import text
 from starlette.middleware.cors import CORSMiddleware
 
@@ -43,3 +49,21 @@ if settings.BACKEND_CORS_ORIGINS:
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+@app.on_event("startup")
+async def start_search_bootstrap() -> None:
+    # Queued so that serving requests never waits on the cluster or on a full population, and a
+    # population outlives the web worker that asked for it. The task lock makes repeats cheap.
+    if settings.SEARCH_BOOTSTRAP_ON_STARTUP:
+        try:
+            bootstrap_search.delay()
+        except Exception:
+            logging.getLogger(__name__).exception("Failed to queue the search bootstrap")
+
+
+@app.on_event("shutdown")
+async def close_search_client() -> None:
+    await AsyncSearch().close()
+    await cache.close()
+    await notifications.broadcaster.close()
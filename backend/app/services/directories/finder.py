@@ -2,15 +2,13 @@ from pathlib import Path
 
 from app.core.config import settings
 from app.core.text_types import TextType
+from app.services.directories.path_index import PathIndex, get_path_index
 
 
 class Finder:
     def __init__(self):
         self.root_dir = settings.WORK_DIR / TextType.ROOT.value
-        self.paths = {
-            text_type.value: [path for path in (settings.WORK_DIR / text_type.value).rglob("*")]
-            for text_type in TextType
-        }
+        self.index: PathIndex = get_path_index()
         self.similar = (TextType.ROOT.value, TextType.HTML.value, TextType.VARIANT.value, TextType.REFERENCE.value)
 
     def find(self, target_path: Path, exact: bool = False) -> set[Path]:
@@ -38,19 +36,15 @@ class Finder:
         return result
 
     def _match_for_type(self, text_type: TextType, target_path: Path) -> set[Path]:
-        paths = self.paths[text_type.value]
         target_parts = [
             part for part in target_path.parts if not part.endswith(".json") and part != TextType.ROOT.value
         ]
-        if target_parts[0] not in [d.name for d in self.root_dir.iterdir() if d.is_dir()]:
+        if target_parts[0] not in self.index.root_dirs:
             if text_type.value in {TextType.TRANSLATION.value, TextType.COMMENT.value}:
                 return set()
             return {settings.WORK_DIR / str(target_path).replace(TextType.ROOT.value, text_type.value)}
         matches = set()
-        for path in paths:
-            path_parts = [
-                part for part in path.parts if not part.endswith(".json") and part not in settings.WORK_DIR.parts
-            ]
+        for path_parts in self.index.candidates(text_type.value, target_parts):
             if text_type.value == TextType.ROOT.value and (
                 ("misc" in target_parts and "en" in path_parts) or ("en" in target_parts and "misc" in path_parts)
             ):
@@ -7,6 +7,7 @@ class FileWithProgress(BaseModel):
     progress: float | None = None  # None = not calculated, -1 = error
     total_keys: int = 0
     translated_keys: int = 0
+    pending: bool = False  # True while the progress is being computed in the background
 
 
 class FilesAndDirsOut(BaseModel):
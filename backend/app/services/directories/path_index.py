@@ -0,0 +1,230 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+
+from app.core.config import settings
+from app.core.text_types import TextType
+from search.utils import get_work_dir_signature
+
+PathParts = tuple[str, ...]
+
+
+class PathIndex:
+    """
+    Directory layout of every text type, shared by all Finder instances of a process.
+
+    Finder compares a target with the directory parts of every path in the corpus. Files only
+    contribute their directory, so the index keeps each distinct parts tuple once and maps every
+    path component to the tuples containing it; a target is then only compared with tuples that
+    share at least one component with it.
+    """
+
+    def __init__(self):
+        self.entries: dict[str, set[PathParts]] = {}
+        self.postings: dict[str, dict[str, set[PathParts]]] = {}
+        self.root_dirs: set[str] = set()
+        self._build()
+
+    def _build(self) -> None:
+        for text_type in TextType:
+            self.entries[text_type.value] = set()
+            self.postings[text_type.value] = {}
+            for path in (settings.WORK_DIR / text_type.value).rglob("*"):
+                self._add_entry(text_type.value, self.get_parts(path))
+        try:
+            root_dir: Path = settings.WORK_DIR / TextType.ROOT.value
+            self.root_dirs = {path.name for path in root_dir.iterdir() if path.is_dir()}
+        except FileNotFoundError:
+            self.root_dirs = set()
+
+    @staticmethod
+    def get_parts(path: Path) -> PathParts:
+        return tuple(part for part in path.parts if not part.endswith(".json") and part not in settings.WORK_DIR.parts)
+
+    def _add_entry(self, text_type: str, parts: PathParts) -> None:
+        if parts in self.entries[text_type]:
+            return
+        self.entries[text_type].add(parts)
+        for part in parts:
+            self.postings[text_type].setdefault(part, set()).add(parts)
+
+    def add(self, path: Path) -> None:
+        """Record a directory created by this process together with its new parents."""
+        relative: Path = path.relative_to(settings.WORK_DIR) if path.is_absolute() else path
+        text_type: str = relative.parts[0]
+        if text_type not in self.entries:
+            return
+        for depth in range(2, len(relative.parts) + 1):
+            self._add_entry(text_type, self.get_parts(settings.WORK_DIR / Path(*relative.parts[:depth])))
+        if text_type == TextType.ROOT.value and len(relative.parts) > 1:
+            self.root_dirs.add(relative.parts[1])
+
+    def candidates(self, text_type: str, target_parts: list[str]) -> set[PathParts]:
+        """Entries sharing at least one component with the target, the only ones that can match."""
+        postings: dict[str, set[PathParts]] = self.postings[text_type]
+        return set().union(*(postings.get(part, ()) for part in set(target_parts)))
+
+
+@dataclass
+class DirectoryEntry:
+    name: str
+    child_directories: int = 0
+    child_files: int = 0
+
+
+class DirectoryIndex:
+    """
+    Every directory of the working tree by name, for the directory search.
+
+    Names are looked up exactly in a dict and by substring through trigram postings over the
+    distinct lower cased names, so a query touches the few names sharing its trigrams instead of
+    walking the tree. Child counts are taken while building and kept with each entry.
+    """
+
+    def __init__(self):
+        self.entries: dict[str, DirectoryEntry] = {}
+        self.paths_by_name: dict[str, set[str]] = {}
+        self.names_by_lower: dict[str, set[str]] = {}
+        self.trigrams: dict[str, set[str]] = {}
+        self._build()
+
+    def _build(self) -> None:
+        text_types: set[str] = {text_type.value for text_type in TextType}
+        for current, dirs, files in os.walk(settings.WORK_DIR):
+            # Hidden directories such as .git are not part of the corpus.
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            relative: str = os.path.relpath(current, settings.WORK_DIR)
+            if relative == ".":
+                continue
+            if relative not in text_types:
+                self._add_entry(
+                    relative,
+                    DirectoryEntry(
+                        name=os.path.basename(current),
+                        child_directories=sum(1 for name in dirs if name not in text_types),
+                        child_files=len(files),
+                    ),
+                )
+
+    @staticmethod
+    def get_trigrams(value: str) -> set[str]:
+        return {value[i : i + 3] for i in range(len(value) - 2)}
+
+    def _add_entry(self, relative: str, entry: DirectoryEntry) -> None:
+        self.entries[relative] = entry
+        self.paths_by_name.setdefault(entry.name, set()).add(relative)
+        lower: str = entry.name.lower()
+        if lower not in self.names_by_lower:
+            for trigram in self.get_trigrams(lower):
+                self.trigrams.setdefault(trigram, set()).add(lower)
+        self.names_by_lower.setdefault(lower, set()).add(entry.name)
+
+    def add(self, path: Path) -> None:
+        """Record a directory created by this process together with its new parents."""
+        relative: Path = path.relative_to(settings.WORK_DIR) if path.is_absolute() else path
+        for depth in range(2, len(relative.parts) + 1):
+            current: str = str(Path(*relative.parts[:depth]))
+            if current in self.entries:
+                continue
+            self._add_entry(current, DirectoryEntry(name=relative.parts[depth - 1]))
+            if parent := self.entries.get(str(Path(*relative.parts[: depth - 1]))):
+                parent.child_directories += 1
+
+    def search(self, query: str, exact: bool = False) -> list[str]:
+        """Relative paths of the directories named query, or containing it case insensitively."""
+        if exact:
+            return list(self.paths_by_name.get(query, ()))
+        lower: str = query.lower()
+        trigrams: list[set[str]] = [self.trigrams.get(trigram, set()) for trigram in self.get_trigrams(lower)]
+        if trigrams:
+            candidates: set[str] = set.intersection(*sorted(trigrams, key=len))
+        else:
+            candidates = set(self.names_by_lower)
+        return [
+            path
+            for name in candidates
+            if lower in name
+            for original in self.names_by_lower[name]
+            for path in self.paths_by_name[original]
+        ]
+
+
+_path_index: PathIndex | None = None
+_path_index_signature: tuple[int, int] | None = None
+_directory_index: DirectoryIndex | None = None
+_directory_index_signature: tuple[int, int] | None = None
+# Bumped by every change to the directory index, so a build that raced one is not kept.
+_directory_index_version: int = 0
+_path_index_lock = Lock()
+_directory_index_build_lock = Lock()
+
+
+def get_path_index() -> PathIndex:
+    """Return the process wide index, rebuilt after commits, pulls and checkouts from any process."""
+    global _path_index, _path_index_signature
+    with _path_index_lock:
+        signature = get_work_dir_signature()
+        if _path_index is None or signature != _path_index_signature:
+            _path_index = PathIndex()
+            _path_index_signature = signature
+        return _path_index
+
+
+def _get_current_directory_index(signature: tuple[int, int] | None) -> tuple[DirectoryIndex | None, int]:
+    with _path_index_lock:
+        if _directory_index is not None and signature == _directory_index_signature:
+            return _directory_index, _directory_index_version
+        return None, _directory_index_version
+
+
+def get_directory_index() -> DirectoryIndex:
+    """
+    Return the process wide directory name index, rebuilt like the path index.
+
+    Walking the tree takes a while, so the index is built outside the lock shared with the path
+    index and only swapped in if nothing was added or removed in the meantime.
+    """
+    global _directory_index, _directory_index_signature
+    signature = get_work_dir_signature()
+    index, version = _get_current_directory_index(signature)
+    if index is not None:
+        return index
+    with _directory_index_build_lock:
+        # Another request may have built it while this one waited.
+        index, version = _get_current_directory_index(signature)
+        if index is not None:
+            return index
+        index = DirectoryIndex()
+    with _path_index_lock:
+        if version == _directory_index_version:
+            _directory_index = index
+            _directory_index_signature = signature
+    return index
+
+
+def add_to_path_index(paths: list[Path]) -> None:
+    global _directory_index_version
+    with _path_index_lock:
+        _directory_index_version += 1
+        for index in (_path_index, _directory_index):
+            if index is None:
+                continue
+            for path in paths:
+                index.add(path)
+
+
+def invalidate_directory_index() -> None:
+    """Drop the directory index after files were created or removed, which changes child counts."""
+    global _directory_index, _directory_index_version
+    with _path_index_lock:
+        _directory_index = None
+        _directory_index_version += 1
+
+
+def invalidate_path_index() -> None:
+    global _path_index, _directory_index, _directory_index_version
+    with _path_index_lock:
+        _path_index = None
+        _directory_index = None
+        _directory_index_version += 1
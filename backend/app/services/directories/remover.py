@@ -4,11 +4,12 @@ from pathlib import Path
 from app.core.config import settings
 from app.core.text_types import TextType
 from app.db.schemas.user import UserBase
+from app.services.directories.path_index import invalidate_directory_index, invalidate_path_index
 from app.services.directories.utils import get_matches
 from app.services.users.utils import get_user
 from search.search import Search
-from search.utils import is_root
-from app.tasks import commit
+from search.utils import invalidate_root_path_index, is_root
+from app.services.git.commit_scheduler import schedule_commit
 
 
 class Remover:
@@ -33,6 +34,12 @@ class Remover:
         matches.remove(self.path)
         related_matches = {str(match) for match in self._get_paths(matches)}
         self._delete_elements(to_be_removed)
+        if self.is_root:
+            invalidate_root_path_index()
+        if self.is_dir:
+            invalidate_path_index()
+        else:
+            invalidate_directory_index()
         main_task_id = self._remove_commit(
             list(related_to_main_path), self._create_message("deleted")
         )
@@ -79,13 +86,12 @@ class Remover:
         return f"{self.user.username} {action} {file_or_directory} {str(self.path).replace(str(settings.WORK_DIR), '')}"
 
     def _remove_commit(self, removed_paths: list[str], message: str) -> str:
-        result = commit.delay(
+        return schedule_commit(
             get_user(int(self.user.github_id)).model_dump(),
             removed_paths,
             message,
             False,
         )
-        return result.id
 
     def _get_paths(self, matches: set[Path]) -> set[Path]:
         if self.is_dir:
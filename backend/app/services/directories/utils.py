@@ -1,21 +1,32 @@
+import logging
 import re
 from pathlib import Path
 from typing import Any
 
+import redis
+import redis.asyncio as aioredis
 from fastapi import HTTPException
 
 
 from app.core.config import settings
 from app.core.text_types import TextType
+from app.db.database import get_sess
+from app.db.models.translation_progress import TranslationProgress
 from app.db.schemas.user import UserBase
 from app.services.directories.finder import Finder
+from app.services.directories.path_index import add_to_path_index, invalidate_directory_index
 from app.services.projects.utils import write_json_data
 from app.services.users.utils import get_user
 from search.search import Search
-from search.utils import get_prefix, get_muid
-from app.tasks import commit
+from search.utils import get_prefix, get_muid, invalidate_root_path_index
+from app.services.git.commit_scheduler import schedule_commit
+from app.tasks import update_translation_progress
 
 es = Search()
+logger = logging.getLogger(__name__)
+
+PROGRESS_PENDING_KEY: str = "translation-progress-pending"
+_redis: aioredis.Redis | None = None
 
 
 def validate_dir_path(path: str):
@@ -53,24 +64,29 @@ def create_directory(path: Path) -> bool:
         return False
     matches = get_matches(path)
     [dir_path.mkdir(parents=True, exist_ok=True) for dir_path in matches]
+    add_to_path_index(list(matches))
     return True
 
 
 def create_and_write(user: UserBase, paths: list[Path], data: dict[str, str], message: str, retries: int = 10):
-    for path in paths:
-        path.touch()
-        _, file_error = write_json_data(path, data)
-        if file_error:
-            raise HTTPException(status_code=500, detail=f"Error writing to file")
-        created: bool = False
-        error_counter: int = 0
-        while not created:
-            created, _ = es.add_to_index(path)
-            error_counter += 1
-            if error_counter > retries:
-                path.unlink()
-                raise HTTPException(status_code=500, detail=f"Error adding to elastic, file deleted")
-    commit.delay(get_user(int(user.github_id)).model_dump(), [str(path) for path in paths], message)
+    try:
+        for path in paths:
+            path.touch()
+            _, file_error = write_json_data(path, data)
+            if file_error:
+                raise HTTPException(status_code=500, detail=f"Error writing to file")
+            created: bool = False
+            error_counter: int = 0
+            while not created:
+                created, _ = es.add_to_index(path)
+                error_counter += 1
+                if error_counter > retries:
+                    path.unlink()
+                    raise HTTPException(status_code=500, detail=f"Error adding to elastic, file deleted")
+    finally:
+        # New files change the child counts of their directories.
+        invalidate_directory_index()
+    schedule_commit(get_user(int(user.github_id)).model_dump(), [str(path) for path in paths], message)
     return True
 
 
@@ -79,6 +95,7 @@ def create_file(user: UserBase, path: Path, data: dict[str, str]):
         return False
     full_path = settings.WORK_DIR / path
     create_and_write(user, [full_path], data, f"{user.username} created new root file {path}")
+    invalidate_root_path_index()
     matches = get_matches(path)
     related_paths: list[Path] = [replace_muids(settings.WORK_DIR / match / path.parts[-1]) for match in matches]
     related_paths.remove(full_path)
@@ -174,51 +191,48 @@ def get_language(path: Path) -> str:
     return language
 
 
-def calculate_file_progress(file_path: Path) -> dict:
-    """
-    Calculate translation progress for a single file.
-
-    Args:
-        file_path: Path to the translation file
-
-    Returns:
-        Dictionary with progress information including name, progress percentage,
-        total_keys, and translated_keys
-    """
-    from search.utils import find_root_path, get_json_data
-
-    result = {
-        "name": file_path.name,
-        "progress": None,
-        "total_keys": 0,
-        "translated_keys": 0
+def get_stored_progress(base: str) -> dict[str, dict[str, Any]]:
+    """Stored progress of the files directly inside a translation directory, keyed by file name."""
+    # Paths are full of "_", so the base is escaped before it becomes a LIKE pattern.
+    pattern = base.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    with get_sess() as db:
+        records = (
+            db.query(TranslationProgress)
+            .filter(
+                TranslationProgress.file_path.like(pattern + "%", escape="\\"),
+                TranslationProgress.file_path.not_like(pattern + "%/%", escape="\\"),
+            )
+            .all()
+        )
+    return {
+        Path(record.file_path).name: {
+            "name": Path(record.file_path).name,
+            "progress": record.progress,
+            "total_keys": record.total_keys,
+            "translated_keys": record.translated_keys,
+        }
+        for record in records
     }
 
-    try:
-        # Find the corresponding root file
-        source_path = find_root_path(file_path)
-        if not source_path:
-            result["progress"] = -1
-            return result
-
-        # Get JSON data for both files
-        translation_data = get_json_data(file_path)
-        source_data = get_json_data(source_path)
-
-        # Calculate progress
-        total_keys = len(source_data)
-        translated_keys = sum(
-            1 for key in source_data
-            if key in translation_data and translation_data[key] and str(translation_data[key]).strip()
-        )
 
-        progress = (translated_keys / total_keys * 100) if total_keys > 0 else 0.0
+def _get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD)
+    return _redis
 
-        result["progress"] = round(progress, 2)
-        result["total_keys"] = total_keys
-        result["translated_keys"] = translated_keys
 
-    except Exception as e:
-        result["progress"] = -1
+async def schedule_progress_update(base: str, file_paths: list[str]) -> bool:
+    """
+    Queue one progress job for the files of a directory that have no stored progress yet.
 
-    return result
+    Listings polled while the job runs would ask for the same files again, so a directory is
+    only queued once per PROGRESS_PENDING_TTL. Returns whether a job was queued.
+    """
+    try:
+        if not await _get_redis().set(f"{PROGRESS_PENDING_KEY}:{base}", 1, nx=True, ex=settings.PROGRESS_PENDING_TTL):
+            return False
+    except redis.RedisError:
+        logger.warning("Redis unavailable, queueing translation progress of %s without deduplication", base)
+    update_translation_progress.delay(file_paths)
+    return True
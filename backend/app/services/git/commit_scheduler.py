@@ -0,0 +1,154 @@
+"""
+Coalescing of the commit requests made by edits.
+
+Every save used to queue its own commit task, each doing a commit, a pull and a push to GitHub.
+`schedule_commit` appends the request to a Redis list per author instead and queues a single
+`flush_commits` task when the first request of a window arrives, or at once when the window
+holds COMMIT_BATCH_MAX_SIZE requests. The flush drains every list atomically and hands the batch
+to `commit_batch`, which makes one commit per author and one push for the whole batch. Requests
+keep their own id, under which the batch stores their result, so `/tasks/{id}/` still answers.
+"""
+
+import json
+import logging
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import redis
+from app.core.config import settings
+from app.tasks import commit, flush_commits
+from redis.exceptions import LockError
+
+logger = logging.getLogger(__name__)
+
+AUTHORS_KEY: str = "commit-queue:authors"
+REQUESTS_PREFIX: str = "commit-queue:requests:"
+SIZE_KEY: str = "commit-queue:size"
+SCHEDULED_KEY: str = "commit-queue:scheduled"
+WORK_DIR_LOCK: str = "commit-queue:work-dir"
+
+# Returns 2 when the batch is full and must be flushed now, 1 when the request opened a window
+# and a delayed flush has to be queued, 0 when a flush is already on its way.
+_ENQUEUE_SCRIPT: str = """
+redis.call("SADD", KEYS[1], ARGV[1])
+redis.call("RPUSH", KEYS[2], ARGV[2])
+local size = redis.call("INCR", KEYS[3])
+if size >= tonumber(ARGV[3]) then
+    return 2
+end
+if redis.call("SET", KEYS[4], "1", "NX", "EX", ARGV[4]) then
+    return 1
+end
+return 0
+"""
+
+_DRAIN_SCRIPT: str = """
+local requests = {}
+for _, author in ipairs(redis.call("SMEMBERS", KEYS[1])) do
+    local key = ARGV[1] .. author
+    for _, request in ipairs(redis.call("LRANGE", key, 0, -1)) do
+        table.insert(requests, request)
+    end
+    redis.call("DEL", key)
+end
+redis.call("DEL", KEYS[1], KEYS[2], KEYS[3])
+return requests
+"""
+
+_client: redis.Redis | None = None
+
+
+def _get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, decode_responses=True
+        )
+    return _client
+
+
+def schedule_commit(user: dict, file_paths: list[str], message: str, add: bool = True) -> str:
+    """Queue a commit of file_paths by user and return the id its status is reported under."""
+    file_paths = [file_paths] if isinstance(file_paths, str) else [str(path) for path in file_paths]
+    window: int = settings.COMMIT_BATCH_WINDOW_SECONDS
+    if window <= 0:
+        return commit.delay(user, file_paths, message, add).id
+
+    request_id: str = str(uuid.uuid4())
+    request: dict[str, Any] = {"id": request_id, "user": user, "paths": file_paths, "message": message, "add": add}
+    github_id: str = str(user["github_id"])
+    try:
+        action: int = _get_client().eval(
+            _ENQUEUE_SCRIPT,
+            4,
+            AUTHORS_KEY,
+            f"{REQUESTS_PREFIX}{github_id}",
+            SIZE_KEY,
+            SCHEDULED_KEY,
+            github_id,
+            json.dumps(request),
+            settings.COMMIT_BATCH_MAX_SIZE,
+            # Outlives the window so a flush delayed by a backlog is not queued twice, yet expires if it was lost.
+            window * 10,
+        )
+    except redis.RedisError:
+        logger.warning("Commit queue unavailable, committing %s on its own", file_paths, exc_info=True)
+        return commit.delay(user, file_paths, message, add).id
+
+    if action == 2:
+        flush_commits.delay()
+    elif action == 1:
+        flush_commits.apply_async(countdown=window)
+    return request_id
+
+
+@contextmanager
+def work_dir_lock() -> Iterator[None]:
+    """
+    Hold the lock of the unpublished checkout and its index while committing to it.
+
+    The commit queue has a single worker, but PR tasks commit the files they publish first, from
+    several processes. A commit written from an index another process changed in the meantime
+    would revert that process's commit, so every writer takes this lock. Raises TimeoutError
+    when it is not free within WORK_DIR_LOCK_TIMEOUT; without Redis the write goes ahead unlocked.
+    """
+    timeout: int = settings.WORK_DIR_LOCK_TIMEOUT
+    lock = _get_client().lock(WORK_DIR_LOCK, timeout=timeout, blocking_timeout=timeout)
+    try:
+        acquired: bool | None = lock.acquire()
+    except redis.RedisError:
+        logger.warning("Redis unavailable, writing the unpublished checkout without a lock", exc_info=True)
+        acquired = None
+    if acquired is False:
+        raise TimeoutError("Timed out waiting for the lock of the unpublished checkout")
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except (LockError, redis.RedisError):
+                logger.warning("Failed to release the lock of the unpublished checkout", exc_info=True)
+
+
+def drain() -> list[dict[str, Any]]:
+    """Take every queued request, grouped by author in the order they were made."""
+    requests: list[str] = _get_client().eval(_DRAIN_SCRIPT, 3, AUTHORS_KEY, SIZE_KEY, SCHEDULED_KEY, REQUESTS_PREFIX)
+    return [json.loads(request) for request in requests]
+
+
+def group_by_author(requests: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    groups: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for request in requests:
+        groups[str(request["user"]["github_id"])].append(request)
+    return groups
+
+
+def get_batch_message(username: str, requests: list[dict[str, Any]]) -> str:
+    """The message of a single request, or a summary listing every distinct message of the batch."""
+    messages: list[str] = list(dict.fromkeys(request["message"] for request in requests))
+    if len(messages) == 1:
+        return messages[0]
+    return f"{len(requests)} edits by {username}\n\n" + "\n".join(f"- {message}" for message in messages)
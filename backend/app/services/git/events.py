@@ -0,0 +1,134 @@
+"""
+Change events of the git tasks, kept in a Redis stream.
+
+The commit, pull and pr tasks know which files they changed. They append a GitEvent to the
+stream and queue `consume_git_events`, which reads the stream through a consumer group and
+brings the derived state up to date from the event alone: translation progress and the unread
+counts of the notification streams. An entry is acknowledged once every consumer handled it;
+entries of a worker that died are claimed by the next run, so no change is lost or rescanned.
+"""
+
+import json
+import logging
+import os
+import socket
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+import redis
+from app.core.config import settings
+from app.services.notifications.broadcaster import publish_git_event
+from app.services.projects.progress import ProgressMaterializer
+from search.utils import muid_from_relative_path
+
+logger = logging.getLogger(__name__)
+
+STREAM: str = "git-events"
+GROUP: str = "git-event-consumers"
+
+_client: redis.Redis | None = None
+
+
+def _get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, decode_responses=True
+        )
+    return _client
+
+
+@dataclass(frozen=True)
+class GitEvent:
+    kind: str
+    branch: str
+    author: str
+    paths: tuple[str, ...]
+    before: str | None = None
+    after: str | None = None
+    muids: tuple[str, ...] = field(default=())
+
+    @classmethod
+    def create(
+        cls,
+        kind: str,
+        branch: str,
+        author: str,
+        paths: Iterable[Path | str],
+        before: Any = None,
+        after: Any = None,
+    ) -> "GitEvent":
+        relative: list[str] = sorted({_relative(path) for path in paths})
+        muids: set[str | None] = {muid_from_relative_path(path) for path in relative}
+        return cls(
+            kind=kind,
+            branch=branch,
+            author=author,
+            paths=tuple(relative),
+            before=str(before) if before is not None else None,
+            after=str(after) if after is not None else None,
+            muids=tuple(sorted(muid for muid in muids if muid)),
+        )
+
+    def to_fields(self) -> dict[str, str]:
+        return {"event": json.dumps(asdict(self))}
+
+    @classmethod
+    def from_fields(cls, fields: dict[str, str]) -> "GitEvent":
+        data: dict[str, Any] = json.loads(fields["event"])
+        return cls(**{**data, "paths": tuple(data["paths"]), "muids": tuple(data["muids"])})
+
+
+def _relative(path: Path | str) -> str:
+    path = Path(path)
+    for work_dir in (settings.WORK_DIR, settings.PUBLISHED_DIR):
+        if path.is_relative_to(work_dir):
+            return str(path.relative_to(work_dir))
+    return str(path)
+
+
+def publish(event: GitEvent) -> bool:
+    """Append the event to the stream. Returns False when Redis could not store it."""
+    try:
+        _get_client().xadd(STREAM, event.to_fields(), maxlen=settings.GIT_EVENTS_MAXLEN, approximate=True)
+    except redis.RedisError:
+        logger.warning("Failed to publish git event %s", event, exc_info=True)
+        return False
+    return True
+
+
+def handle(event: GitEvent) -> None:
+    """Bring everything derived from the unpublished tree up to date with one event."""
+    if event.branch != "unpublished":
+        return
+    if event.paths:
+        ProgressMaterializer().update(event.paths)
+    publish_git_event()
+
+
+def consume(count: int = 100) -> int:
+    """Handle every pending event of the consumer group and return how many were handled."""
+    client: redis.Redis = _get_client()
+    try:
+        client.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    consumer: str = f"{socket.gethostname()}-{os.getpid()}"
+    # Entries delivered to a worker that died before acknowledging them are taken over first.
+    _, entries, *_ = client.xautoclaim(
+        STREAM, GROUP, consumer, min_idle_time=settings.GIT_EVENTS_CLAIM_IDLE_SECONDS * 1000, count=count
+    )
+    handled: int = 0
+    while True:
+        for entry_id, fields in entries:
+            # Trimmed entries come back from xautoclaim without fields; they only need the ack.
+            if fields:
+                handle(GitEvent.from_fields(fields))
+                handled += 1
+            client.xack(STREAM, GROUP, entry_id)
+        response = client.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=count)
+        entries = response[0][1] if response else []
+        if not entries:
+            return handled
@@ -1,14 +1,18 @@
 from pathlib import Path
+from threading import Lock
 from typing import Literal
+from uuid import uuid4
 
 import app.services.git.utils as utils
 from app.core.config import settings
 from app.db.schemas.user import UserBase
+from search.utils import FileChange
 from github import Github
 from github.PaginatedList import PaginatedList
 from github.PullRequest import PullRequest
 from pygit2 import (
     GIT_CHECKOUT_FORCE,
+    GIT_DELTA_ADDED,
     GIT_DELTA_DELETED,
     GIT_MERGE_ANALYSIS_FASTFORWARD,
     GIT_MERGE_ANALYSIS_NORMAL,
@@ -21,14 +25,102 @@ from pygit2 import (
     GIT_STATUS_WT_NEW,
     Commit,
     GitError,
+    Index,
+    IndexEntry,
+    Object,
     Oid,
+    Remote,
     RemoteCallbacks,
     Repository,
     Signature,
+    Tree,
     UserPass,
 )
 
 
+_repositories: dict[str, Repository] = {}
+_github: Github | None = None
+_handles_lock = Lock()
+
+
+def get_repository(path: Path | str) -> Repository:
+    """
+    Return the process wide handle of a repository.
+
+    Opening a repository and loading its index is most of the cost of a small commit task, so
+    every GitManager of a worker shares one handle per path. The index is reloaded from disk
+    whenever a GitManager takes the handle, so entries a failed task staged in memory without
+    writing them never end up in the next task's commit.
+    """
+    key: str = str(path)
+    with _handles_lock:
+        repo: Repository | None = _repositories.get(key)
+        if repo is None:
+            repo = _repositories[key] = Repository(key)
+    repo.index.read(True)
+    return repo
+
+
+def get_github() -> Github:
+    """Return the process wide GitHub client, whose pooled session keeps connections alive."""
+    global _github
+    with _handles_lock:
+        if _github is None:
+            _github = Github(settings.GITHUB_TOKEN, pool_size=settings.GITHUB_POOL_SIZE, per_page=100)
+        return _github
+
+
+class OpenPullRequests:
+    """
+    Open pull requests against published, listed once for the lifetime of a GitManager.
+
+    Choosing the branch of a PR task used to query GitHub for every file head, twice, and to
+    page through the files of a PR for every path. The open PRs are now listed with a single
+    paginated call on first use, and the files of a PR are fetched once when first asked for.
+    """
+
+    def __init__(self, github: Github, repo_owner: str) -> None:
+        self.github = github
+        self.repo_owner = repo_owner
+        self._by_head: dict[str, PullRequest] | None = None
+        self._files: dict[int, set[Path]] = {}
+
+    def _get_by_head(self) -> dict[str, PullRequest]:
+        if self._by_head is None:
+            pulls = self.github.get_repo(settings.GITHUB_REPO).get_pulls(state="open", base="published")
+            self._by_head = {pr.head.label: pr for pr in pulls}
+        return self._by_head
+
+    def _label(self, head: str) -> str:
+        return head if ":" in head else f"{self.repo_owner}:{head}"
+
+    def get(self, head: str) -> PullRequest | None:
+        return self._get_by_head().get(self._label(head))
+
+    def get_files(self, pr: PullRequest) -> set[Path]:
+        if pr.number not in self._files:
+            self._files[pr.number] = {Path(file.filename) for file in pr.get_files()}
+        return self._files[pr.number]
+
+    def add(self, pr: PullRequest) -> None:
+        self._get_by_head()[pr.head.label] = pr
+
+    def discard(self, pr: PullRequest) -> None:
+        self._get_by_head().pop(pr.head.label, None)
+        self._files.pop(pr.number, None)
+
+
+class PushCallbacks(RemoteCallbacks):
+    """Credentials for a push that raise when the remote rejects a reference update."""
+
+    def __init__(self, username: str, token: str) -> None:
+        super().__init__(credentials=UserPass(username, token))
+
+    def push_update_reference(self, refname: str, message: str | None) -> None:
+        if message:
+            raise GitError(f"Push to {refname} rejected: {message}")
+
+
 class GitManager:
     _protected_branches = ("published", "unpublished")
     _git_status = (
@@ -42,12 +134,23 @@ class GitManager:
 
     def __init__(self, published: Path, unpublished: Path, user: UserBase) -> None:
         self.user = user
-        self.published: Repository = Repository(published)
-        self.unpublished: Repository = Repository(unpublished)
-        self.author: Signature = Signature(name=user.username, email=user.email)
-        self.committer: Signature = Signature(name=settings.GITHUB_USERNAME, email=settings.GITHUB_EMAIL)
-        self.github: Github = Github(settings.GITHUB_TOKEN)
+        self.published: Repository = get_repository(published)
+        self.unpublished: Repository = get_repository(unpublished)
+        self.github: Github = get_github()
         self.repo_owner: str = settings.GITHUB_REPO.split("/")[0]
+        self.changes: list[FileChange] = []
+        self.pull_requests = OpenPullRequests(self.github, self.repo_owner)
+        # Tree entry oids by commit; a commit never changes, so entries stay valid.
+        self._blob_ids: dict[Oid, dict[str, Oid | None]] = {}
+
+    @property
+    def author(self) -> Signature:
+        # Signatures carry their creation time, so they are made when a commit needs them.
+        return Signature(name=self.user.username, email=self.user.email)
+
+    @property
+    def committer(self) -> Signature:
+        return Signature(name=settings.GITHUB_USERNAME, email=settings.GITHUB_EMAIL)
 
     def pull(
         self, branch: Repository = "published", force: bool = False, remote_name: str = "origin"
@@ -58,11 +161,14 @@ class GitManager:
         branch_name = branch.head.shorthand
         for remote in branch.remotes:
             if remote.name == remote_name:
-                remote.fetch()
+                if GitManager.needs_fetch(branch, remote, branch_name):
+                    GitManager.fetch(remote)
                 remote_hash_id = branch.lookup_reference(f"refs/remotes/{remote_name}/{branch_name}").target
-                modified_files = self.get_filenames_from_diff(
-                    str(branch.revparse_single("HEAD").id), remote_hash_id, branch
-                )
+                head_id: Oid = branch.revparse_single("HEAD").id
+                self.changes = []
+                if head_id != remote_hash_id:
+                    self.changes = self.get_changes_from_diff(str(head_id), remote_hash_id, branch)
+                modified_files = [change.path for change in self.changes]
                 if force:
                     branch.checkout_tree(branch.get(remote_hash_id), strategy=GIT_CHECKOUT_FORCE)
                     branch.head.set_target(remote_hash_id)
@@ -103,6 +209,40 @@ class GitManager:
                     branch.state_cleanup()
                     raise GitError(f"Unexpected merge behaviour")
 
+    @staticmethod
+    def get_remote_head(remote: Remote, branch_name: str) -> Oid | None:
+        """The commit a branch points to on the remote, read from its reference advertisement alone."""
+        for head in remote.ls_remotes():
+            if head["name"] == f"refs/heads/{branch_name}":
+                return head["oid"]
+        return None
+
+    @staticmethod
+    def needs_fetch(repo: Repository, remote: Remote, branch_name: str) -> bool:
+        """
+        Whether the remote branch moved since it was last fetched.
+
+        Every commit task pulled, and every pull fetched, so a burst of saves meant a fetch from
+        GitHub per save with nothing new upstream. Listing the remote references is a single
+        round trip without negotiation, and the fetch is skipped when the branch head there is
+        the one already tracked.
+        """
+        tracking = repo.references.get(f"refs/remotes/{remote.name}/{branch_name}")
+        if tracking is None:
+            return True
+        try:
+            return GitManager.get_remote_head(remote, branch_name) != tracking.target
+        except GitError:
+            # Let the fetch fail, or succeed, the way it did before.
+            return True
+
+    @staticmethod
+    def fetch(remote: Remote) -> None:
+        if settings.GIT_FETCH_DEPTH > 0:
+            remote.fetch(depth=settings.GIT_FETCH_DEPTH)
+        else:
+            remote.fetch()
+
     def checkout(self, name: str = "published", force: bool = False) -> None:
         self.published.remotes["origin"].fetch(prune=True)
         if not self.published.branches.get(name):
@@ -113,16 +253,6 @@ class GitManager:
             self.published.head.set_target(ref.target)
         self.published.checkout(ref)
 
-    def copy_files(self, file_paths: list[Path] | None = None) -> list[Path]:
-        paths: list[Path] = file_paths or []
-        changed_files = [path for path in paths if self.has_changes("unpublished", path)]
-        for path in changed_files:
-            file_content: bytes | None = GitManager.read_file(self.unpublished, path)
-            GitManager.write_file(Path(self.published.workdir) / path, file_content)
-        if not GitManager.add(self.published, changed_files):
-            return []
-        return changed_files
-
     def create_local_branch(self, name: str) -> bool:
         remote_branch_ref = f"refs/remotes/origin/{name}"
         if f"refs/heads/{name}" in self.published.references:
@@ -146,7 +276,7 @@ class GitManager:
         repo = self.github.get_repo(settings.GITHUB_REPO)
         if self.is_pr_open(head):
             return
-        repo.create_pull(title=title, body=body, base=base, head=head)
+        self.pull_requests.add(repo.create_pull(title=title, body=body, base=base, head=head))
 
     def get_prs(self, head: str, state="open") -> PaginatedList[PullRequest]:
         return self.github.get_repo(settings.GITHUB_REPO).get_pulls(
@@ -154,18 +284,21 @@ class GitManager:
         )
 
     def get_pr(self, head: str, state="open") -> PullRequest | None:
+        if state == "open":
+            return self.pull_requests.get(head)
         if (prs := self.get_prs(head, state)) and prs.totalCount > 0:
             return prs[0]
 
     def is_pr_open(self, head: str) -> bool:
-        if prs := self.get_prs(head):
-            return prs.totalCount > 0
-        return False
+        return self.pull_requests.get(head) is not None
+
+    def is_file_in_open_pr(self, pr: PullRequest, file_path: Path) -> bool:
+        return pr.state != "closed" and Path(file_path) in self.pull_requests.get_files(pr)
 
     def handle_single_file(self, path: Path, branch, message, pr_title: str = None, pr_body: str = None):
         if not self.has_changes(branch, path):
             return
-        if (pr := self.get_pr(branch)) and GitManager.is_file_in_pr(pr, path):
+        if (pr := self.get_pr(branch)) and self.is_file_in_open_pr(pr, path):
             self._process_branch_changes(pr.head.ref, [path], message)
             self._cleanup(branch)
             return
@@ -175,14 +308,16 @@ class GitManager:
     def handle_multiple_files(self, paths: list[Path], branch, message, pr_title: str = None, pr_body: str = None):
         project_pr = self.get_pr(branch)
         paths_heads = utils.get_file_heads(paths)
-        file_prs = [self.get_pr(head) for head in paths_heads.values() if self.is_pr_open(head)]
+        file_prs = [pr for head in paths_heads.values() if (pr := self.get_pr(head))]
         for pr in file_prs:
             GitManager.close_pr(pr)
+            self.pull_requests.discard(pr)
             self.delete_remote_branch(pr.head.ref)
-        changed_files = [path for path in paths if self.has_changes(branch, path)]
+        changed_paths: set[Path] = self.changed_paths(branch, paths)
+        changed_files = [path for path in paths if Path(path) in changed_paths]
         files_in_pr = []
         if project_pr:
-            files_in_pr = [path for path in changed_files if GitManager.is_file_in_pr(project_pr, path)]
+            files_in_pr = [path for path in changed_files if self.is_file_in_open_pr(project_pr, path)]
             if files_in_pr:
                 self._process_branch_changes(project_pr.head.ref, files_in_pr, message)
         project_files = list(set(changed_files) - set(files_in_pr))
@@ -191,9 +326,64 @@ class GitManager:
             self.open_pr(title=pr_title, body=pr_body, head=f"{self.repo_owner}:{branch}")
 
     def has_changes(self, branch_name: str, path: Path) -> bool:
-        unpublished_commit: bytes = GitManager.get_latest_commit(self.unpublished, path)
-        published_commit: bytes = GitManager.get_latest_commit(self.published, path, branch_name)
-        return unpublished_commit != published_commit
+        return self.get_blob_id(self.unpublished, path) != self.get_blob_id(self.published, path, branch_name)
+
+    def get_blob_id(self, repo: Repository, path: Path, branch_name: str = "unpublished") -> Oid | None:
+        """Oid of a file on a branch, which identifies its content without reading it."""
+        branch = repo.branches.get(branch_name)
+        if not branch:
+            return None
+        entries: dict[str, Oid | None] = self._blob_ids.setdefault(branch.target, {})
+        key: str = Path(path).as_posix()
+        if key not in entries:
+            try:
+                entries[key] = branch.peel(Commit).tree[key].id
+            except KeyError:
+                entries[key] = None
+        return entries[key]
+
+    def changed_paths(self, branch_name: str, file_paths: list[Path] | None = None) -> set[Path]:
+        """
+        Files that differ between unpublished and branch_name of published, from one walk over both trees.
+
+        Subtrees with the same oid are skipped whole, so only directories that changed are read.
+        With file_paths, only those files and the directories leading to them are visited.
+        """
+        trees: list[Tree | None] = []
+        for repo, name in ((self.published, branch_name), (self.unpublished, "unpublished")):
+            branch = repo.branches.get(name)
+            trees.append(branch.peel(Commit).tree if branch else None)
+        wanted: set[Path] | None = {Path(path) for path in file_paths} if file_paths is not None else None
+        directories: set[Path] = {parent for path in wanted or () for parent in path.parents}
+        changed: set[Path] = set()
+        GitManager._diff_trees(*trees, Path(), wanted, directories, changed)
+        return changed
+
+    @staticmethod
+    def _diff_trees(
+        old: Tree | None,
+        new: Tree | None,
+        prefix: Path,
+        wanted: set[Path] | None,
+        directories: set[Path],
+        changed: set[Path],
+    ) -> None:
+        if old is not None and new is not None and old.id == new.id:
+            return
+        old_entries: dict[str, Object] = {entry.name: entry for entry in old} if old is not None else {}
+        new_entries: dict[str, Object] = {entry.name: entry for entry in new} if new is not None else {}
+        for name in old_entries.keys() | new_entries.keys():
+            path: Path = prefix / name
+            old_entry, new_entry = old_entries.get(name), new_entries.get(name)
+            if old_entry is not None and new_entry is not None and old_entry.id == new_entry.id:
+                continue
+            old_tree = old_entry if isinstance(old_entry, Tree) else None
+            new_tree = new_entry if isinstance(new_entry, Tree) else None
+            if (old_tree or new_tree) and (wanted is None or path in directories):
+                GitManager._diff_trees(old_tree, new_tree, path, wanted, directories, changed)
+            is_file = (old_entry is not None and old_tree is None) or (new_entry is not None and new_tree is None)
+            if is_file and (wanted is None or path in wanted):
+                changed.add(path)
 
     def process_files(self, branch, message, pr_title, pr_body, file_paths: list[Path] | None = None) -> str:
         paths: list[Path] = file_paths or []
@@ -208,7 +398,9 @@ class GitManager:
         return url
 
     def _cleanup(self, branch: str) -> bool:
-        self.checkout(force=True)
+        # PR branches are built without a checkout; only a clone left on another branch is reset.
+        if self.published.head_is_detached or self.published.head.shorthand != "published":
+            self.checkout(force=True)
         if not self._is_branch_protected(branch):
             self.delete_local_branch(branch)
             return True
@@ -217,10 +409,64 @@ class GitManager:
     def _process_branch_changes(self, branch, paths: list[Path], message: str) -> None:
         if not paths:
             return
-        self.checkout(branch)
-        changed_files = self.copy_files(paths)
-        if changed_files and GitManager.commit(self.published, self.author, self.committer, message, changed_files):
-            GitManager.push(self.published, branch=branch)
+        self.published.remotes["origin"].fetch(prune=True)
+        if commit_id := self.build_commit(branch, paths, message):
+            self.push_commit(commit_id, branch)
+
+    def get_base_commit(self, branch: str) -> Commit:
+        """The commit a PR branch continues from: its remote head, or published for a new branch."""
+        for name in (f"refs/remotes/origin/{branch}", "refs/remotes/origin/published"):
+            if name in self.published.references:
+                return self.published.lookup_reference(name).peel(Commit)
+        return self.published.revparse_single("HEAD").peel(Commit)
+
+    def build_commit(self, branch: str, paths: list[Path], message: str) -> Oid | None:
+        """
+        Commit the files as they are on unpublished on top of branch, in the object database only.
+
+        Checking a PR branch out rewrote the whole working tree of the published clone twice per
+        task and kept PR tasks from running side by side. The tree is now built in an in-memory
+        index from the base commit, with the blobs of the changed files copied over from
+        unpublished, so neither the working tree nor HEAD of published is touched.
+        """
+        base: Commit = self.get_base_commit(branch)
+        unpublished = self.unpublished.branches.get("unpublished")
+        source: Tree | None = unpublished.peel(Commit).tree if unpublished else None
+        index = Index()
+        index.read_tree(base.tree)
+        for path in paths:
+            key: str = Path(path).as_posix()
+            try:
+                entry: Object = source[key]
+            except (KeyError, TypeError):
+                if key in index:
+                    index.remove(key)
+                continue
+            if entry.id not in self.published:
+                self.published.create_blob(entry.data)
+            index.add(IndexEntry(key, entry.id, entry.filemode))
+        tree: Oid = index.write_tree(self.published)
+        if tree == base.tree.id:
+            return None
+        return self.published.create_commit(None, self.author, self.committer, message, tree, [base.id])
+
+    def push_commit(self, commit_id: Oid, branch: str) -> None:
+        """
+        Push a commit built by build_commit to branch on origin.
+
+        The commit is pushed from a reference of its own, so tasks never share a local branch, and
+        without force: a task that built on a head another task has moved since is rejected and
+        retried on top of it.
+        """
+        ref = self.published.create_reference(f"refs/builds/{branch}/{uuid4().hex}", commit_id)
+        try:
+            self.published.remotes["origin"].push(
+                [f"{ref.name}:refs/heads/{branch}"],
+                callbacks=PushCallbacks(settings.GITHUB_USERNAME, settings.GITHUB_TOKEN),
+            )
+        finally:
+            ref.delete()
+        self.published.create_reference(f"refs/remotes/origin/{branch}", commit_id, force=True)
 
     def _is_branch_protected(self, name: str) -> bool:
         return name in self._protected_branches
@@ -244,14 +490,19 @@ class GitManager:
 
     @staticmethod
     def get_filenames_from_diff(commit_id_1: str, commit_id_2: str, branch: Repository) -> list[Path]:
+        return [change.path for change in GitManager.get_changes_from_diff(commit_id_1, commit_id_2, branch)]
+
+    @staticmethod
+    def get_changes_from_diff(commit_id_1: str, commit_id_2: str, branch: Repository) -> list[FileChange]:
         diff = branch.diff(commit_id_1, commit_id_2)
-        if diff.stats.files_changed == 0:
-            return []
+        work_dir = Path(branch.path).parent
         return [
-            Path(branch.path).parent / Path(patch.delta.new_file.path)
-            if patch.delta.status != GIT_DELTA_DELETED
-            else Path(branch.path).parent / patch.delta.old_file.path
-            for patch in diff
+            FileChange(
+                path=work_dir / (delta.old_file.path if delta.status == GIT_DELTA_DELETED else delta.new_file.path),
+                old_oid=None if delta.status == GIT_DELTA_ADDED else delta.old_file.id,
+                new_oid=None if delta.status == GIT_DELTA_DELETED else delta.new_file.id,
+            )
+            for delta in diff.deltas
         ]
 
     @staticmethod
@@ -289,14 +540,6 @@ class GitManager:
             return None
         return data
 
-    @staticmethod
-    def write_file(dest_path: Path, data: bytes) -> None:
-        if not data:
-            return None
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(dest_path, "wb") as f:
-            f.write(data)
-
     @staticmethod
     def commit(
         repo: Repository, author: Signature, committer: Signature, message: str, paths: list[Path] = None
@@ -329,12 +572,6 @@ class GitManager:
             return None
         return data
 
-    @staticmethod
-    def is_file_in_pr(pr: PullRequest, file_path: Path) -> bool:
-        if pr.state == "closed":
-            return False
-        return any(file_path == Path(file.filename) for file in pr.get_files())
-
     @staticmethod
     def has_status_changed(repo: Repository, paths: list[Path] = None) -> bool:
         if paths:
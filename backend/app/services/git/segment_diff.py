@@ -0,0 +1,124 @@
+import difflib
+import json
+import re
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Literal
+
+from app.core.config import settings
+from pydantic import BaseModel
+from pygit2 import Oid
+
+_TOKEN_PATTERN = re.compile(r"\s+|\S+")
+
+
+class InlineChange(BaseModel):
+    op: Literal["equal", "insert", "delete"]
+    text: str
+
+
+class SegmentChange(BaseModel):
+    segment_id: str
+    change: Literal["added", "removed", "modified"]
+    old: str | None = None
+    new: str | None = None
+    inline: list[InlineChange] | None = None
+
+
+def parse_segments(data: bytes | None) -> dict[str, str]:
+    """Segments of a JSON file by id; values that are not strings are compared as JSON."""
+    if data is None:
+        return {}
+    segments: Any = json.loads(data)
+    if not isinstance(segments, dict):
+        raise ValueError("Not a segment file")
+    return {
+        str(key): value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        for key, value in segments.items()
+    }
+
+
+def diff_words(old: str, new: str) -> list[InlineChange]:
+    """Word level changes from old to new, whitespace runs counting as words."""
+    old_tokens: list[str] = _TOKEN_PATTERN.findall(old)
+    new_tokens: list[str] = _TOKEN_PATTERN.findall(new)
+    changes: list[InlineChange] = []
+
+    def append(op: str, tokens: list[str]) -> None:
+        if not tokens:
+            return
+        if changes and changes[-1].op == op:
+            changes[-1].text += "".join(tokens)
+        else:
+            changes.append(InlineChange(op=op, text="".join(tokens)))
+
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            append("equal", old_tokens[old_start:old_end])
+            continue
+        append("delete", old_tokens[old_start:old_end])
+        append("insert", new_tokens[new_start:new_end])
+    return changes
+
+
+def diff_segments(old: dict[str, str], new: dict[str, str], inline: bool = False) -> list[SegmentChange]:
+    """Changed, added and removed segments in the order of the new file, removed ones last."""
+    changes: list[SegmentChange] = []
+    for segment_id, value in new.items():
+        if segment_id not in old:
+            changes.append(SegmentChange(segment_id=segment_id, change="added", new=value))
+        elif old[segment_id] != value:
+            changes.append(
+                SegmentChange(
+                    segment_id=segment_id,
+                    change="modified",
+                    old=old[segment_id],
+                    new=value,
+                    inline=diff_words(old[segment_id], value) if inline else None,
+                )
+            )
+    changes.extend(
+        SegmentChange(segment_id=segment_id, change="removed", old=value)
+        for segment_id, value in old.items()
+        if segment_id not in new
+    )
+    return changes
+
+
+class SegmentDiffCache:
+    """
+    Segment diffs by the oids of both blobs.
+
+    A blob never changes under its oid, so a diff stays valid for as long as it is kept; the
+    least recently used ones are dropped beyond `maxsize`. Blobs are only read and parsed when
+    the pair is not cached.
+    """
+
+    def __init__(self, maxsize: int = settings.SEGMENT_DIFF_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[Oid | None, Oid | None, bool], list[SegmentChange]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(
+        self,
+        old_oid: Oid | None,
+        new_oid: Oid | None,
+        inline: bool,
+        load: Callable[[], tuple[bytes | None, bytes | None]],
+    ) -> list[SegmentChange]:
+        key = (old_oid, new_oid, inline)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        old, new = load()
+        changes: list[SegmentChange] = diff_segments(parse_segments(old), parse_segments(new), inline)
+        with self._lock:
+            self._entries[key] = changes
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return changes
+
+
+segment_diff_cache = SegmentDiffCache()
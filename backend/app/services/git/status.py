@@ -0,0 +1,242 @@
+import os
+from pathlib import Path
+from threading import Lock
+
+from app.core.config import settings
+from app.services.git.manager import get_repository
+from app.services.git.segment_diff import SegmentChange, segment_diff_cache
+from pygit2 import (
+    GIT_STATUS_INDEX_DELETED,
+    GIT_STATUS_INDEX_MODIFIED,
+    GIT_STATUS_INDEX_NEW,
+    GIT_STATUS_WT_DELETED,
+    GIT_STATUS_WT_MODIFIED,
+    GIT_STATUS_WT_NEW,
+    GitError,
+    Oid,
+    Patch,
+    Repository,
+    Tree,
+    hash as hash_blob,
+    hashfile,
+)
+
+BASE_REFS: tuple[str, ...] = ("refs/remotes/origin/published", "refs/heads/published")
+MAX_TREES: int = 4
+
+
+class WorkTreeStatus:
+    """
+    Changes of the working tree against the published base, computed in process.
+
+    The Publication Queue used to fork `git diff --name-status` and then have `repo.status` hash
+    the whole tree on every load. Trees are flattened once per commit oid, and a file is only
+    hashed again when its mtime or size changed since it was last seen, so a refresh is a walk of
+    stat calls and dictionary comparisons against the index, HEAD and the base branch.
+    """
+
+    def __init__(self, path: Path = settings.WORK_DIR):
+        self.path = path
+        self._lock = Lock()
+        self._trees: dict[Oid | None, dict[str, Oid]] = {}
+        self._stats: dict[str, tuple[int, int, Oid]] = {}
+
+    @staticmethod
+    def get_base_ref(repo: Repository) -> str:
+        """The reference changes are compared against, as `git diff <ref>` did."""
+        for name in BASE_REFS:
+            if name in repo.references:
+                return name
+        return "HEAD"
+
+    @staticmethod
+    def _resolve(repo: Repository, ref: str) -> Oid | None:
+        try:
+            return repo.revparse_single(ref).peel(Tree).id
+        except (GitError, KeyError):
+            # An unborn HEAD has no tree; everything in the working tree is then new.
+            return None
+
+    def _get_tree(self, repo: Repository, ref: str) -> dict[str, Oid]:
+        tree_id: Oid | None = self._resolve(repo, ref)
+        if tree_id not in self._trees:
+            if len(self._trees) >= MAX_TREES:
+                self._trees.pop(next(iter(self._trees)))
+            files: dict[str, Oid] = {}
+            if tree_id is not None:
+                self._flatten(repo, repo[tree_id], "", files)
+            self._trees[tree_id] = files
+        return self._trees[tree_id]
+
+    def _flatten(self, repo: Repository, tree: Tree, prefix: str, files: dict[str, Oid]) -> None:
+        for entry in tree:
+            if entry.type_str == "tree":
+                self._flatten(repo, repo[entry.id], f"{prefix}{entry.name}/", files)
+            elif entry.type_str == "blob":
+                # Only files are compared and read; a submodule's commit is not in this repository.
+                files[f"{prefix}{entry.name}"] = entry.id
+
+    def _hash(self, path: str) -> Oid | None:
+        full_path: str = os.path.join(self.path, path)
+        try:
+            stat = os.stat(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            self._stats.pop(path, None)
+            return None
+        cached = self._stats.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        oid: Oid = hashfile(full_path)
+        self._stats[path] = (stat.st_mtime_ns, stat.st_size, oid)
+        return oid
+
+    def _scan(self) -> dict[str, Oid]:
+        files: dict[str, Oid] = {}
+        for current, dirs, names in os.walk(self.path):
+            # Hidden directories such as .git never show in the queue.
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            relative: str = os.path.relpath(current, self.path)
+            for name in names:
+                path: str = name if relative == "." else f"{relative}/{name}".replace(os.sep, "/")
+                if (oid := self._hash(path)) is not None:
+                    files[path] = oid
+        for path in self._stats.keys() - files.keys():
+            del self._stats[path]
+        return files
+
+    @staticmethod
+    def _get_flags(
+        repo: Repository,
+        path: str,
+        workdir: Oid | None,
+        index: Oid | None,
+        head: Oid | None,
+        base: Oid | None,
+    ) -> int:
+        flags: int = 0
+        if index != head:
+            if head is None:
+                flags |= GIT_STATUS_INDEX_NEW
+            elif index is None:
+                flags |= GIT_STATUS_INDEX_DELETED
+            else:
+                flags |= GIT_STATUS_INDEX_MODIFIED
+        if index is None:
+            if workdir is not None and not repo.path_is_ignored(path):
+                flags |= GIT_STATUS_WT_NEW
+        elif workdir is None:
+            flags |= GIT_STATUS_WT_DELETED
+        elif workdir != index:
+            flags |= GIT_STATUS_WT_MODIFIED
+        if flags:
+            return flags
+        # Committed but not yet published, which `git diff --name-status <base>` used to report.
+        if index is not None and base is None:
+            return GIT_STATUS_INDEX_NEW
+        if index is not None and index != base:
+            return GIT_STATUS_WT_MODIFIED
+        if index is None and base is not None:
+            return GIT_STATUS_WT_DELETED
+        return 0
+
+    def status(self) -> dict[str, int]:
+        """Status flags of every path that differs from the index, HEAD or the base branch."""
+        with self._lock:
+            repo: Repository = get_repository(self.path)
+            workdir: dict[str, Oid] = self._scan()
+            index: dict[str, Oid] = {entry.path: entry.id for entry in repo.index}
+            head: dict[str, Oid] = self._get_tree(repo, "HEAD")
+            base: dict[str, Oid] = self._get_tree(repo, self.get_base_ref(repo))
+            statuses: dict[str, int] = {}
+            for path in workdir.keys() | index.keys() | head.keys() | base.keys():
+                oids = (workdir.get(path), index.get(path), head.get(path), base.get(path))
+                if len(set(oids)) > 1 and (flags := self._get_flags(repo, path, *oids)):
+                    statuses[path] = flags
+            return statuses
+
+    def file_status(self, path: str) -> int:
+        with self._lock:
+            repo: Repository = get_repository(self.path)
+            try:
+                index: Oid | None = repo.index[path].id
+            except KeyError:
+                index = None
+            return self._get_flags(
+                repo,
+                path,
+                self._hash(path),
+                index,
+                self._get_tree(repo, "HEAD").get(path),
+                self._get_tree(repo, self.get_base_ref(repo)).get(path),
+            )
+
+    def diff(self, path: str, max_lines: int = 5000) -> str:
+        """Unified diff of a file against the base branch, formatted only up to max_lines."""
+        with self._lock:
+            repo: Repository = get_repository(self.path)
+            base: Oid | None = self._get_tree(repo, self.get_base_ref(repo)).get(path)
+            old: bytes | None = repo[base].data if base is not None else None
+        full_path: Path = self.path / path
+        new: bytes | None = full_path.read_bytes() if full_path.is_file() else None
+        if old == new:
+            return ""
+        patch: Patch = Patch.create_from(old, new, old_as_path=path, new_as_path=path)
+        return format_patch(patch, path, old is None, new is None, max_lines)
+
+    def segment_diff(self, path: str, inline: bool = False) -> list[SegmentChange]:
+        """Segments of a JSON file that differ from the base branch; ValueError for a directory."""
+        if (self.path / path).is_dir():
+            raise ValueError(f"{path} is not a file")
+        with self._lock:
+            repo: Repository = get_repository(self.path)
+            base: Oid | None = self._get_tree(repo, self.get_base_ref(repo)).get(path)
+        full_path: Path = self.path / path
+        # Keyed by the bytes actually read, so a file written meanwhile is never cached under a stale oid.
+        new: bytes | None = full_path.read_bytes() if full_path.is_file() else None
+        return segment_diff_cache.get(
+            base,
+            hash_blob(new) if new is not None else None,
+            inline,
+            lambda: (repo[base].data if base is not None else None, new),
+        )
+
+
+def format_patch(patch: Patch, path: str, added: bool, deleted: bool, max_lines: int) -> str:
+    lines: list[str] = [
+        f"diff --git a/{path} b/{path}",
+        "--- /dev/null" if added else f"--- a/{path}",
+        "+++ /dev/null" if deleted else f"+++ b/{path}",
+    ]
+    truncated: bool = False
+    for hunk in patch.hunks:
+        for line in [hunk.header, *hunk.lines]:
+            if len(lines) >= max_lines:
+                truncated = True
+                break
+            if isinstance(line, str):
+                lines.append(line.rstrip("\n"))
+            elif line.origin in "+- ":
+                lines.append(line.origin + line.content.rstrip("\n"))
+            else:
+                lines.append("\\ No newline at end of file")
+        if truncated:
+            break
+    text: str = "\n".join(lines)
+    if truncated:
+        # Counted from the patch statistics, so the lines left out are never formatted.
+        context, additions, deletions = patch.line_stats
+        total: int = 3 + len(patch.hunks) + context + additions + deletions
+        text += f"\n\n... (truncated, {max(total - len(lines), 1)} more lines)"
+    return text
+
+
+_worktree_status: WorkTreeStatus | None = None
+_worktree_status_lock = Lock()
+
+
+def get_worktree_status() -> WorkTreeStatus:
+    global _worktree_status
+    with _worktree_status_lock:
+        if _worktree_status is None:
+            _worktree_status = WorkTreeStatus()
+        return _worktree_status
@@ -7,6 +7,7 @@ from pathlib import Path
 from app.core.config import settings
 from app.db.schemas.user import UserBase
 from app.services.git.manager import GitManager
+from app.services.git.segment_diff import SegmentChange
 from pygit2 import (
     GIT_STATUS_INDEX_NEW,
     GIT_STATUS_INDEX_MODIFIED,
@@ -32,11 +33,11 @@ def get_branch_name(manager: GitManager, file_paths: list[Path] = None) -> str:
     project_head = get_project_head(paths[0])
     project_pr = manager.get_pr(project_head)
     file_heads = get_file_heads(paths)
-    file_heads_prs = [manager.get_pr(head) for head in file_heads.values() if manager.get_pr(head)]
+    file_heads_prs = [pr for head in file_heads.values() if (pr := manager.get_pr(head))]
     changed_files_heads = [head for path, head in file_heads.items() if manager.has_changes(head, path)]
 
     if len(paths) == 1:
-        if project_pr and GitManager.is_file_in_pr(project_pr, paths[0]):
+        if project_pr and manager.is_file_in_open_pr(project_pr, paths[0]):
             return project_head
         else:
             return list(file_heads.values())[0]
@@ -112,8 +113,14 @@ def find_mismatched_paths(file_paths: list[str] = None) -> tuple[bool, list[str]
     return len(mismatched_paths) == 0, mismatched_paths
 
 
+_safe_directories: set[str] = set()
+
+
 def ensure_safe_directory(repo_path: Path) -> None:
     repo_path_str = str(repo_path)
+    # The global git config only needs checking once per process.
+    if repo_path_str in _safe_directories:
+        return
     with contextlib.suppress(subprocess.CalledProcessError):
         result = subprocess.run(
             ["git", "config", "--global", "--get-all", "safe.directory"],
@@ -121,14 +128,13 @@ def ensure_safe_directory(repo_path: Path) -> None:
             text=True
         )
 
-        if repo_path_str in result.stdout.splitlines():
-            return
-
-        subprocess.run(
-            ["git", "config", "--global", "--add", "safe.directory", repo_path_str],
-            check=True,
-            capture_output=True
-        )
+        if repo_path_str not in result.stdout.splitlines():
+            subprocess.run(
+                ["git", "config", "--global", "--add", "safe.directory", repo_path_str],
+                check=True,
+                capture_output=True
+            )
+        _safe_directories.add(repo_path_str)
 
 
 class FileStatus(BaseModel):
@@ -148,6 +154,12 @@ class FileDiffResponse(BaseModel):
     status: str
 
 
+class SegmentDiffResponse(BaseModel):
+    path: str
+    status: str
+    changes: list[SegmentChange]
+
+
 def get_status_name(status_code: int) -> str:
     """Convert pygit2 status codes into readable status names."""
     status_map = {
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Iterable
+
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL: str = "notifications:events"
+RECONNECT_SECONDS: float = 5.0
+
+_client: redis.Redis | None = None
+
+
+def _get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD)
+    return _client
+
+
+def _publish(event: dict[str, Any]) -> None:
+    try:
+        _get_client().publish(CHANNEL, json.dumps(event))
+    except redis.RedisError:
+        logger.warning("Failed to publish notification event %s", event, exc_info=True)
+
+
+def publish_git_event() -> None:
+    """Tell every API worker that the unpublished history moved, which may change anyone's count."""
+    _publish({"type": "git"})
+
+
+def publish_user_event(github_ids: Iterable[int]) -> None:
+    """Tell every API worker that the notifications of these users changed."""
+    if github_ids := sorted({int(github_id) for github_id in github_ids}):
+        _publish({"type": "user", "github_ids": github_ids})
+
+
+class NotificationBroadcaster:
+    """
+    Unread counts for the notification streams of one API worker.
+
+    Streams used to recompute their user's count every 30 seconds each. The broadcaster listens
+    on a Redis channel fed by the git tasks and notification writes instead, recomputes the
+    count once per affected user and pushes it to that user's streams when it changed, so idle
+    streams cost nothing however many are open.
+    """
+
+    def __init__(self, count: Callable[[Any], int]):
+        self._count = count
+        self._queues: dict[int, set[asyncio.Queue]] = {}
+        self._users: dict[int, Any] = {}
+        self._counts: dict[int, int] = {}
+        self._pending: set[int] = set()
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def subscribe(self, user: Any) -> asyncio.Queue:
+        github_id = int(user.github_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._queues.setdefault(github_id, set()).add(queue)
+        self._users[github_id] = user
+        self._start()
+        if github_id in self._counts:
+            queue.put_nowait(("unread_count", {"unread_count": self._counts[github_id]}))
+        else:
+            await self._recompute(github_id)
+        return queue
+
+    def unsubscribe(self, user: Any, queue: asyncio.Queue) -> None:
+        github_id = int(user.github_id)
+        queues = self._queues.get(github_id, set())
+        queues.discard(queue)
+        if not queues:
+            # Events are not followed for users without streams, so their count would go stale.
+            self._queues.pop(github_id, None)
+            self._users.pop(github_id, None)
+            self._counts.pop(github_id, None)
+
+    def _start(self) -> None:
+        if self._tasks and not any(task.done() for task in self._tasks):
+            return
+        for task in self._tasks:
+            task.cancel()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._flush())]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _listen(self) -> None:
+        client = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD)
+        try:
+            while True:
+                try:
+                    async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                        await pubsub.subscribe(CHANNEL)
+                        # Events published while disconnected are lost; refresh everyone once.
+                        self._schedule(self._queues)
+                        async for message in pubsub.listen():
+                            self._handle(message["data"])
+                except redis.RedisError:
+                    logger.warning("Notification events unavailable, retrying", exc_info=True)
+                    await asyncio.sleep(RECONNECT_SECONDS)
+        finally:
+            await client.close()
+
+    def _handle(self, data: bytes) -> None:
+        try:
+            event: dict[str, Any] = json.loads(data)
+        except ValueError:
+            logger.warning("Ignoring malformed notification event %r", data)
+            return
+        if event.get("type") == "git":
+            self._schedule(self._queues)
+        elif event.get("type") == "user":
+            self._schedule(github_id for github_id in event.get("github_ids", []) if github_id in self._queues)
+
+    def _schedule(self, github_ids: Iterable[int]) -> None:
+        self._pending.update(github_ids)
+        if self._pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _flush(self) -> None:
+        # A single consumer, so a burst of events for the same users is recomputed once.
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending, self._pending = self._pending, set()
+            for github_id in pending:
+                await self._recompute(github_id)
+
+    async def _recompute(self, github_id: int) -> None:
+        user = self._users.get(github_id)
+        if user is None:
+            return
+        try:
+            count: int = await asyncio.to_thread(self._count, user)
+        except Exception as error:
+            self._send(github_id, ("stream_error", {"error": str(error)}))
+            return
+        if github_id in self._queues and self._counts.get(github_id) != count:
+            self._counts[github_id] = count
+            self._send(github_id, ("unread_count", {"unread_count": count}))
+
+    def _send(self, github_id: int, message: tuple[str, dict[str, Any]]) -> None:
+        for queue in self._queues.get(github_id, ()):
+            queue.put_nowait(message)
@@ -0,0 +1,226 @@
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Iterable
+
+from app.core.config import settings
+from app.services.git.segment_diff import SegmentChange, segment_diff_cache
+from pygit2 import GIT_SORT_TIME, Commit, GitError, Object, Oid, Repository, Tree
+
+logger = logging.getLogger(__name__)
+
+_HUNK_PATTERN = re.compile(r"@@.*?@@(.*)", re.DOTALL)
+
+
+@dataclass
+class CommitEntry:
+    """What the notifications feed shows of a commit; files and hunks are read on first use."""
+
+    oid: Oid
+    short_id: str
+    summary: str
+    author: str
+    author_time: int
+    author_offset: int
+    commit_time: int
+    is_merge: bool
+    _changes: dict[str, str] | None = field(default=None, repr=False)
+
+    @property
+    def date(self) -> str:
+        """Author date in the default format of git show, e.g. "Mon Mar 10 10:00:00 2025 +0000"."""
+        moment = datetime.fromtimestamp(self.author_time, timezone(timedelta(minutes=self.author_offset)))
+        return f"{moment:%a %b} {moment.day} {moment:%H:%M:%S %Y %z}"
+
+    def info(self, now: float | None = None) -> str:
+        """The line `git log --pretty=format:'%h %s (%cr)'` prints for the commit."""
+        return f"{self.short_id} {self.summary} ({relative_date(self.commit_time, now)})"
+
+
+class CommitIds:
+    """
+    Commit ids stored when notifications are marked done, matched by prefix with full oids.
+
+    Ids stored while the feed ran git log are git's abbreviation, which grows with the size of
+    the repository, while newer ones are the shorter short_id of libgit2; a prefix match reads
+    both as done.
+    """
+
+    def __init__(self, ids: Iterable[str]):
+        self.ids: set[str] = {commit_id.lower() for commit_id in ids}
+        self.lengths: set[int] = {len(commit_id) for commit_id in self.ids}
+
+    def __contains__(self, entry: CommitEntry) -> bool:
+        oid: str = str(entry.oid)
+        return any(oid[:length] in self.ids for length in self.lengths)
+
+
+def relative_date(timestamp: int, now: float | None = None) -> str:
+    """Port of git's show_date_relative, so relative dates read as they did with git log."""
+    diff: int = max(int((now if now is not None else time.time()) - timestamp), 0)
+    if diff < 90:
+        return _plural(diff, "second")
+    diff = (diff + 30) // 60
+    if diff < 90:
+        return _plural(diff, "minute")
+    diff = (diff + 30) // 60
+    if diff < 36:
+        return _plural(diff, "hour")
+    diff = (diff + 12) // 24
+    if diff < 14:
+        return _plural(diff, "day")
+    if diff < 70:
+        return _plural((diff + 3) // 7, "week")
+    if diff < 365:
+        return _plural((diff + 15) // 30, "month")
+    if diff < 1825:
+        total_months: int = (diff * 12 * 2 + 365) // (365 * 2)
+        years, months = divmod(total_months, 12)
+        if months:
+            return f"{_plural(years, 'year', suffix='')}, {_plural(months, 'month')}"
+        return _plural(years, "year")
+    return _plural((diff + 183) // 365, "year")
+
+
+def _plural(count: int, unit: str, suffix: str = " ago") -> str:
+    return f"{count} {unit}{'' if count == 1 else 's'}{suffix}"
+
+
+class CommitIndex:
+    """
+    Commits of the working tree for the notifications feed, read with pygit2.
+
+    The feed used to run git log plus two git show processes per commit on every request. The
+    index walks the history once, then only the commits added since the HEAD it last saw; a
+    HEAD that no longer descends from it (a forced pull) triggers a full rebuild.
+    """
+
+    def __init__(self, path: Path = settings.WORK_DIR):
+        self.path = path
+        self.head: Oid | None = None
+        self.commits: list[CommitEntry] = []
+        self._lock = Lock()
+        self._repo: Repository | None = None
+
+    @property
+    def repo(self) -> Repository:
+        if self._repo is None:
+            self._repo = Repository(self.path)
+        return self._repo
+
+    def refresh(self) -> None:
+        with self._lock:
+            try:
+                head: Oid = self.repo.head.target
+            except GitError:
+                logger.warning("Cannot read HEAD of %s", self.path, exc_info=True)
+                return
+            if head == self.head:
+                return
+            if self.head is not None and self.repo.descendant_of(head, self.head):
+                self.commits = self._walk(head, hide=self.head) + self.commits
+            else:
+                self.commits = self._walk(head)
+            self.head = head
+
+    def _walk(self, head: Oid, hide: Oid | None = None) -> list[CommitEntry]:
+        walker = self.repo.walk(head, GIT_SORT_TIME)
+        if hide is not None:
+            walker.hide(hide)
+        return [self._create_entry(commit) for commit in walker]
+
+    @staticmethod
+    def _create_entry(commit: Commit) -> CommitEntry:
+        return CommitEntry(
+            oid=commit.id,
+            short_id=commit.short_id,
+            summary=commit.message.split("\n", 1)[0],
+            author=f"{commit.author.name} <{commit.author.email}>",
+            author_time=commit.author.time,
+            author_offset=commit.author.offset,
+            commit_time=commit.commit_time,
+            is_merge=len(commit.parent_ids) > 1,
+        )
+
+    def get_commits(self, days: int, authors: list[str]) -> list[CommitEntry]:
+        """Non merge commits of the last `days` days by any of `authors`, newest first."""
+        self.refresh()
+        since: float = time.time() - days * 24 * 60 * 60
+        return [
+            entry
+            for entry in self.commits
+            if entry.commit_time >= since
+            and not entry.is_merge
+            and any(author in entry.author for author in authors)
+        ]
+
+    def get_changes(self, entry: CommitEntry) -> dict[str, str]:
+        """
+        Map each file a commit touched to the text of its hunks after the first hunk header.
+
+        This is what the feed showed from `git show`, and it is computed once per commit.
+        """
+        with self._lock:
+            if entry._changes is None:
+                entry._changes = self._read_changes(entry.oid)
+            return entry._changes
+
+    def _read_changes(self, oid: Oid) -> dict[str, str]:
+        commit: Commit = self.repo[oid]
+        if commit.parents:
+            diff = commit.parents[0].tree.diff_to_tree(commit.tree)
+        else:
+            diff = commit.tree.diff_to_tree(swap=True)
+        diff.find_similar()
+        changes: dict[str, str] = {}
+        for patch in diff:
+            match = _HUNK_PATTERN.search(patch.text or "")
+            changes[patch.delta.new_file.path] = match.group(1).strip() if match else ""
+        return changes
+
+    def get_segment_changes(self, commit_id: str, path: str, inline: bool = False) -> list[SegmentChange]:
+        """
+        Segments of a JSON file changed by a commit, compared with its first parent.
+
+        Raises KeyError when the commit does not exist or is not a valid revision, and ValueError
+        when the path is not a segment file.
+        """
+        with self._lock:
+            try:
+                commit: Commit = self.repo.revparse_single(commit_id).peel(Commit)
+            except (GitError, ValueError) as e:
+                raise KeyError(commit_id) from e
+            old: Oid | None = self._get_blob_id(commit.parents[0].tree, path) if commit.parents else None
+            new: Oid | None = self._get_blob_id(commit.tree, path)
+        return segment_diff_cache.get(
+            old,
+            new,
+            inline,
+            lambda: tuple(self.repo[oid].data if oid is not None else None for oid in (old, new)),
+        )
+
+    @staticmethod
+    def _get_blob_id(tree: Tree, path: str) -> Oid | None:
+        try:
+            entry: Object = tree[path]
+        except KeyError:
+            return None
+        if entry.type_str != "blob":
+            raise ValueError(f"{path} is not a file")
+        return entry.id
+
+
+_commit_index: CommitIndex | None = None
+_commit_index_lock = Lock()
+
+
+def get_commit_index() -> CommitIndex:
+    global _commit_index
+    with _commit_index_lock:
+        if _commit_index is None:
+            _commit_index = CommitIndex()
+        return _commit_index
@@ -1,3 +1,4 @@
+from app.services.git.segment_diff import SegmentChange
 from pydantic import BaseModel
 
 
@@ -5,6 +6,12 @@ class GitCommitInfoOut(BaseModel):
     git_recent_commits: list[dict]
 
 
+class SegmentChangesOut(BaseModel):
+    commit_id: str
+    file_path: str
+    changes: list[SegmentChange]
+
+
 class NotificationFeedOut(BaseModel):
     notifications: list[dict]
 
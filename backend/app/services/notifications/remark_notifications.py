@@ -6,6 +6,7 @@ from app.core.config import settings
 from app.db.database import get_sess
 from app.db.models.notification import RemarkNotification
 from app.db.models.user import User
+from app.services.notifications.broadcaster import publish_user_event
 from search.utils import find_root_path, get_prefix
 from sqlalchemy import func
 
@@ -100,4 +101,5 @@ def create_remark_notifications(
 
         sess.add_all(notifications)
         sess.commit()
+        publish_user_event(notification.recipient_github_id for notification in notifications)
         return len(notifications)
@@ -0,0 +1,190 @@
+import logging
+import os
+from collections import defaultdict
+from itertools import batched
+from pathlib import Path
+from typing import Any, Iterable
+
+import billiard
+from app.core.config import settings
+from app.db.database import get_sess
+from app.db.models.translation_progress import TranslationProgress
+from search.utils import FileChange, find_root_path, get_json_data, get_muid, get_prefix, is_root
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_DIR: str = "translation"
+
+
+def compute_progress(source_data: dict[str, str], translation_data: dict[str, str]) -> tuple[int, int, float]:
+    total_keys: int = len(source_data)
+    translated_keys: int = sum(1 for key in source_data if str(translation_data.get(key) or "").strip())
+    progress: float = (translated_keys / total_keys * 100) if total_keys > 0 else 0.0
+    return total_keys, translated_keys, round(progress, 2)
+
+
+def _progress_row(path: Path, total_keys: int, translated_keys: int, progress: float) -> dict[str, Any]:
+    return {
+        "file_path": str(path.relative_to(settings.WORK_DIR)),
+        "prefix": get_prefix(path),
+        "muid": get_muid(path),
+        "progress": progress,
+        "total_keys": total_keys,
+        "translated_keys": translated_keys,
+    }
+
+
+def _compute_group(root_path: Path | None, translation_paths: list[Path]) -> tuple[list[dict[str, Any]], int]:
+    """Progress rows of every translation of one root file, which is parsed only once."""
+    if root_path is None:
+        # Stored as -1 so listings show the error instead of asking for the file again.
+        return [_progress_row(path, 0, 0, -1) for path in translation_paths], 0
+    try:
+        source_data: dict[str, str] = get_json_data(root_path)
+    except Exception:
+        logger.exception("Failed to read root file %s", root_path)
+        return [], len(translation_paths)
+
+    rows: list[dict[str, Any]] = []
+    errors: int = 0
+    for path in translation_paths:
+        try:
+            rows.append(_progress_row(path, *compute_progress(source_data, get_json_data(path))))
+        except Exception:
+            logger.exception("Failed to compute translation progress of %s", path)
+            errors += 1
+    return rows, errors
+
+
+def _compute_group_args(args: tuple[Path | None, list[Path]]) -> tuple[list[dict[str, Any]], int]:
+    return _compute_group(*args)
+
+
+class ProgressMaterializer:
+    """
+    Keep the translation_progress table in step with the working tree.
+
+    Translations are grouped by their root file so each root is parsed once however many
+    translations share it, groups are counted in a process pool and rows are written with one
+    INSERT ... ON CONFLICT DO UPDATE per chunk. `materialize` recomputes every translation,
+    `update` only the ones touched by a list of changed files such as `GitManager.changes`.
+    """
+
+    def __init__(self, chunk_size: int = settings.PROGRESS_CHUNK_SIZE, workers: int | None = None) -> None:
+        self.chunk_size = chunk_size
+        self.workers = workers if workers is not None else self._get_workers()
+
+    @staticmethod
+    def _get_workers() -> int:
+        return settings.PROGRESS_WORKERS or os.cpu_count() or 1
+
+    def materialize(self) -> dict[str, Any]:
+        translation_dir: Path = settings.WORK_DIR / TRANSLATION_DIR
+        if not translation_dir.exists():
+            return {"status": "error", "message": "Translation directory not found"}
+        return self._write(self._group_by_root(translation_dir.rglob("*.json")))
+
+    def update(self, changes: Iterable[FileChange | Path | str]) -> dict[str, Any]:
+        """Recompute translations that changed and every translation of a root file that changed."""
+        translations: set[Path] = set()
+        root_prefixes: set[str] = set()
+        removed: set[str] = set()
+        for change in changes:
+            path: Path = self._resolve(change.path if isinstance(change, FileChange) else change)
+            if path.suffix != ".json" or not path.is_relative_to(settings.WORK_DIR):
+                continue
+            relative: Path = path.relative_to(settings.WORK_DIR)
+            if relative.parts[0] == TRANSLATION_DIR:
+                if path.exists():
+                    translations.add(path)
+                else:
+                    removed.add(str(relative))
+            elif path.exists() and is_root(path):
+                root_prefixes.add(get_prefix(path))
+
+        if root_prefixes:
+            translations.update(self._get_translations_of_roots(root_prefixes))
+        result: dict[str, Any] = self._write(self._group_by_root(translations))
+        result["removed_count"] = self._delete(removed)
+        return result
+
+    @staticmethod
+    def _resolve(path: Path | str) -> Path:
+        path = Path(path)
+        return path if path.is_absolute() else settings.WORK_DIR / path
+
+    @staticmethod
+    def _get_translations_of_roots(prefixes: set[str]) -> list[Path]:
+        with get_sess() as db:
+            file_paths = db.scalars(
+                select(TranslationProgress.file_path).where(TranslationProgress.prefix.in_(prefixes))
+            ).all()
+        paths: list[Path] = [settings.WORK_DIR / file_path for file_path in file_paths]
+        return [path for path in paths if path.exists()]
+
+    @staticmethod
+    def _group_by_root(paths: Iterable[Path]) -> dict[Path | None, list[Path]]:
+        groups: dict[Path | None, list[Path]] = defaultdict(list)
+        for path in paths:
+            try:
+                groups[find_root_path(path)].append(path)
+            except IndexError:
+                # File names without a "<prefix>_<muid>" shape have no root to compare with.
+                groups[None].append(path)
+        return groups
+
+    def _compute(self, groups: dict[Path | None, list[Path]]) -> Iterable[tuple[list[dict[str, Any]], int]]:
+        if self.workers <= 1 or len(groups) <= 1:
+            for root_path, paths in groups.items():
+                yield _compute_group(root_path, paths)
+            return
+        # billiard's pool, unlike multiprocessing's, may be started from a daemonic Celery prefork child.
+        with billiard.Pool(processes=self.workers) as pool:
+            yield from pool.imap(_compute_group_args, groups.items(), chunksize=16)
+
+    def _write(self, groups: dict[Path | None, list[Path]]) -> dict[str, Any]:
+        updated_count: int = 0
+        error_count: int = 0
+        rows: list[dict[str, Any]] = []
+        with get_sess() as db:
+            for group_rows, errors in self._compute(groups):
+                error_count += errors
+                rows.extend(group_rows)
+                while len(rows) >= self.chunk_size:
+                    updated_count += self._upsert(db, rows[: self.chunk_size])
+                    rows = rows[self.chunk_size :]
+            if rows:
+                updated_count += self._upsert(db, rows)
+        return {"status": "success", "updated_count": updated_count, "error_count": error_count}
+
+    @staticmethod
+    def _upsert(db, rows: list[dict[str, Any]]) -> int:
+        stmt = insert(TranslationProgress).values(rows)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[TranslationProgress.file_path],
+                set_={
+                    "prefix": stmt.excluded.prefix,
+                    "muid": stmt.excluded.muid,
+                    "progress": stmt.excluded.progress,
+                    "total_keys": stmt.excluded.total_keys,
+                    "translated_keys": stmt.excluded.translated_keys,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+        )
+        db.commit()
+        return len(rows)
+
+    def _delete(self, file_paths: set[str]) -> int:
+        if not file_paths:
+            return 0
+        removed: int = 0
+        with get_sess() as db:
+            for chunk in batched(file_paths, self.chunk_size):
+                result = db.execute(delete(TranslationProgress).where(TranslationProgress.file_path.in_(chunk)))
+                removed += result.rowcount
+            db.commit()
+        return removed
@@ -8,7 +8,7 @@ from app.services.projects.utils import write_json_data
 from app.services.users.utils import get_user
 from search.search import Search
 from search.utils import get_json_data
-from app.tasks import commit
+from app.services.git.commit_scheduler import schedule_commit
 
 
 class UIDReducer:
@@ -54,8 +54,7 @@ class UIDReducer:
         return reduced_data
 
     def _reduce_commit(self, changed_paths: list[str], message: str) -> str:
-        result = commit.delay(get_user(int(self.user.github_id)).model_dump(), changed_paths, message)
-        return result.id
+        return schedule_commit(get_user(int(self.user.github_id)).model_dump(), changed_paths, message)
 
     def _reduce(self, segment_id: str, data: dict[str, str], path: str) -> dict[str, str]:
         data_copy = data.copy()
@@ -8,7 +8,7 @@ from app.core.text_types import TextType
 from app.db.schemas.user import User, UserBase
 from app.services.git import utils
 from app.services.users.utils import get_user
-from app.tasks import commit
+from app.services.git.commit_scheduler import schedule_commit
 from search.search import Search
 from search.utils import find_root_path, get_json_data
 
@@ -77,8 +77,7 @@ def schedule_split_merge_auto_publish(
         user_data = get_user(int(user.github_id))
         message = f"{user.username} {operation} structural split/merge files"
         commit_paths = [_relative_split_merge_path(path).as_posix() for path in auto_publish_paths]
-        result = commit.delay(user_data.model_dump(), commit_paths, message)
-        task_id = result.id
+        task_id = schedule_commit(user_data.model_dump(), commit_paths, message)
 
     return SplitMergePublishResult(
         task_id=task_id,
@@ -122,12 +121,11 @@ def update_file(
     written, file_error = write_json_data(path, file_data)
     if written:
         cleaned_path_string = str(utils.clean_path(str(path)))
-        result = commit.delay(
+        task_id = schedule_commit(
             user.model_dump(),
             [cleaned_path_string],
             f"Translations by {user.username} to {cleaned_path_string}",
         )
-        task_id = result.id
 
     if file_error:
         updated = False
@@ -3,6 +3,7 @@ from pydantic import BaseModel
 
 class SearchSegmentOut(BaseModel):
     results: dict[str, dict[str, str]]
+    next: str | None = None
 
 
 class TranslationHintsOut(BaseModel):
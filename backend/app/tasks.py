@@ -1,19 +1,25 @@
+import logging
+
 import elasticsearch.exceptions
 from app.celery import celery_app as app
 from app.core.config import settings
 from app.db.schemas.user import UserBase
-from app.services.git import utils
+from app.services.git import events, utils
 from app.services.git.manager import GitManager
-from celery import Task
+from celery import Task, states
 from elasticsearch.exceptions import ConnectionError as ElasticConnectionError
 from elasticsearch.exceptions import ConnectionTimeout as ElasticConnectionTimeout
 from elasticsearch.exceptions import NotFoundError as ElasticNotFoundError
 from elasticsearch.exceptions import RequestError as ElasticRequestError
 from github import GithubException
-from pygit2 import GitError
+from pygit2 import GitError, Signature
+from search.bootstrap import RETRY_SECONDS as BOOTSTRAP_RETRY_SECONDS
+from search.bootstrap import bootstrap_indexes
+from search.reindex import reindex as rebuild_indexes
 from search.search import Search
 
 es = Search()
+logger = logging.getLogger(__name__)
 
 
 class GitTask(Task):
@@ -64,6 +70,8 @@ class SyncTask(GitTask):
 
 @app.task(name="commit", base=GitTask, queue="commit_queue")
 def commit(user: dict, file_paths: list[str], message: str, add: bool = True) -> bool:
+    from app.services.git import commit_scheduler
+
     file_paths = [file_paths] if isinstance(file_paths, str) else file_paths
     paths = [utils.clean_path(path) for path in file_paths if path]
     if not paths:
@@ -73,25 +81,114 @@ def commit(user: dict, file_paths: list[str], message: str, add: bool = True) ->
     manager = GitManager(settings.PUBLISHED_DIR, settings.WORK_DIR, user_data)
     git_operation = GitManager.add if add else GitManager.remove
 
-    if not (
-        git_operation(manager.unpublished, paths)
-        and GitManager.commit(manager.unpublished, manager.author, manager.committer, message, paths)
-    ):
-        return False
+    with commit_scheduler.work_dir_lock():
+        manager.unpublished.index.read(True)
+        before = manager.unpublished.head.target
+        if not (
+            git_operation(manager.unpublished, paths)
+            and GitManager.commit(manager.unpublished, manager.author, manager.committer, message, paths)
+        ):
+            return False
+
+        manager.pull(manager.unpublished)
+        GitManager.push(manager.unpublished, "origin", "unpublished")
+
+    es.sync_changes(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, manager.unpublished, manager.changes)
+    _publish_event(
+        events.GitEvent.create(
+            "commit",
+            "unpublished",
+            user_data.username,
+            paths + [change.path for change in manager.changes],
+            before=before,
+            after=manager.unpublished.head.target,
+        )
+    )
+    return True
 
-    changed_files = manager.pull(manager.unpublished)
-    GitManager.push(manager.unpublished, "origin", "unpublished")
 
-    existing_paths, not_existing_paths = manager.separate_existing_files(changed_files)
-    if existing_paths:
-        es.update_indexes(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, existing_paths)
-    if not_existing_paths:
-        es.update_indexes(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, not_existing_paths, delete=True)
-    return True
+class CommitBatchTask(GitTask):
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        (requests,) = args
+        for request in requests:
+            self.backend.store_result(request["id"], exc, states.FAILURE)
+        super().on_failure(exc, task_id, args, kwargs, einfo)
+
+
+@app.task(name="flush_commits", base=GitTask, queue="commit_queue")
+def flush_commits() -> int:
+    from app.services.git import commit_scheduler
+
+    if requests := commit_scheduler.drain():
+        commit_batch.delay(requests)
+    return len(requests)
+
+
+@app.task(name="commit_batch", bind=True, base=CommitBatchTask, queue="commit_queue")
+def commit_batch(self, requests: list[dict]) -> dict[str, bool]:
+    from app.services.git import commit_scheduler
+
+    for request in requests:
+        self.backend.store_result(request["id"], None, states.STARTED)
+
+    groups = commit_scheduler.group_by_author(requests)
+    manager = GitManager(settings.PUBLISHED_DIR, settings.WORK_DIR, UserBase(**requests[0]["user"]))
+    results: dict[str, bool] = {}
+    committed_paths = []
+    with commit_scheduler.work_dir_lock():
+        before = manager.unpublished.head.target
+        for author_requests in groups.values():
+            user_data = UserBase(**author_requests[0]["user"])
+            author_paths = []
+            staged = []
+            # Start from the index on disk, without anything a failed request left in memory.
+            manager.unpublished.index.read(True)
+            for request in author_requests:
+                paths = [utils.clean_path(path) for path in request["paths"] if path]
+                git_operation = GitManager.add if request["add"] else GitManager.remove
+                results[request["id"]] = False
+                try:
+                    if paths and git_operation(manager.unpublished, paths):
+                        author_paths.extend(paths)
+                        staged.append(request["id"])
+                except (GitError, OSError, KeyError):
+                    # A path deleted before the flush only fails its own request, not the batch.
+                    logger.exception("Cannot stage commit request %s", request["id"])
+                    manager.unpublished.index.read(True)
+            if not author_paths:
+                continue
+            message = commit_scheduler.get_batch_message(user_data.username, author_requests)
+            author = Signature(name=user_data.username, email=user_data.email)
+            if GitManager.commit(manager.unpublished, author, manager.committer, message, author_paths):
+                results.update(dict.fromkeys(staged, True))
+                committed_paths.extend(author_paths)
+
+        if committed_paths:
+            manager.pull(manager.unpublished)
+            GitManager.push(manager.unpublished, "origin", "unpublished")
+
+    if committed_paths:
+        es.sync_changes(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, manager.unpublished, manager.changes)
+        _publish_event(
+            events.GitEvent.create(
+                "commit",
+                "unpublished",
+                ", ".join(UserBase(**group[0]["user"]).username for group in groups.values()),
+                committed_paths + [change.path for change in manager.changes],
+                before=before,
+                after=manager.unpublished.head.target,
+            )
+        )
+
+    for request_id, result in results.items():
+        self.backend.store_result(request_id, result, states.SUCCESS)
+    return results
 
 
 @app.task(name="pr", base=PrTask, queue="pr_queue")
 def pr(user, file_paths) -> str:
+    from app.services.git import commit_scheduler
+
     user_data = UserBase(**user)
     paths = [utils.clean_path(path) for path in file_paths]
     if not paths:
@@ -99,33 +196,47 @@ def pr(user, file_paths) -> str:
     manager = GitManager(settings.PUBLISHED_DIR, settings.WORK_DIR, user_data)
 
     # Step 1: commit any uncommitted working-tree changes to the unpublished branch first,
-    # so that process_files / has_changes can detect the latest content.
+    # so that process_files / has_changes can detect the latest content. The commit queue and
+    # the other PR workers write the same checkout, hence the lock.
     commit_msg = f"Translations by {user_data.username}"
-    if GitManager.add(manager.unpublished, paths):
-        if GitManager.commit(manager.unpublished, manager.author, manager.committer, commit_msg, paths):
-            manager.pull(manager.unpublished)
-            GitManager.push(manager.unpublished, "origin", "unpublished")
+    with commit_scheduler.work_dir_lock():
+        manager.unpublished.index.read(True)
+        if GitManager.add(manager.unpublished, paths):
+            if GitManager.commit(manager.unpublished, manager.author, manager.committer, commit_msg, paths):
+                manager.pull(manager.unpublished)
+                GitManager.push(manager.unpublished, "origin", "unpublished")
 
     # Step 2: create PR from unpublished → published
     branch = utils.get_branch_name(manager, paths)
     commit_message = utils.get_pr_commit_message(branch)
     pr_title = utils.get_pr_title(branch)
     pr_body = utils.get_pr_body(user_data)
-    return manager.process_files(
+    url = manager.process_files(
         message=commit_message, branch=branch, pr_title=pr_title, pr_body=pr_body, file_paths=paths
     )
+    _publish_event(events.GitEvent.create("pr", branch, user_data.username, paths))
+    return url
 
 
 @app.task(name="pull", base=GitTask, queue="sync_queue")
 def pull(user_data: dict, branch_name: str, force: bool = False, remote_name: str = "origin") -> None:
     manager = GitManager(settings.PUBLISHED_DIR, settings.WORK_DIR, UserBase(**user_data))
     branch = manager.get_branch(branch_name)
-    changed_files = manager.pull(branch, force=force, remote_name=remote_name)
-
-    existing_paths, not_existing_paths = manager.separate_existing_files(changed_files)
-    es.update_indexes(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, existing_paths)
-    if not_existing_paths:
-        es.update_indexes(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, not_existing_paths, delete=True)
+    before = branch.head.target
+    manager.pull(branch, force=force, remote_name=remote_name)
+
+    es.sync_changes(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, branch, manager.changes)
+    if manager.changes:
+        _publish_event(
+            events.GitEvent.create(
+                "pull",
+                branch_name,
+                manager.user.username,
+                [change.path for change in manager.changes],
+                before=before,
+                after=branch.head.target,
+            )
+        )
 
 
 @app.task(name="push", base=GitTask, queue="sync_queue")
@@ -136,73 +247,43 @@ def push(user_data: dict, branch_name: str, remote_name: str = "origin") -> None
     manager.push(branch, remote_name, branch_name)
 
 
+@app.task(name="bootstrap_search", bind=True, queue="sync_queue", max_retries=None)
+def bootstrap_search(self) -> None:
+    # A worker outlives the API processes and can run the population in a pool of its own.
+    if not bootstrap_indexes():
+        raise self.retry(countdown=BOOTSTRAP_RETRY_SECONDS)
+
+
+@app.task(name="reindex", queue="sync_queue")
+def reindex(keep_old: bool = False) -> dict:
+    return rebuild_indexes(keep_old=keep_old)
+
+
+def _publish_event(event: events.GitEvent) -> None:
+    if events.publish(event):
+        consume_git_events.delay()
+    else:
+        # Without the stream the consumers still have to follow the change.
+        events.handle(event)
+
+
+@app.task(name="consume_git_events", base=GitTask, queue="sync_queue")
+def consume_git_events() -> int:
+    return events.consume()
+
+
 @app.task(name="update_all_translation_progress", queue="commit_queue")
 def update_all_translation_progress() -> dict:
-    from pathlib import Path
-    from datetime import datetime
-    from app.db.database import get_sess
-    from app.db.models.translation_progress import TranslationProgress
-    from search.utils import find_root_path, get_json_data, get_muid, get_prefix
-
-    translation_dir = settings.WORK_DIR / "translation"
-    if not translation_dir.exists():
-        return {"status": "error", "message": "Translation directory not found"}
+    from app.services.projects.progress import ProgressMaterializer
 
-    updated_count = 0
-    error_count = 0
+    return ProgressMaterializer().materialize()
 
-    with get_sess() as db:
-        for file_path in translation_dir.rglob("*.json"):
-            try:
-                source_path = find_root_path(file_path)
-                if not source_path:
-                    continue
 
-                translation_data = get_json_data(file_path)
-                source_data = get_json_data(source_path)
+@app.task(name="update_translation_progress", queue="commit_queue")
+def update_translation_progress(file_paths: list[str]) -> dict:
+    from app.services.projects.progress import ProgressMaterializer
 
-                total_keys = len(source_data)
-                translated_keys = sum(
-                    1 for key in source_data
-                    if key in translation_data and translation_data[key] and str(translation_data[key]).strip()
-                )
-                progress = (translated_keys / total_keys * 100) if total_keys > 0 else 0.0
-
-                relative_path = str(file_path.relative_to(settings.WORK_DIR))
-
-                existing = db.query(TranslationProgress).filter(
-                    TranslationProgress.file_path == relative_path
-                ).first()
-
-                if existing:
-                    existing.progress = round(progress, 2)
-                    existing.total_keys = total_keys
-                    existing.translated_keys = translated_keys
-                    existing.updated_at = datetime.utcnow()
-                else:
-                    new_record = TranslationProgress(
-                        file_path=relative_path,
-                        prefix=get_prefix(file_path),
-                        muid=get_muid(file_path),
-                        progress=round(progress, 2),
-                        total_keys=total_keys,
-                        translated_keys=translated_keys,
-                    )
-                    db.add(new_record)
-
-                updated_count += 1
-
-            except Exception as e:
-                error_count += 1
-                print(f"Error processing {file_path}: {e}")
-
-        db.commit()
-
-    return {
-        "status": "success",
-        "updated_count": updated_count,
-        "error_count": error_count,
-    }
+    return ProgressMaterializer().update(file_paths)
 
 
 @app.task(name="update_file_translation_progress", queue="commit_queue")
@@ -43,6 +43,41 @@ class TestDirectories:
             assert all(item in response.json()["directories"] for item in {"dir1/", "dir2/"})
             assert all(item in response.json()["files"] for item in {"file1", "file2"})
 
+    @pytest.mark.asyncio
+    @patch("app.services.directories.utils.schedule_progress_update")
+    @patch("app.services.directories.utils.get_stored_progress")
+    @patch("pathlib.Path.is_dir", return_value=True)
+    @patch("pathlib.Path.exists", return_value=True)
+    @patch("pathlib.Path.iterdir")
+    async def test_get_dir_content_translation_progress(
+        self,
+        mock_iterdir,
+        mock_exists,
+        mock_is_dir,
+        mock_get_stored_progress,
+        mock_schedule_progress_update,
+        async_client,
+        mock_get_current_user,
+        mock_path_obj,
+    ):
+        base = "translation/en/user/sutta/mn/"
+        stored, missing = mock_path_obj(False, f"{base}mn1.json"), mock_path_obj(False, f"{base}mn2.json")
+        stored.name, missing.name = "mn1.json", "mn2.json"
+        mock_iterdir.return_value = [stored, missing]
+        mock_get_stored_progress.return_value = {
+            "mn1.json": {"name": "mn1.json", "progress": 50.0, "total_keys": 2, "translated_keys": 1}
+        }
+
+        response = await async_client.get(f"/directories/{base}")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["files_with_progress"] == [
+            {"name": "mn1.json", "progress": 50.0, "total_keys": 2, "translated_keys": 1, "pending": False},
+            {"name": "mn2.json", "progress": None, "total_keys": 0, "translated_keys": 0, "pending": True},
+        ]
+        mock_get_stored_progress.assert_called_once_with(base)
+        mock_schedule_progress_update.assert_awaited_once_with(base, [f"{base}mn2.json"])
+
     @pytest.mark.asyncio
     async def test_get_dir_content_invalid_path(self, async_client, mock_get_current_user):
         invalid_directory = "invalid_path"
@@ -7,6 +7,7 @@ import datetime
 from app.api.api_v1.endpoints import git_ops
 from app.db.models.user import Role
 from app.db.schemas.user import User
+from app.services.git.segment_diff import SegmentChange
 
 import pytest
 from app.core.config import settings
@@ -189,23 +190,10 @@ async def test_sync_repository_data_valid_branch(
                 assert response.json() == {"detail": "Sync action has been triggered", "task_id": ["123456", "654321"]}
 
 
-def _mock_base_published_ref_head():
-    """Mock _get_base_published_ref to return HEAD for test isolation."""
-    return patch(
-        "app.api.api_v1.endpoints.git_ops._get_base_published_ref",
-        return_value="HEAD",
-    )
-
-
 # Tests for get_git_status endpoint
 class TestGetGitStatus:
     """Tests for GET /git/status endpoint"""
 
-    @pytest.fixture(autouse=True)
-    def mock_base_published_ref(self):
-        with _mock_base_published_ref_head():
-            yield
-
     def test_untracked_user_text_file_requires_meaningful_content(self, tmp_path):
         blank_path = tmp_path / "translation/en/ihongda/blank.json"
         blank_path.parent.mkdir(parents=True)
@@ -240,15 +228,15 @@ class TestGetGitStatus:
         assert response.status_code == 401
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_empty_repository(
-        self, mock_ensure_safe, mock_repository_class, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
+        self, mock_ensure_safe, mock_get_worktree_status, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
     ):
         """Test git status with no modified files"""
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.return_value = {}
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.return_value = {}
 
         response = await async_client.get("/git/status?include_other_users=true")
 
@@ -258,15 +246,15 @@ class TestGetGitStatus:
 
     @pytest.mark.asyncio
     @patch("app.api.api_v1.endpoints.git_ops.get_status_name")
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_with_modified_files(
-        self, mock_ensure_safe, mock_repository_class, mock_get_status_name, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
+        self, mock_ensure_safe, mock_get_worktree_status, mock_get_status_name, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
     ):
         """Test git status includes tracked changes and untracked files."""
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.return_value = {
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.return_value = {
             "translation/en/test.json": GIT_STATUS_WT_MODIFIED,
             "comment/en/test.json": GIT_STATUS_WT_NEW,
             "root/en/test.json": GIT_STATUS_WT_DELETED,
@@ -287,24 +275,24 @@ class TestGetGitStatus:
         paths = [f["path"] for f in data["files"]]
         assert "comment/en/test.json" in paths
         assert paths == sorted(paths)
-        mock_repo.status.assert_called_once_with(untracked_files="all")
+        mock_worktree_status.status.assert_called_once_with()
 
     @pytest.mark.asyncio
     @patch("app.api.api_v1.endpoints.git_ops.get_status_name", return_value="modified")
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_admin_defaults_to_own_namespace(
         self,
         mock_ensure_safe,
-        mock_repository_class,
+        mock_get_worktree_status,
         mock_get_status_name,
         async_client,
         mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active,
     ):
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.return_value = {
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.return_value = {
             "translation/en/test_admin/own.json": GIT_STATUS_WT_MODIFIED,
             "translation/en/other/other.json": GIT_STATUS_WT_MODIFIED,
         }
@@ -321,15 +309,15 @@ class TestGetGitStatus:
         ]
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_filters_hidden_files(
-        self, mock_ensure_safe, mock_repository_class, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
+        self, mock_ensure_safe, mock_get_worktree_status, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
     ):
         """Test that hidden files and directories (starting with . or _) are filtered out"""
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.return_value = {
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.return_value = {
             "translation/en/test.json": GIT_STATUS_WT_MODIFIED,
             ".hidden/file.json": GIT_STATUS_WT_MODIFIED,
             "_internal/file.json": GIT_STATUS_WT_MODIFIED,
@@ -347,15 +335,15 @@ class TestGetGitStatus:
         assert data["files"][0]["path"] == "translation/en/test.json"
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_git_error(
-        self, mock_ensure_safe, mock_repository_class, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
+        self, mock_ensure_safe, mock_get_worktree_status, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
     ):
         """Test git status handling of GitError"""
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.side_effect = GitError("Git repository error")
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.side_effect = GitError("Git repository error")
 
         response = await async_client.get("/git/status")
 
@@ -363,15 +351,15 @@ class TestGetGitStatus:
         assert "Git error" in response.json()["detail"]
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_permission_error(
-        self, mock_ensure_safe, mock_repository_class, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
+        self, mock_ensure_safe, mock_get_worktree_status, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
     ):
         """Test git status handling of PermissionError"""
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.side_effect = PermissionError("Permission denied")
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.side_effect = PermissionError("Permission denied")
 
         response = await async_client.get("/git/status")
 
@@ -379,15 +367,15 @@ class TestGetGitStatus:
         assert "Permission denied" in response.json()["detail"]
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_os_error(
-        self, mock_ensure_safe, mock_repository_class, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
+        self, mock_ensure_safe, mock_get_worktree_status, async_client, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active
     ):
         """Test git status handling of OSError"""
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.side_effect = OSError("OS error")
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.side_effect = OSError("OS error")
 
         response = await async_client.get("/git/status")
 
@@ -396,20 +384,20 @@ class TestGetGitStatus:
 
     @pytest.mark.asyncio
     @patch("app.api.api_v1.endpoints.git_ops.get_status_name")
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_non_admin_exact_namespace_match(
         self,
         mock_ensure_safe,
-        mock_repository_class,
+        mock_get_worktree_status,
         mock_get_status_name,
         async_client,
         mock_get_current_user,
         mock_is_admin_or_superuser_is_active,
     ):
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.return_value = {
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.return_value = {
             "translation/en/joann/s1.json": GIT_STATUS_WT_MODIFIED,
             "translation/en/ann/s2.json": GIT_STATUS_WT_MODIFIED,
         }
@@ -441,21 +429,21 @@ class TestGetGitStatus:
     @pytest.mark.asyncio
     @patch("app.api.api_v1.endpoints.git_ops.permissions.can_edit_translation")
     @patch("app.api.api_v1.endpoints.git_ops.get_status_name", return_value="modified")
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_get_git_status_non_admin_includes_project_authorized_file(
         self,
         mock_ensure_safe,
-        mock_repository_class,
+        mock_get_worktree_status,
         mock_get_status_name,
         mock_can_edit_translation,
         async_client,
         mock_get_current_user,
         mock_is_admin_or_superuser_is_active,
     ):
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.return_value = {
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.return_value = {
             "translation/zh/blurb/an-blurbs_translation-zh.json": GIT_STATUS_WT_MODIFIED,
             "translation/en/other/secret.json": GIT_STATUS_WT_MODIFIED,
         }
@@ -488,21 +476,21 @@ class TestGetGitStatus:
 
     @pytest.mark.asyncio
     @patch("app.api.api_v1.endpoints.git_ops.get_status_name", return_value="modified")
-    @patch("app.api.api_v1.endpoints.git_ops.Repository")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     @patch("app.api.api_v1.endpoints.git_ops.ensure_safe_directory")
     async def test_non_admin_cannot_bypass_namespace_via_include_other_users(
         self,
         mock_ensure_safe,
-        mock_repository_class,
+        mock_get_worktree_status,
         mock_get_status_name,
         async_client,
         mock_get_current_user,
         mock_is_admin_or_superuser_is_active,
     ):
         """Non-admin passing ?include_other_users=true must still only see own files."""
-        mock_repo = MagicMock()
-        mock_repository_class.return_value = mock_repo
-        mock_repo.status.return_value = {
+        mock_worktree_status = MagicMock()
+        mock_get_worktree_status.return_value = mock_worktree_status
+        mock_worktree_status.status.return_value = {
             "translation/en/ann/own.json": GIT_STATUS_WT_MODIFIED,
             "translation/en/other/secret.json": GIT_STATUS_WT_MODIFIED,
         }
@@ -535,11 +523,6 @@ class TestGetGitStatus:
 class TestGetFileDiff:
     """Tests for GET /git/diff/{file_path} endpoint"""
 
-    @pytest.fixture(autouse=True)
-    def mock_base_published_ref(self):
-        with _mock_base_published_ref_head():
-            yield
-
     @pytest.mark.asyncio
     async def test_get_file_diff_unauthorized(self, async_client):
         """Test that unauthorized users cannot access file diff"""
@@ -547,170 +530,136 @@ class TestGetFileDiff:
         assert response.status_code == 401
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_new_file(
+    @pytest.mark.parametrize(
+        "status_code, diff, expected_status",
+        [
+            (GIT_STATUS_WT_NEW, "diff --git a/test.json b/test.json\n+line1\n", "untracked"),
+            (GIT_STATUS_WT_DELETED, "diff --git a/test.json b/test.json\n-deleted\n", "deleted"),
+            (GIT_STATUS_WT_MODIFIED, "diff --git a/test.json b/test.json\n-old line\n+new line", "modified"),
+            (GIT_STATUS_INDEX_NEW, "diff --git a/test.json b/test.json\n+line1\n", "staged_new"),
+        ],
+    )
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
+    async def test_get_file_diff(
         self,
-        mock_run,
+        mock_get_worktree_status,
+        status_code,
+        diff,
+        expected_status,
         async_client,
         mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active,
     ):
-        """Test diff for a new file"""
-        mock_status = MagicMock(stdout="?? test.json\n")
-        mock_diff = MagicMock(stdout="diff --git a/test.json b/test.json\n+line1\n")
-        mock_run.side_effect = [mock_status, mock_diff]
+        mock_get_worktree_status.return_value.file_status.return_value = status_code
+        mock_get_worktree_status.return_value.diff.return_value = diff
 
         response = await async_client.get("/git/diff/test.json")
 
         assert response.status_code == 200
-        data = response.json()
-        assert data["path"] == "test.json"
-        assert data["status"] == "untracked"
-        assert "+line1" in data["diff"]
+        assert response.json() == {"path": "test.json", "diff": diff, "status": expected_status}
+        mock_get_worktree_status.return_value.diff.assert_called_once_with("test.json", max_lines=5000)
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_no_changes(
-        self,
-        mock_run,
-        async_client,
-        mock_get_current_user_admin,
-        mock_is_admin_or_superuser_is_active,
-    ):
-        """Unchanged file should return 400 (no status output)."""
-        mock_status = MagicMock(stdout="")
-        mock_run.return_value = mock_status
-
-        response = await async_client.get("/git/diff/test.json")
-
-        assert response.status_code == 400
-        assert "File has no changes" in response.json()["detail"]
-
-    @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_deleted_file(
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
+    async def test_get_file_diff_modified_file_no_diff(
         self,
-        mock_run,
+        mock_get_worktree_status,
         async_client,
         mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active,
     ):
-        """Test diff for a deleted file"""
-        mock_status = MagicMock(stdout=" D test.json\n")
-        mock_diff = MagicMock(stdout="diff --git a/test.json b/test.json\n-deleted\n")
-        mock_run.side_effect = [mock_status, mock_diff]
+        """Empty diff output is still a successful response with empty diff."""
+        mock_get_worktree_status.return_value.file_status.return_value = GIT_STATUS_WT_MODIFIED
+        mock_get_worktree_status.return_value.diff.return_value = ""
 
         response = await async_client.get("/git/diff/test.json")
 
         assert response.status_code == 200
         data = response.json()
-        assert data["path"] == "test.json"
-        assert data["status"] == "deleted"
-        assert "-deleted" in data["diff"]
+        assert data["status"] == "modified"
+        assert data["diff"] == ""
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_modified_file_with_diff(
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
+    async def test_get_file_diff_no_changes(
         self,
-        mock_run,
+        mock_get_worktree_status,
         async_client,
         mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active,
     ):
-        """Test diff for a modified file with diff content"""
-        mock_status = MagicMock(stdout=" M test.json\n")
-        mock_diff = MagicMock(
-            stdout="diff --git a/test.json b/test.json\n-old line\n+new line"
-        )
-        mock_run.side_effect = [mock_status, mock_diff]
+        """Unchanged or missing files return 400 without building a diff."""
+        mock_get_worktree_status.return_value.file_status.return_value = 0
 
-        response = await async_client.get("/git/diff/test.json")
+        response = await async_client.get("/git/diff/nonexistent.json")
 
-        assert response.status_code == 200
-        data = response.json()
-        assert data["path"] == "test.json"
-        assert data["status"] == "modified"
-        assert "diff --git" in data["diff"]
+        assert response.status_code == 400
+        assert "File has no changes" in response.json()["detail"]
+        mock_get_worktree_status.return_value.diff.assert_not_called()
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_modified_file_no_diff(
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
+    async def test_get_file_diff_git_error(
         self,
-        mock_run,
+        mock_get_worktree_status,
         async_client,
         mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active,
     ):
-        """Empty diff output is still a successful response with empty diff."""
-        mock_status = MagicMock(stdout=" M test.json\n")
-        mock_diff = MagicMock(stdout="")
-        mock_run.side_effect = [mock_status, mock_diff]
+        """Unexpected exception in diff flow returns 500."""
+        mock_get_worktree_status.return_value.file_status.side_effect = Exception("Git error")
 
         response = await async_client.get("/git/diff/test.json")
 
-        assert response.status_code == 200
-        data = response.json()
-        assert data["status"] == "modified"
-        assert data["diff"] == ""
+        assert response.status_code == 500
+        assert "Error generating diff" in response.json()["detail"]
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_file_not_found(
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
+    async def test_get_segment_diff(
         self,
-        mock_run,
+        mock_get_worktree_status,
         async_client,
         mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active,
     ):
-        """Non-existing file in git status flow returns 400 (no changes)."""
-        mock_status = MagicMock(stdout="")
-        mock_run.return_value = mock_status
+        mock_get_worktree_status.return_value.file_status.return_value = GIT_STATUS_WT_MODIFIED
+        mock_get_worktree_status.return_value.segment_diff.return_value = [
+            SegmentChange(segment_id="mn1:1.1", change="modified", old="So", new="Thus")
+        ]
 
-        response = await async_client.get("/git/diff/nonexistent.json")
+        response = await async_client.get("/git/segment-diff/test.json?inline=true")
 
-        assert response.status_code == 400
-        assert "File has no changes" in response.json()["detail"]
+        assert response.status_code == 200
+        assert response.json() == {
+            "path": "test.json",
+            "status": "modified",
+            "changes": [{"segment_id": "mn1:1.1", "change": "modified", "old": "So", "new": "Thus", "inline": None}],
+        }
+        mock_get_worktree_status.return_value.segment_diff.assert_called_once_with("test.json", True)
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_no_changes(
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
+    async def test_get_segment_diff_not_a_segment_file(
         self,
-        mock_run,
+        mock_get_worktree_status,
         async_client,
         mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active,
     ):
-        """Test diff for a file with no changes"""
-        mock_status = MagicMock(stdout="")
-        mock_run.return_value = mock_status
+        mock_get_worktree_status.return_value.file_status.return_value = GIT_STATUS_WT_MODIFIED
+        mock_get_worktree_status.return_value.segment_diff.side_effect = ValueError("Not a segment file")
 
-        response = await async_client.get("/git/diff/test.json")
+        response = await async_client.get("/git/segment-diff/_project-v2.json")
 
         assert response.status_code == 400
-        assert "File has no changes" in response.json()["detail"]
-
-    @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
-    async def test_get_file_diff_git_error(
-        self,
-        mock_run,
-        async_client,
-        mock_get_current_user_admin,
-        mock_is_admin_or_superuser_is_active,
-    ):
-        """Unexpected exception in diff flow returns 500."""
-        mock_run.side_effect = Exception("Git error")
-
-        response = await async_client.get("/git/diff/test.json")
-
-        assert response.status_code == 500
-        assert "Error generating diff" in response.json()["detail"]
+        assert "Not a segment file" in response.json()["detail"]
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.git_ops.subprocess.run")
+    @patch("app.api.api_v1.endpoints.git_ops.get_worktree_status")
     async def test_get_file_diff_non_admin_rejects_substring_match(
         self,
-        mock_subprocess_run,
+        mock_get_worktree_status,
         async_client,
         mock_get_current_user,
         mock_is_admin_or_superuser_is_active,
@@ -735,7 +684,7 @@ class TestGetFileDiff:
 
         assert response.status_code == 403
         assert "permission" in response.json()["detail"].lower()
-        mock_subprocess_run.assert_not_called()
+        mock_get_worktree_status.assert_not_called()
 
 
 def test_validate_file_path_returns_normalized_relative_path():
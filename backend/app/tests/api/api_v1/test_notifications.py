@@ -4,8 +4,6 @@ from unittest.mock import MagicMock, patch, Mock
 from app.api.api_v1.endpoints.notifications import (
     format_diff_as_html,
     get_notifications_feed,
-    parse_git_show_details,
-    get_change_detail,
     get_notification_authors_or_default,
     get_unread_git_updates,
     get_user_preferences,
@@ -47,66 +45,6 @@ def test_format_diff_as_html_none():
     assert format_diff_as_html(None, "file.json") is None
 
 
-def test_parse_git_show_details():
-    git_output = """
-diff --git a/mn1_translation-en-sujato.json b/mn1_translation-en-sujato.json
-index abc..def 100644
---- a/mn1_translation-en-sujato.json
-+++ b/mn1_translation-en-sujato.json
-@@ -1,5 +1,5 @@
- {
--  "mn1:1.1": "Old text",
-+  "mn1:1.1": "New text",
- }
-diff --git a/mn2_translation-en-sujato.json b/mn2_translation-en-sujato.json
-index 123..456 100644
---- a/mn2_translation-en-sujato.json
-+++ b/mn2_translation-en-sujato.json
-@@ -1 +1 @@
--foo
-+bar
-"""
-    result = parse_git_show_details(git_output)
-    assert len(result) == 2
-    assert result[0]['file_name'] == 'mn1_translation-en-sujato.json'
-    assert '-  "mn1:1.1": "Old text",' in result[0]['change_detail']
-    assert result[1]['file_name'] == 'mn2_translation-en-sujato.json'
-
-
-def test_parse_git_show_details_handles_diff_without_hunks():
-    git_output = """
-diff --git a/mn1_translation-en-sujato.json b/mn1_translation-en-sujato.json
-old mode 100644
-new mode 100755
-diff --git a/mn2_translation-en-sujato.json b/mn2_translation-en-sujato.json
-index 123..456 100644
---- a/mn2_translation-en-sujato.json
-+++ b/mn2_translation-en-sujato.json
-@@ -1 +1 @@
--foo
-+bar
-"""
-    result = parse_git_show_details(git_output)
-
-    assert len(result) == 2
-    assert result[0] == {
-        "file_name": "mn1_translation-en-sujato.json",
-        "change_detail": "",
-    }
-    assert result[1]["file_name"] == "mn2_translation-en-sujato.json"
-    assert "-foo" in result[1]["change_detail"]
-    assert "+bar" in result[1]["change_detail"]
-
-
-def test_get_change_detail():
-    parsed_details = [
-        {'file_name': 'file1.json', 'change_detail': 'detail1'},
-        {'file_name': 'file2.json', 'change_detail': 'detail2'}
-    ]
-    assert get_change_detail('file1.json', parsed_details) == 'detail1'
-    assert get_change_detail('file3.json', parsed_details) is None
-
-
 def test_get_notification_authors_or_default_returns_default_for_none():
     assert get_notification_authors_or_default(None) == ["sujato"]
 
@@ -155,16 +93,15 @@ def test_get_unread_git_updates_handles_missing_authors_preference():
     mock_get_sess.return_value.__enter__.return_value = mock_session
     mock_get_sess.return_value.__exit__.return_value = None
 
-    mock_process = MagicMock()
-    mock_process.communicate.return_value = (b"", b"")
-    mock_process.returncode = 0
+    mock_commit_index = MagicMock()
+    mock_commit_index.get_commits.return_value = []
 
     with patch(
         "app.api.api_v1.endpoints.notifications.get_sess",
         mock_get_sess,
     ), patch(
-        "app.api.api_v1.endpoints.notifications.subprocess.Popen",
-        return_value=mock_process,
+        "app.api.api_v1.endpoints.notifications.get_commit_index",
+        return_value=mock_commit_index,
     ), patch(
         "app.api.api_v1.endpoints.notifications.get_all_commit_ids_in_db",
         return_value=[],
@@ -173,6 +110,7 @@ def test_get_unread_git_updates_handles_missing_authors_preference():
 
     assert isinstance(result, GitCommitInfoOut)
     assert result.git_recent_commits == []
+    mock_commit_index.get_commits.assert_called_once_with(30, ["sujato"])
 
 
 def test_get_notifications_feed_merges_and_sorts():
@@ -358,7 +358,7 @@ class TestProjects:
         assert "detail" in response.json()
 
     @pytest.mark.asyncio
-    @patch("app.tasks.commit.delay")
+    @patch("app.api.api_v1.endpoints.projects.schedule_commit")
     @patch("app.api.api_v1.endpoints.projects.can_edit_translation")
     @patch("app.api.api_v1.endpoints.projects.search.get_file_paths")
     @patch("app.api.api_v1.endpoints.projects.update_file")
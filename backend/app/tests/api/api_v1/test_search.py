@@ -134,3 +134,47 @@ class TestSearch:
         assert response.status_code == 200
         assert "results" in response.json()
         assert response.json() == {"results": results}
+
+    @pytest.mark.asyncio
+    @patch("app.api.api_v1.endpoints.search.es.get_segments_page")
+    async def test_search_with_cursor(self, mock_get_segments_page, async_client, mock_get_current_user) -> None:
+        results = {"test56.1:0.1": {"translation-en-test": "test"}}
+        mock_get_segments_page.return_value = (results, "next-token")
+        response = await async_client.get("/search/?translation-en-test=test&cursor=")
+        assert response.status_code == 200
+        assert response.json() == {"results": results, "next": "next-token"}
+        size, cursor, _ = mock_get_segments_page.call_args.args
+        assert (size, cursor) == (10, "")
+
+    @pytest.mark.asyncio
+    async def test_search_with_invalid_cursor(self, async_client, mock_get_current_user) -> None:
+        response = await async_client.get("/search/?translation-en-test=test&cursor=not-a-cursor")
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    @patch("app.api.api_v1.endpoints.search.es.get_translation_hints")
+    async def test_get_translation_hints(
+        self, mock_get_translation_hints, async_client, mock_get_current_user, mock_superuser_is_active
+    ) -> None:
+        hint = {"muid": "root-pli-ms", "segment": "text", "translation_hints": "hint", "strength": 1}
+        mock_get_translation_hints.return_value = [
+            {**hint, "uid": "an1.1:1.1"},
+            {**hint, "uid": "an1.1:1.2"},
+            {**hint, "uid": "an1.1:1.3", "translation_hints": ""},
+        ]
+        response = await async_client.get(
+            "/search/hints/?source_muid=root-pli-ms&target_muid=translation-en-test&segment_id=an1.1:1.1&text_value=text"
+        )
+        assert response.status_code == 200
+        assert [item["uid"] for item in response.json()] == ["an1.1:1.2"]
+
+    @pytest.mark.asyncio
+    @patch("app.api.api_v1.endpoints.search.reindex.delay")
+    async def test_reindex_search(
+        self, mock_delay, async_client, mock_get_current_user, mock_is_admin_or_superuser_is_active
+    ) -> None:
+        mock_delay.return_value.id = "task-id"
+        response = await async_client.post("/search/reindex/?keep_old=true")
+        assert response.status_code == 202
+        assert response.json()["task_id"] == "task-id"
+        mock_delay.assert_called_once_with(True)
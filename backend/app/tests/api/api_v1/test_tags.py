@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
 from app.core.config import settings
@@ -231,7 +231,7 @@ class TestTagDataFile:
     @pytest.mark.asyncio
     @patch("app.api.api_v1.endpoints.tags.yield_file_path")
     @patch("app.api.api_v1.endpoints.tags.get_json_data")
-    @patch("app.api.api_v1.endpoints.tags.search")
+    @patch("app.api.api_v1.endpoints.tags.search", new_callable=AsyncMock)
     async def test_create_tag_data_file_admin(
         self, mock_search, mock_get_json, mock_yield, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active, user, async_client
     ):
@@ -252,7 +252,7 @@ class TestTagDataFile:
         assert "path" in response.json()
 
     @pytest.mark.asyncio
-    @patch("app.api.api_v1.endpoints.tags.search")
+    @patch("app.api.api_v1.endpoints.tags.search", new_callable=AsyncMock)
     async def test_create_tag_data_file_no_root(
         self, mock_search, mock_get_current_user_admin, mock_is_admin_or_superuser_is_active, user, async_client
     ):
@@ -274,7 +274,7 @@ class TestTagDataFile:
     @pytest.mark.asyncio
     @patch("app.api.api_v1.endpoints.tags.Path.exists", return_value=True)
     @patch("app.api.api_v1.endpoints.tags.yield_file_path")
-    @patch("app.api.api_v1.endpoints.tags.search")
+    @patch("app.api.api_v1.endpoints.tags.search", new_callable=AsyncMock)
     async def test_reindex_tag_files_admin(
         self, mock_search, mock_yield, mock_exists, mock_get_current_user_admin,
         mock_is_admin_or_superuser_is_active, user, async_client
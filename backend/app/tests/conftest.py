@@ -15,6 +15,7 @@ from app.db.schemas.user import User, UserBase
 from app.main import app
 from app.services.auth import utils
 from app.services.auth.schema import TokenData
+from app.services.directories.path_index import invalidate_path_index
 from app.services.directories.remover import Remover
 from app.services.directories.utils import validate_path
 from app.services.git.manager import GitManager
@@ -137,6 +138,12 @@ def mock_get_current_user_admin(user: UserBase) -> Generator[None, Any, None]:
     app.dependency_overrides = {}
 
 
+@pytest.fixture(autouse=True)
+def reset_path_index() -> None:
+    """The path index is shared per process; rebuild it from each test's mocked filesystem."""
+    invalidate_path_index()
+
+
 @pytest.fixture(autouse=True)
 def setup_git_repos(tmpdir):
     """Creates temporary Git repositories for testing."""
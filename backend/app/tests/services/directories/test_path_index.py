@@ -0,0 +1,118 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.core.text_types import TextType
+from app.services.directories.path_index import (
+    DirectoryIndex,
+    PathIndex,
+    add_to_path_index,
+    get_directory_index,
+    get_path_index,
+    invalidate_directory_index,
+    invalidate_path_index,
+)
+
+
+class TestPathIndex:
+    @patch("pathlib.Path.iterdir")
+    def test_candidates(self, mock_iterdir, mock_paths, mock_path_obj):
+        mock_paths(
+            {
+                TextType.TRANSLATION.value: [
+                    settings.WORK_DIR / "translation/en/user/sutta/an/an1",
+                    settings.WORK_DIR / "translation/en/user/sutta/an/an1/an1.1-10_translation-en-user.json",
+                    settings.WORK_DIR / "translation/de/user/sutta/mn",
+                ]
+            }
+        )
+        mock_iterdir.return_value = [mock_path_obj(True, "pli")]
+
+        index = PathIndex()
+
+        assert index.root_dirs == {"pli"}
+        assert index.entries[TextType.TRANSLATION.value] == {
+            ("translation", "en", "user", "sutta", "an", "an1"),
+            ("translation", "de", "user", "sutta", "mn"),
+        }
+        assert index.candidates(TextType.TRANSLATION.value, ["an2"]) == set()
+        assert index.candidates(TextType.TRANSLATION.value, ["pli", "ms", "sutta", "an"]) == {
+            ("translation", "en", "user", "sutta", "an", "an1"),
+            ("translation", "de", "user", "sutta", "mn"),
+        }
+
+    @patch("pathlib.Path.iterdir")
+    def test_add(self, mock_iterdir, mock_paths):
+        mock_paths({})
+        mock_iterdir.return_value = []
+
+        index = PathIndex()
+        index.add(settings.WORK_DIR / "root/pli/ms/sutta/an")
+
+        assert index.root_dirs == {"pli"}
+        assert ("root", "pli", "ms", "sutta", "an") in index.candidates(TextType.ROOT.value, ["an"])
+        assert ("root", "pli") in index.entries[TextType.ROOT.value]
+
+    @patch("pathlib.Path.iterdir")
+    def test_get_path_index_is_shared_until_invalidated(self, mock_iterdir, mock_paths):
+        mock_paths({})
+        mock_iterdir.return_value = []
+
+        index = get_path_index()
+
+        assert get_path_index() is index
+        invalidate_path_index()
+        assert get_path_index() is not index
+
+
+class TestDirectoryIndex:
+    @pytest.fixture
+    def work_dir(self, tmp_path):
+        # setup_git_repos fills tmp_path with its clones, so the corpus gets a directory of its own.
+        work = tmp_path / "work"
+        directories = ("root/pli/ms/sutta/mn", "root/pli/ms/sutta/MN-extra", "translation/en/user/sutta/mn", ".git/mn")
+        for directory in directories:
+            (work / directory).mkdir(parents=True)
+        (work / "root/pli/ms/sutta/mn/mn1_root-pli-ms.json").touch()
+        with patch.object(settings, "WORK_DIR", work):
+            yield work
+
+    def test_search(self, work_dir):
+        index = DirectoryIndex()
+
+        assert sorted(index.search("mn")) == [
+            "root/pli/ms/sutta/MN-extra",
+            "root/pli/ms/sutta/mn",
+            "translation/en/user/sutta/mn",
+        ]
+        assert sorted(index.search("mn", exact=True)) == ["root/pli/ms/sutta/mn", "translation/en/user/sutta/mn"]
+        assert index.search("ext") == ["root/pli/ms/sutta/MN-extra"]
+        assert index.search("root") == []
+        assert index.search("xyz") == []
+        assert index.entries["root/pli/ms/sutta"].child_directories == 2
+        assert index.entries["root/pli/ms/sutta/mn"].child_files == 1
+
+    def test_add(self, work_dir):
+        index = get_directory_index()
+
+        add_to_path_index([work_dir / "root/pli/ms/sutta/an/an1"])
+
+        assert index.search("an1") == ["root/pli/ms/sutta/an/an1"]
+        assert index.entries["root/pli/ms/sutta/an"].child_directories == 1
+        assert index.entries["root/pli/ms/sutta"].child_directories == 3
+
+    def test_invalidate_directory_index_recounts_files(self, work_dir):
+        index = get_directory_index()
+        (work_dir / "root/pli/ms/sutta/mn/mn2_root-pli-ms.json").touch()
+
+        invalidate_directory_index()
+
+        assert get_directory_index() is not index
+        assert get_directory_index().entries["root/pli/ms/sutta/mn"].child_files == 2
+
+    def test_build_racing_a_change_is_not_kept(self, work_dir):
+        with patch.object(DirectoryIndex, "_build", lambda self: invalidate_directory_index()):
+            index = get_directory_index()
+
+        assert get_directory_index() is not index
@@ -1,9 +1,11 @@
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
 
-from app.services.directories.utils import is_prefix_in_uid, validate_root_data
+from app.services.directories.utils import get_stored_progress, is_prefix_in_uid, validate_root_data
 
 
 class TestUtils:
@@ -42,3 +44,22 @@ class TestUtils:
 
         with pytest.raises(HTTPException):
             validate_root_data(path, {"test2:0.5": "test", "test1:2.3": "test3"})
+
+    def test_get_stored_progress_filters_direct_children_in_sql(self):
+        session = MagicMock()
+        query = session.query.return_value
+        query.filter.return_value.all.return_value = [
+            MagicMock(file_path="translation/en/one_two/mn/mn1.json", progress=50.0, total_keys=2, translated_keys=1)
+        ]
+
+        with patch("app.services.directories.utils.get_sess") as mock_get_sess:
+            mock_get_sess.return_value.__enter__.return_value = session
+            progress = get_stored_progress("translation/en/one_two/mn/")
+
+        assert progress == {"mn1.json": {"name": "mn1.json", "progress": 50.0, "total_keys": 2, "translated_keys": 1}}
+        prefix, children = (
+            condition.compile(dialect=postgresql.dialect()) for condition in query.filter.call_args.args
+        )
+        assert "LIKE" in str(prefix) and "NOT LIKE" in str(children)
+        assert prefix.params["file_path_1"] == "translation/en/one\\_two/mn/%"
+        assert children.params["file_path_1"] == "translation/en/one\\_two/mn/%/%"
@@ -0,0 +1,115 @@
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+import redis
+from app.core.config import settings
+from app.services.git import commit_scheduler
+from app.services.git.manager import GitManager
+from app.services.projects.utils import write_json_data
+from app.tasks import commit_batch
+from search.search import Search
+from search.utils import create_doc_id
+
+USER = {"github_id": 1, "username": "test", "email": "test@test.com"}
+
+
+class TestCommitScheduler:
+    @pytest.mark.parametrize("action, delayed, countdown", [(0, False, False), (1, False, True), (2, True, False)])
+    @patch("app.services.git.commit_scheduler.flush_commits")
+    @patch("app.services.git.commit_scheduler._get_client")
+    def test_schedule_commit(self, mock_get_client, mock_flush_commits, action, delayed, countdown):
+        mock_get_client.return_value.eval.return_value = action
+
+        request_id = commit_scheduler.schedule_commit(USER, ["translation/en/test/mn1.json"], "Edit")
+
+        args = mock_get_client.return_value.eval.call_args.args
+        assert args[3] == f"{commit_scheduler.REQUESTS_PREFIX}1"
+        assert json.loads(args[7]) == {
+            "id": request_id,
+            "user": USER,
+            "paths": ["translation/en/test/mn1.json"],
+            "message": "Edit",
+            "add": True,
+        }
+        assert mock_flush_commits.delay.called is delayed
+        assert mock_flush_commits.apply_async.called is countdown
+
+    @patch("app.services.git.commit_scheduler.commit")
+    @patch("app.services.git.commit_scheduler._get_client")
+    def test_schedule_commit_falls_back_to_a_single_commit(self, mock_get_client, mock_commit):
+        mock_get_client.return_value.eval.side_effect = redis.ConnectionError
+        mock_commit.delay.return_value = MagicMock(id="task-id")
+
+        assert commit_scheduler.schedule_commit(USER, ["a.json"], "Remove", add=False) == "task-id"
+        mock_commit.delay.assert_called_once_with(USER, ["a.json"], "Remove", False)
+
+    def test_group_by_author_and_message(self):
+        other = {**USER, "github_id": 2, "username": "other"}
+        requests = [
+            {"id": "1", "user": USER, "message": "Edit a"},
+            {"id": "2", "user": other, "message": "Edit b"},
+            {"id": "3", "user": USER, "message": "Edit c"},
+            {"id": "4", "user": USER, "message": "Edit a"},
+        ]
+
+        groups = commit_scheduler.group_by_author(requests)
+
+        assert [[request["id"] for request in group] for group in groups.values()] == [["1", "3", "4"], ["2"]]
+        assert commit_scheduler.get_batch_message("other", groups["2"]) == "Edit b"
+        assert commit_scheduler.get_batch_message("test", groups["1"]) == "3 edits by test\n\n- Edit a\n- Edit c"
+
+    @pytest.mark.parametrize("acquired, released", [(True, True), (redis.ConnectionError, False)])
+    @patch("app.services.git.commit_scheduler._get_client")
+    def test_work_dir_lock(self, mock_get_client, acquired, released):
+        lock = mock_get_client.return_value.lock.return_value
+        lock.acquire.side_effect = [acquired]
+
+        with commit_scheduler.work_dir_lock():
+            pass
+
+        assert mock_get_client.return_value.lock.call_args.args == (commit_scheduler.WORK_DIR_LOCK,)
+        assert lock.release.called is released
+
+    @patch("app.services.git.commit_scheduler._get_client")
+    def test_work_dir_lock_times_out(self, mock_get_client):
+        mock_get_client.return_value.lock.return_value.acquire.return_value = False
+
+        with pytest.raises(TimeoutError):
+            with commit_scheduler.work_dir_lock():
+                pass
+
+    @patch("app.tasks._publish_event")
+    @patch("app.services.git.commit_scheduler._get_client")
+    def test_commit_batch_keeps_a_new_file_indexed(self, mock_get_client, mock_publish_event, setup_git_repos, user):
+        published_dir, unpublished_dir, _ = setup_git_repos
+        manager = GitManager(published_dir, unpublished_dir, user)
+        GitManager.push(manager.unpublished, "origin", "unpublished")
+        path = "translations/en/test/sutta/an/an1/an1.11-20_translation-en-test.json"
+        file_path = Path(manager.unpublished.workdir) / path
+        write_json_data(file_path, {"an1.11:0.1": "Numbered Discourses 1.11–20 ", "an1.11:1.1": "So I have heard. "})
+        client = MagicMock()
+        client.mget.return_value = {"docs": [{"_id": create_doc_id(file_path), "found": False}]}
+        request = {"id": "1", "user": user.model_dump(), "paths": [path], "message": "Add", "add": True}
+
+        with (
+            patch.object(settings, "WORK_DIR", unpublished_dir),
+            patch.object(settings, "PUBLISHED_DIR", published_dir),
+            patch("app.tasks.commit_batch.backend"),
+            patch.object(Search, "_search", client),
+            patch("search.search.utils.find_root_path", return_value=None),
+            patch("search.search.cache"),
+            patch("search.search.helpers.bulk", return_value=(3, [])) as mock_bulk,
+        ):
+            assert commit_batch([request]) == {"1": True}
+
+        assert path in manager.unpublished.head.peel().tree
+        actions = mock_bulk.call_args.args[1]
+        assert not [action for action in actions if action.get("_op_type") == "delete"]
+        assert {(action["_index"], action["_id"]) for action in actions} == {
+            (settings.ES_INDEX, create_doc_id(file_path)),
+            (settings.ES_SEGMENTS_INDEX, create_doc_id(file_path, "an1.11:0.1")),
+            (settings.ES_SEGMENTS_INDEX, create_doc_id(file_path, "an1.11:1.1")),
+        }
+        assert mock_publish_event.called
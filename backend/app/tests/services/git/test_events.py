@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app.core.config import settings
+from app.services.git import events
+from app.services.git.events import GitEvent
+
+
+class TestEvents:
+    def test_create_event(self):
+        event = GitEvent.create(
+            "commit",
+            "unpublished",
+            "test",
+            [
+                settings.WORK_DIR / "translation/en/test/sutta/mn/mn1_translation-en-test.json",
+                "translation/en/test/sutta/mn/mn1_translation-en-test.json",
+                settings.WORK_DIR / "comment/en/test/sutta/mn/mn1_comment-en-test.json",
+            ],
+            before="a" * 40,
+        )
+
+        assert event.paths == (
+            "comment/en/test/sutta/mn/mn1_comment-en-test.json",
+            "translation/en/test/sutta/mn/mn1_translation-en-test.json",
+        )
+        assert event.muids == ("comment-en-test", "translation-en-test")
+        assert event.before == "a" * 40 and event.after is None
+        assert GitEvent.from_fields(event.to_fields()) == event
+
+    @pytest.mark.parametrize("branch, handled", [("unpublished", True), ("published", False)])
+    @patch("app.services.git.events.publish_git_event")
+    @patch("app.services.git.events.ProgressMaterializer")
+    def test_handle(self, mock_materializer, mock_publish_git_event, branch, handled):
+        events.handle(GitEvent.create("pull", branch, "test", ["translation/en/test/mn1_translation-en-test.json"]))
+
+        if handled:
+            mock_materializer.return_value.update.assert_called_once_with(
+                ("translation/en/test/mn1_translation-en-test.json",)
+            )
+            mock_publish_git_event.assert_called_once()
+        else:
+            mock_materializer.assert_not_called()
+            mock_publish_git_event.assert_not_called()
+
+    @patch("app.services.git.events.handle")
+    @patch("app.services.git.events._get_client")
+    def test_consume_claims_then_reads_new_entries(self, mock_get_client, mock_handle):
+        claimed = GitEvent.create("commit", "unpublished", "test", ["a.json"])
+        new = GitEvent.create("pull", "unpublished", "test", ["b.json"])
+        client = MagicMock()
+        client.xautoclaim.return_value = ["0-0", [("1-0", claimed.to_fields()), ("2-0", None)], []]
+        client.xreadgroup.side_effect = [[[events.STREAM, [("3-0", new.to_fields())]]], []]
+        mock_get_client.return_value = client
+
+        assert events.consume() == 2
+
+        assert [call.args[0] for call in mock_handle.call_args_list] == [claimed, new]
+        assert [call.args[2] for call in client.xack.call_args_list] == ["1-0", "2-0", "3-0"]
@@ -1,11 +1,21 @@
 import json
 from pathlib import Path
-from unittest.mock import Mock
+from unittest.mock import MagicMock, Mock, patch
 
 import pytest
+from app.services.git.manager import GitManager, get_repository
 from app.services.projects.utils import write_json_data
-from pygit2 import Blob, Oid, Signature
-from search.utils import get_json_data
+from pygit2 import GIT_CHECKOUT_FORCE, Blob, Commit, Oid, Repository, Signature
+from search.search import Search
+from search.utils import create_doc_id, get_json_data
+
+
+def publish_to_branch(git_manager: GitManager, branch: str, paths: list[Path]) -> None:
+    """Commit paths as they are on unpublished to a local branch of published and check it out."""
+    git_manager.checkout(branch)
+    if commit_id := git_manager.build_commit(branch, paths, "Test commit"):
+        git_manager.published.create_reference(f"refs/heads/{branch}", commit_id, force=True)
+        git_manager.published.checkout(f"refs/heads/{branch}", strategy=GIT_CHECKOUT_FORCE)
 
 
 class TestManager:
@@ -276,33 +286,6 @@ class TestManager:
         assert git_manager._cleanup(branch) == expected_output
         assert not bool(git_manager.published.branches.get(branch)) == expected_output
 
-    @pytest.mark.parametrize(
-        "paths, expected_output",
-        [
-            (None, []),
-            ([], []),
-            (
-                [Path("translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json")],
-                [Path("translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json")],
-            ),
-        ],
-    )
-    def test_copy_files(self, paths, expected_output, git_manager):
-        initial_states_published = (
-            {path: git_manager.read_file(git_manager.published, path, "published") for path in paths} if paths else []
-        )
-        initial_states_unpublished = (
-            {path: git_manager.read_file(git_manager.unpublished, path) for path in paths} if paths else []
-        )
-        git_manager.checkout("test_branch")
-        changed_files = git_manager.copy_files(paths)
-        assert changed_files == expected_output
-        for path in changed_files:
-            git_manager.commit(git_manager.published, git_manager.author, git_manager.committer, "Test commit", [path])
-        for path in changed_files:
-            assert git_manager.read_file(git_manager.published, path, "test_branch") == initial_states_unpublished[path]
-            assert git_manager.read_file(git_manager.unpublished, path) != initial_states_published[path]
-
     @pytest.mark.parametrize(
         "branch, path, changes_made, expected_result",
         [
@@ -321,10 +304,8 @@ class TestManager:
         ],
     )
     def test_has_changes(self, branch, path, changes_made, expected_result, git_manager):
-        git_manager.checkout(branch)
+        publish_to_branch(git_manager, branch, [path])
         file_path_published = Path(git_manager.published.workdir) / path
-        git_manager.copy_files([path])
-        git_manager.commit(git_manager.published, git_manager.author, git_manager.committer, "Test commit", [path])
         assert not git_manager.has_changes(branch, path)
 
         data = get_json_data(file_path_published)
@@ -358,3 +339,154 @@ class TestManager:
         git_manager.process_files("test_branch", "Test commit", "Test PR title", "Test PR body", paths)
         assert git_manager.handle_single_file.called == expected_single_call
         assert git_manager.handle_multiple_files.called == expected_multiple_calls
+
+    def test_get_changes_from_diff(self, git_manager):
+        repo = git_manager.published
+        path = Path("translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json")
+        file_path = Path(repo.workdir) / path
+        old_commit = str(repo.head.target)
+        old_oid = repo.head.peel().tree[str(path)].id
+        data = get_json_data(file_path)
+        data["an1.1:1.2"] = "Modified content for testing"
+        write_json_data(file_path, data)
+        git_manager.add(repo, [path])
+        git_manager.commit(repo, git_manager.author, git_manager.committer, "Test commit", [path])
+
+        changes = git_manager.get_changes_from_diff(old_commit, str(repo.head.target), repo)
+
+        assert len(changes) == 1
+        assert changes[0].path == file_path
+        assert changes[0].old_oid == old_oid
+        assert changes[0].new_oid == repo.head.peel().tree[str(path)].id
+        assert git_manager.get_filenames_from_diff(old_commit, str(repo.head.target), repo) == [file_path]
+
+    def test_file_added_by_a_local_commit_stays_indexed_after_pull(self, git_manager):
+        repo = git_manager.unpublished
+        GitManager.push(repo, "origin", "unpublished")
+        path = Path("translations/en/test/sutta/an/an1/an1.11-20_translation-en-test.json")
+        file_path = Path(repo.workdir) / path
+        write_json_data(file_path, {"an1.11:0.1": "Numbered Discourses 1.11–20 ", "an1.11:1.1": "So I have heard. "})
+        git_manager.add(repo, [path])
+        git_manager.commit(repo, git_manager.author, git_manager.committer, "Add an1.11-20", [path])
+
+        git_manager.pull(repo)
+
+        # The remote does not have the commit yet, so the diff from HEAD reports the file as deleted.
+        assert [(change.path, change.new_oid) for change in git_manager.changes] == [(file_path, None)]
+        client = MagicMock()
+        client.mget.return_value = {"docs": [{"_id": create_doc_id(file_path), "found": False}]}
+        with (
+            patch.object(Search, "_search", client),
+            patch("search.search.utils.find_root_path", return_value=None),
+            patch("search.search.cache"),
+            patch("search.search.helpers.bulk", return_value=(3, [])) as mock_bulk,
+        ):
+            Search().sync_changes("main", "segments", repo, git_manager.changes)
+
+        actions = mock_bulk.call_args.args[1]
+        assert not [action for action in actions if action.get("_op_type") == "delete"]
+        assert {(action["_index"], action["_id"]) for action in actions} == {
+            ("main", create_doc_id(file_path)),
+            ("segments", create_doc_id(file_path, "an1.11:0.1")),
+            ("segments", create_doc_id(file_path, "an1.11:1.1")),
+        }
+
+    def test_get_repository_is_shared_and_rereads_index(self, git_manager, setup_git_repos, user):
+        published_dir, unpublished_dir, _ = setup_git_repos
+        path = "translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json"
+
+        assert get_repository(unpublished_dir) is git_manager.unpublished
+        assert GitManager(published_dir, unpublished_dir, user).published is git_manager.published
+
+        other = Repository(str(unpublished_dir))
+        other.index.remove(path)
+        other.index.write()
+
+        assert path not in get_repository(unpublished_dir).index
+
+    def test_get_repository_drops_unwritten_index_changes(self, git_manager, setup_git_repos):
+        _, unpublished_dir, _ = setup_git_repos
+        path = "translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json"
+
+        git_manager.unpublished.index.remove(path)
+
+        assert path in get_repository(unpublished_dir).index
+
+    def test_open_pull_requests_are_listed_once(self, git_manager):
+        project_pr = Mock(number=1, state="open", head=Mock(label=f"{git_manager.repo_owner}:project"))
+        project_pr.get_files.return_value = [Mock(filename="translation/en/test/mn1.json")]
+        file_pr = Mock(number=2, state="open", head=Mock(label=f"{git_manager.repo_owner}:mn1", ref="mn1"))
+        git_manager.github = Mock()
+        git_manager.pull_requests.github = git_manager.github
+        get_pulls = git_manager.github.get_repo.return_value.get_pulls
+        get_pulls.return_value = [project_pr, file_pr]
+
+        assert git_manager.get_pr("project") is project_pr
+        assert git_manager.is_pr_open(f"{git_manager.repo_owner}:mn1")
+        assert not git_manager.is_pr_open("other")
+        assert git_manager.is_file_in_open_pr(project_pr, Path("translation/en/test/mn1.json"))
+        assert not git_manager.is_file_in_open_pr(project_pr, Path("translation/en/test/mn2.json"))
+        git_manager.pull_requests.discard(file_pr)
+
+        assert git_manager.get_pr("mn1") is None
+        get_pulls.assert_called_once_with(state="open", base="published")
+        project_pr.get_files.assert_called_once()
+
+    def test_changed_paths_walks_only_changed_trees(self, git_manager):
+        changed = Path("translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json")
+        unchanged = Path("translations/en/test/sutta/an/an1/an1.11-20_translation-en-test.json")
+        publish_to_branch(git_manager, "test_branch", [changed, unchanged])
+        assert git_manager.changed_paths("test_branch", [changed, unchanged]) == set()
+
+        file_path_published = Path(git_manager.published.workdir) / changed
+        data = get_json_data(file_path_published)
+        data.update({"an1.1:0.1": "Changed"})
+        write_json_data(file_path_published, data)
+        git_manager.add(git_manager.published, [changed])
+        git_manager.commit(git_manager.published, git_manager.author, git_manager.committer, "Test commit", [changed])
+
+        assert git_manager.changed_paths("test_branch", [changed, unchanged]) == {changed}
+        assert git_manager.changed_paths("test_branch", [unchanged]) == set()
+        assert git_manager.has_changes("test_branch", changed)
+        assert not git_manager.has_changes("test_branch", unchanged)
+
+    def test_build_commit_leaves_the_working_tree_alone(self, git_manager):
+        path = Path("translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json")
+        published = git_manager.published
+        head = published.head.target
+        working_copy = (Path(published.workdir) / path).read_bytes()
+
+        commit_id = git_manager.build_commit("test_branch", [path], "Test commit")
+
+        commit = published[commit_id]
+        assert commit.parents[0].id == git_manager.get_base_commit("test_branch").id
+        assert commit.tree[str(path)].data == git_manager.read_file(git_manager.unpublished, path)
+        assert published.head.target == head
+        assert (Path(published.workdir) / path).read_bytes() == working_copy
+        assert not published.branches.get("test_branch")
+
+    def test_build_commit_without_changes(self, git_manager):
+        path = Path("translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json")
+        git_manager.published.create_reference("refs/remotes/origin/test_branch", git_manager.published.head.target)
+        commit_id = git_manager.build_commit("test_branch", [path], "Test commit")
+        git_manager.published.create_reference("refs/remotes/origin/test_branch", commit_id, force=True)
+
+        assert git_manager.build_commit("test_branch", [path], "Test commit") is None
+
+    def test_needs_fetch_only_when_the_remote_moved(self, git_manager, setup_git_repos):
+        _, _, remote_dir = setup_git_repos
+        repo = git_manager.unpublished
+        remote_repo = Repository(str(remote_dir))
+        # A connected remote keeps the references it was advertised, so each check looks it up again.
+        assert git_manager.get_remote_head(repo.remotes["origin"], "unpublished") == (
+            remote_repo.branches["unpublished"].target
+        )
+        assert git_manager.needs_fetch(repo, repo.remotes["origin"], "unpublished")
+
+        repo.remotes["origin"].fetch()
+        assert not git_manager.needs_fetch(repo, repo.remotes["origin"], "unpublished")
+
+        author = Signature("Test", "test@test.com")
+        parent = remote_repo.branches["unpublished"].peel(Commit)
+        remote_repo.create_commit("refs/heads/unpublished", author, author, "Upstream", parent.tree.id, [parent.id])
+        assert git_manager.needs_fetch(repo, repo.remotes["origin"], "unpublished")
@@ -0,0 +1,52 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+from app.services.git.segment_diff import (
+    InlineChange,
+    SegmentChange,
+    SegmentDiffCache,
+    diff_segments,
+    diff_words,
+    parse_segments,
+)
+
+
+class TestSegmentDiff:
+    def test_diff_segments(self):
+        old = {"mn1:1.1": "So I have heard.", "mn1:1.2": "At one time", "mn1:1.3": "Removed"}
+        new = {"mn1:1.1": "Thus have I heard.", "mn1:1.2": "At one time", "mn1:1.4": "Added"}
+
+        assert diff_segments(old, new) == [
+            SegmentChange(segment_id="mn1:1.1", change="modified", old="So I have heard.", new="Thus have I heard."),
+            SegmentChange(segment_id="mn1:1.4", change="added", new="Added"),
+            SegmentChange(segment_id="mn1:1.3", change="removed", old="Removed"),
+        ]
+
+    def test_diff_words(self):
+        assert diff_words("So I have heard.", "Thus have I heard.") == [
+            InlineChange(op="delete", text="So"),
+            InlineChange(op="insert", text="Thus have"),
+            InlineChange(op="equal", text=" I "),
+            InlineChange(op="delete", text="have "),
+            InlineChange(op="equal", text="heard."),
+        ]
+
+    def test_parse_segments(self):
+        assert parse_segments(None) == {}
+        assert parse_segments(json.dumps({"a": "x", "b": ["y"]}).encode()) == {"a": "x", "b": '["y"]'}
+        with pytest.raises(ValueError):
+            parse_segments(b"[]")
+
+    def test_cache_loads_each_pair_once(self):
+        cache = SegmentDiffCache(maxsize=1)
+        load = Mock(return_value=(b'{"a": "x"}', b'{"a": "y"}'))
+
+        first = cache.get("old", "new", True, load)
+        assert cache.get("old", "new", True, load) is first
+        assert first[0].inline == [InlineChange(op="delete", text="x"), InlineChange(op="insert", text="y")]
+        load.assert_called_once()
+
+        cache.get("old", "other", True, load)
+        cache.get("old", "new", True, load)
+        assert load.call_count == 3
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pytest
+from app.services.git.status import WorkTreeStatus
+from pygit2 import GIT_STATUS_WT_MODIFIED, GIT_STATUS_WT_NEW, Repository, Signature
+
+TRACKED = "translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json"
+NEW = "translations/en/test/sutta/an/an1/an1.11-20_translation-en-test.json"
+
+
+class TestWorkTreeStatus:
+    def test_status_and_diff(self, setup_git_repos):
+        _, unpublished_dir, _ = setup_git_repos
+        workdir = Path(unpublished_dir)
+        repo = Repository(str(workdir))
+        worktree_status = WorkTreeStatus(workdir)
+
+        assert worktree_status.status() == {}
+
+        data = json.loads((workdir / TRACKED).read_text())
+        data["an1.1:1.1"] = "Thus have I heard. "
+        (workdir / TRACKED).write_text(json.dumps(data, indent=2, ensure_ascii=False))
+        (workdir / NEW).write_text(json.dumps({"an1.11:0.1": "Numbered Discourses 1.11–20 "}))
+
+        assert worktree_status.status() == {TRACKED: GIT_STATUS_WT_MODIFIED, NEW: GIT_STATUS_WT_NEW}
+        assert worktree_status.file_status(TRACKED) == GIT_STATUS_WT_MODIFIED
+        diff = worktree_status.diff(TRACKED)
+        assert diff.startswith(f"diff --git a/{TRACKED} b/{TRACKED}\n--- a/{TRACKED}\n+++ b/{TRACKED}\n@@")
+        assert '-  "an1.1:1.1": "So I have heard. ",' in diff
+        assert '+  "an1.1:1.1": "Thus have I heard. ",' in diff
+        assert "--- /dev/null" in worktree_status.diff(NEW)
+        assert "... (truncated, " in worktree_status.diff(TRACKED, max_lines=5)
+
+        repo.create_reference("refs/heads/published", repo.head.target)
+        repo.index.add(TRACKED)
+        repo.index.write()
+        author = Signature("Test", "test@test.com")
+        repo.create_commit("HEAD", author, author, "Edit", repo.index.write_tree(), [repo.head.target])
+
+        # Committed but not published is still queued, and compared with the published branch.
+        assert worktree_status.status() == {TRACKED: GIT_STATUS_WT_MODIFIED, NEW: GIT_STATUS_WT_NEW}
+        assert '+  "an1.1:1.1": "Thus have I heard. ",' in worktree_status.diff(TRACKED)
+
+    def test_segment_diff_of_directory(self, setup_git_repos):
+        _, unpublished_dir, _ = setup_git_repos
+
+        with pytest.raises(ValueError):
+            WorkTreeStatus(Path(unpublished_dir)).segment_diff(str(Path(TRACKED).parent))
@@ -0,0 +1,61 @@
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+from app.services.notifications.broadcaster import NotificationBroadcaster, publish_user_event
+
+
+class TestNotificationBroadcaster:
+    @pytest.mark.asyncio
+    @patch.object(NotificationBroadcaster, "_start")
+    async def test_subscribe_shares_counts_between_streams(self, mock_start):
+        count = Mock(return_value=3)
+        broadcaster = NotificationBroadcaster(count)
+        user = Mock(github_id=1)
+
+        first = await broadcaster.subscribe(user)
+        second = await broadcaster.subscribe(user)
+
+        assert first.get_nowait() == ("unread_count", {"unread_count": 3})
+        assert second.get_nowait() == ("unread_count", {"unread_count": 3})
+        count.assert_called_once_with(user)
+
+    @pytest.mark.asyncio
+    @patch.object(NotificationBroadcaster, "_start")
+    async def test_events_only_push_changed_counts(self, mock_start):
+        counts = {1: 3, 2: 5}
+        broadcaster = NotificationBroadcaster(lambda user: counts[user.github_id])
+        first, second = Mock(github_id=1), Mock(github_id=2)
+        first_queue = await broadcaster.subscribe(first)
+        second_queue = await broadcaster.subscribe(second)
+        first_queue.get_nowait(), second_queue.get_nowait()
+
+        counts[1] = 4
+        broadcaster._handle(json.dumps({"type": "git"}).encode())
+        for github_id in broadcaster._pending:
+            await broadcaster._recompute(github_id)
+
+        assert first_queue.get_nowait() == ("unread_count", {"unread_count": 4})
+        assert second_queue.empty()
+
+    @pytest.mark.asyncio
+    @patch.object(NotificationBroadcaster, "_start")
+    async def test_user_events_ignore_users_without_streams(self, mock_start):
+        broadcaster = NotificationBroadcaster(Mock(return_value=0))
+        user = Mock(github_id=1)
+        queue = await broadcaster.subscribe(user)
+
+        broadcaster._handle(json.dumps({"type": "user", "github_ids": [1, 2]}).encode())
+        assert broadcaster._pending == {1}
+
+        broadcaster.unsubscribe(user, queue)
+        assert broadcaster._users == {} and broadcaster._counts == {}
+
+    @patch("app.services.notifications.broadcaster._get_client")
+    def test_publish_user_event(self, mock_get_client):
+        publish_user_event([2, 1, 2])
+        publish_user_event([])
+
+        mock_get_client.return_value.publish.assert_called_once_with(
+            "notifications:events", json.dumps({"type": "user", "github_ids": [1, 2]})
+        )
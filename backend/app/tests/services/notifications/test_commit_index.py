@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+
+import pytest
+from app.services.notifications.commit_index import CommitIds, CommitIndex, relative_date
+from pygit2 import Repository, Signature
+
+FILE_PATH = "translations/en/test/sutta/an/an1/an1.1-10_translation-en-test.json"
+
+
+def commit_change(repo: Repository, work_dir: Path, data: dict[str, str], author: Signature, message: str) -> None:
+    (work_dir / FILE_PATH).write_text(json.dumps(data, indent=2, ensure_ascii=False))
+    repo.index.add(FILE_PATH)
+    repo.index.write()
+    repo.create_commit("HEAD", author, author, message, repo.index.write_tree(), [repo.head.target])
+
+
+class TestCommitIndex:
+    @pytest.mark.parametrize(
+        "seconds, expected",
+        [
+            (1, "1 second ago"),
+            (89, "89 seconds ago"),
+            (3 * 60 * 60, "3 hours ago"),
+            (2 * 24 * 60 * 60, "2 days ago"),
+            (21 * 24 * 60 * 60, "3 weeks ago"),
+            (100 * 24 * 60 * 60, "3 months ago"),
+            (400 * 24 * 60 * 60, "1 year, 1 month ago"),
+            (3000 * 24 * 60 * 60, "8 years ago"),
+        ],
+    )
+    def test_relative_date(self, seconds, expected):
+        assert relative_date(1_000_000_000 - seconds, now=1_000_000_000) == expected
+
+    def test_get_commits_is_incremental(self, setup_git_repos):
+        _, unpublished_dir, _ = setup_git_repos
+        work_dir = Path(unpublished_dir)
+        repo = Repository(str(work_dir))
+        index = CommitIndex(work_dir)
+
+        assert [entry.summary for entry in index.get_commits(1, ["Test"])] == ["Initial commit"]
+        first = index.commits[0]
+
+        data = json.loads((work_dir / FILE_PATH).read_text())
+        data["an1.1:1.1"] = "Thus have I heard. "
+        commit_change(repo, work_dir, data, Signature("sujato", "sujato@test.com"), "Update an1\n\nDetails")
+
+        commits = index.get_commits(1, ["sujato"])
+
+        assert [entry.summary for entry in commits] == ["Update an1"]
+        assert index.commits[1] is first
+        assert commits[0].author == "sujato <sujato@test.com>"
+        assert commits[0].info().startswith(f"{commits[0].short_id} Update an1 (")
+        changes = index.get_changes(commits[0])
+        assert list(changes) == [FILE_PATH]
+        assert '-  "an1.1:1.1": "So I have heard. ",' in changes[FILE_PATH]
+        assert '+  "an1.1:1.1": "Thus have I heard. ",' in changes[FILE_PATH]
+        assert index.get_changes(first)[FILE_PATH].count("\n+") >= 5
+
+    def test_commit_ids_match_abbreviations_of_any_length(self, setup_git_repos):
+        _, unpublished_dir, _ = setup_git_repos
+        entry = CommitIndex(Path(unpublished_dir)).get_commits(1, ["Test"])[0]
+        oid = str(entry.oid)
+
+        assert entry in CommitIds([entry.short_id])
+        assert entry in CommitIds(["0000000", oid[:12].upper()])
+        assert entry not in CommitIds([])
+        assert entry not in CommitIds([oid[:6] + ("0" if oid[6] != "0" else "1")])
+
+    @pytest.mark.parametrize("commit_id", ["not-a-revision", "HEAD~5", "^{"])
+    def test_get_segment_changes_of_unknown_revision(self, setup_git_repos, commit_id):
+        _, unpublished_dir, _ = setup_git_repos
+
+        with pytest.raises(KeyError):
+            CommitIndex(Path(unpublished_dir)).get_segment_changes(commit_id, FILE_PATH)
+
+    def test_get_segment_changes_of_directory(self, setup_git_repos):
+        _, unpublished_dir, _ = setup_git_repos
+
+        with pytest.raises(ValueError):
+            CommitIndex(Path(unpublished_dir)).get_segment_changes("HEAD", str(Path(FILE_PATH).parent))
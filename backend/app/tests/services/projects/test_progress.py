@@ -0,0 +1,113 @@
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app.core.config import settings
+from app.services.projects.progress import ProgressMaterializer, _compute_group, compute_progress
+from search.utils import FileChange, get_prefix
+from sqlalchemy.dialects import postgresql
+
+
+@pytest.fixture
+def work_dir(tmp_path: Path) -> Path:
+    work_dir = tmp_path / "unpublished"
+    with patch.object(settings, "WORK_DIR", work_dir):
+        yield work_dir
+
+
+def write_json(path: Path, data: dict[str, str]) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data))
+    return path
+
+
+class TestProgress:
+    @pytest.mark.parametrize(
+        "source, translation, expected",
+        [
+            ({"a": "1", "b": "2"}, {"a": "x", "b": "y"}, (2, 2, 100.0)),
+            ({"a": "1", "b": "2", "c": "3"}, {"a": "x", "b": " ", "d": "z"}, (3, 1, 33.33)),
+            ({}, {"a": "x"}, (0, 0, 0.0)),
+        ],
+    )
+    def test_compute_progress(self, source, translation, expected):
+        assert compute_progress(source, translation) == expected
+
+    def test_compute_group_reads_root_once(self, work_dir):
+        root = write_json(work_dir / "root/pli/ms/sutta/mn/mn1_root-pli-ms.json", {"mn1:1": "a", "mn1:2": "b"})
+        first = write_json(work_dir / "translation/en/one/sutta/mn/mn1_translation-en-one.json", {"mn1:1": "x"})
+        second = write_json(
+            work_dir / "translation/de/two/sutta/mn/mn1_translation-de-two.json", {"mn1:1": "x", "mn1:2": "y"}
+        )
+
+        with patch(
+            "app.services.projects.progress.get_json_data", side_effect=lambda path: json.loads(path.read_text())
+        ) as mock_get_json_data:
+            rows, errors = _compute_group(root, [first, second])
+
+        assert errors == 0
+        assert [call.args[0] for call in mock_get_json_data.call_args_list].count(root) == 1
+        assert rows == [
+            {
+                "file_path": "translation/en/one/sutta/mn/mn1_translation-en-one.json",
+                "prefix": "mn1",
+                "muid": "translation-en-one",
+                "progress": 50.0,
+                "total_keys": 2,
+                "translated_keys": 1,
+            },
+            {
+                "file_path": "translation/de/two/sutta/mn/mn1_translation-de-two.json",
+                "prefix": "mn1",
+                "muid": "translation-de-two",
+                "progress": 100.0,
+                "total_keys": 2,
+                "translated_keys": 2,
+            },
+        ]
+
+    def test_update(self, work_dir):
+        root = write_json(work_dir / "root/pli/ms/sutta/mn/mn1_root-pli-ms.json", {"mn1:1": "a", "mn1:2": "b"})
+        changed = write_json(
+            work_dir / "translation/en/one/sutta/dn/dn1_translation-en-one.json", {"dn1:1": "x", "dn1:2": ""}
+        )
+        dn_root = write_json(work_dir / "root/pli/ms/sutta/dn/dn1_root-pli-ms.json", {"dn1:1": "a", "dn1:2": "b"})
+        sibling = write_json(work_dir / "translation/en/one/sutta/mn/mn1_translation-en-one.json", {"mn1:1": "x"})
+        deleted = work_dir / "translation/en/one/sutta/an/an1_translation-en-one.json"
+        roots = {"mn1": root, "dn1": dn_root}
+        session = MagicMock()
+        session.scalars.return_value.all.return_value = [str(sibling.relative_to(work_dir))]
+        session.execute.return_value.rowcount = 1
+
+        with (
+            patch("app.services.projects.progress.get_sess") as mock_get_sess,
+            patch("app.services.projects.progress.find_root_path", side_effect=lambda path: roots[get_prefix(path)]),
+        ):
+            mock_get_sess.return_value.__enter__.return_value = session
+            result = ProgressMaterializer(workers=1).update(
+                [
+                    FileChange(path=root, old_oid=None, new_oid=None),
+                    str(changed.relative_to(work_dir)),
+                    deleted,
+                    work_dir / "README.md",
+                ]
+            )
+
+        assert result == {"status": "success", "updated_count": 2, "error_count": 0, "removed_count": 1}
+        upsert, delete_ = (call.args[0] for call in session.execute.call_args_list)
+        compiled = upsert.compile(dialect=postgresql.dialect())
+        assert "ON CONFLICT (file_path) DO UPDATE" in str(compiled)
+        rows = {
+            compiled.params[f"file_path_m{i}"]: (
+                compiled.params[f"total_keys_m{i}"],
+                compiled.params[f"translated_keys_m{i}"],
+                compiled.params[f"progress_m{i}"],
+            )
+            for i in range(2)
+        }
+        assert rows == {
+            "translation/en/one/sutta/dn/dn1_translation-en-one.json": (2, 1, 50.0),
+            "translation/en/one/sutta/mn/mn1_translation-en-one.json": (2, 1, 50.0),
+        }
+        assert list(delete_.compile().params["file_path_1"]) == [str(deleted.relative_to(work_dir))]
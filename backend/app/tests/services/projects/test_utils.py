@@ -54,10 +54,10 @@ class TestProjectsUtils:
         assert {get_split_merge_text_type(path) for path in manual_publish_paths} == MANUAL_PUBLISH_SPLIT_MERGE_TYPES
 
     @patch("app.services.projects.utils.get_user")
-    @patch("app.services.projects.utils.commit")
+    @patch("app.services.projects.utils.schedule_commit")
     def test_schedule_split_merge_auto_publish_only_commits_structural_files(
         self,
-        mock_commit,
+        mock_schedule_commit,
         mock_get_user,
         user,
     ):
@@ -68,7 +68,7 @@ class TestProjectsUtils:
             Path("/app/checkouts/unpublished/comment/en/user/sutta/dn/dn1_comment-en-user.json"),
         ]
         mock_get_user.return_value = user
-        mock_commit.delay.return_value.id = "task-id"
+        mock_schedule_commit.return_value = "task-id"
 
         result = schedule_split_merge_auto_publish(user, paths, "split")
 
@@ -81,17 +81,17 @@ class TestProjectsUtils:
             "/translation/en/user/sutta/dn/dn1_translation-en-user.json",
             "/comment/en/user/sutta/dn/dn1_comment-en-user.json",
         ]
-        mock_commit.delay.assert_called_once()
-        committed_paths = mock_commit.delay.call_args.args[1]
+        mock_schedule_commit.assert_called_once()
+        committed_paths = mock_schedule_commit.call_args.args[1]
         assert committed_paths == [
             "root/pli/ms/sutta/dn/dn1_root-pli-ms.json",
             "html/pli/ms/sutta/dn/dn1_html-pli-ms.json",
         ]
 
-    @patch("app.services.projects.utils.commit")
+    @patch("app.services.projects.utils.schedule_commit")
     def test_schedule_split_merge_auto_publish_skips_commit_without_structural_files(
         self,
-        mock_commit,
+        mock_schedule_commit,
         user,
     ):
         paths = [
@@ -107,7 +107,7 @@ class TestProjectsUtils:
             "/translation/en/user/sutta/dn/dn1_translation-en-user.json",
             "/comment/en/user/sutta/dn/dn1_comment-en-user.json",
         ]
-        mock_commit.delay.assert_not_called()
+        mock_schedule_commit.assert_not_called()
 
     def test_sort_paths(self):
         paths = {"path/2b", "path/10a", "path/1c"}
@@ -177,8 +177,8 @@ class TestProjectsUtils:
         ), patch(
             "app.services.projects.utils.get_user"
         ) as mock_get_user, patch(
-            "app.services.projects.utils.commit.delay",
-            return_value=MagicMock(id="test_task_id"),
+            "app.services.projects.utils.schedule_commit",
+            return_value="test_task_id",
         ):
             mock_get_user.return_value = user
             mock_search.update_segments.return_value = update_segments_return
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Any, AsyncGenerator
+
+from app.core.config import settings
+from elasticsearch import AsyncElasticsearch, RequestError, helpers
+
+from . import cache, queries, utils
+from .search import create_file_actions
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSearch:
+    """
+    Read path of the search indexes for the API workers.
+
+    Builds its requests with search.queries like Search does, but awaits an AsyncElasticsearch
+    client, so a slow aggregation no longer blocks the event loop. Index creation, bulk loading
+    and the other writes stay on the synchronous Search used by the Celery workers.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncSearch, cls).__new__(cls)
+            cls._instance._client = None
+            cls._instance._client_lock = Lock()
+        return cls._instance
+
+    @property
+    def _search(self) -> AsyncElasticsearch:
+        # Connecting on first use keeps imports and worker startup independent of the cluster.
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> AsyncElasticsearch:
+        return AsyncElasticsearch(
+            [
+                {
+                    "host": settings.ES_HOST,
+                    "port": settings.ES_REQUESTS_PORT,
+                    "scheme": settings.ES_SCHEME,
+                }
+            ],
+            basic_auth=(settings.ELASTIC_USERNAME, settings.ELASTIC_PASSWORD),
+            ca_certs=str(utils.get_ca_cert_path()),
+            connections_per_node=settings.ES_ASYNC_CONNECTIONS_PER_NODE,
+            request_timeout=settings.ES_ASYNC_REQUEST_TIMEOUT,
+            retry_on_timeout=True,
+            max_retries=2,
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _scroll_search(self, query, index: str = settings.ES_INDEX) -> AsyncGenerator:
+        response = await self._search.search(index=index, body=query, scroll=queries.SCROLL, size=queries.SCROLL_SIZE)
+        scroll_id = response.get("_scroll_id")
+        try:
+            hits = response.get("hits", {}).get("hits", [])
+            while hits:
+                for hit in hits:
+                    yield hit
+                response = await self._search.scroll(scroll_id=scroll_id, scroll=queries.SCROLL)
+                scroll_id = response.get("_scroll_id", scroll_id)
+                hits = response.get("hits", {}).get("hits", [])
+        finally:
+            if scroll_id:
+                try:
+                    await self._search.clear_scroll(scroll_id=scroll_id)
+                except Exception:
+                    logger.debug("Failed to clear scroll context", exc_info=True)
+
+    async def _collect(self, query: dict[str, Any], field: str) -> set[str]:
+        return {hit["_source"][field] async for hit in self._scroll_search(query) if hit["_source"][field] is not None}
+
+    async def find_unique_data(self, field: str = None, prefix: str = None, size: int = 10000) -> list[str]:
+        body: dict[str, Any] = queries.build_unique_query(field, prefix, size)
+        return queries.read_bucket_keys(await self._search.search(index=settings.ES_INDEX, body=body))
+
+    async def get_distinct_data(self, field: str, prefix: str = None, size: int = 10000) -> list[str]:
+        body: dict[str, Any] = queries.build_distinct_query(field, prefix, size)
+        return queries.read_bucket_keys(await self._search.search(index=settings.ES_INDEX, body=body))
+
+    async def get_file_paths(
+        self, muid: str, prefix: str = None, exact: bool = False, _type: str = "root_path"
+    ) -> set[str]:
+        return await self._collect(queries.build_file_paths_query(muid, prefix, exact, _type), _type)
+
+    async def get_file_paths_for_split_merge(
+        self, muid: str, prefix: str = None, exact: bool = False, _type: str = "root_path"
+    ) -> set[str]:
+        return await self._collect(queries.build_split_merge_paths_query(muid, prefix, _type), _type)
+
+    async def get_segments(self, size: int, page: int, muids: dict[str, str]) -> dict[str, dict[str, str]] | dict:
+        return await cache.get_or_compute(
+            "segments", [size, page, muids], lambda: self._get_segments(size, page, dict(muids))
+        )
+
+    async def _get_segments(self, size: int, page: int, muids: dict[str, str]) -> dict[str, dict[str, str]] | dict:
+        from_: int = page * size
+        uid: str | None = muids.pop("uid", None)
+        if not uid and not any(muids.values()):
+            return {}
+        body: dict[str, Any] = queries.build_search_body(size, from_, muids, uid)
+        results: dict[str, dict[str, str]] = queries.get_results(
+            await self._search.search(index=settings.ES_SEGMENTS_INDEX, body=body)
+        )
+        if not any(muids.values()):
+            return results
+        return queries.sort_segments(await self._get_segments_for_remaining_muids(results, muids))
+
+    async def get_segments_page(
+        self, size: int, cursor: str | None, muids: dict[str, str]
+    ) -> tuple[dict[str, dict[str, str]], str | None]:
+        results, next_cursor = await cache.get_or_compute(
+            "segments_page", [size, cursor, muids], lambda: self._get_segments_page(size, cursor, dict(muids))
+        )
+        return results, next_cursor
+
+    async def _get_segments_page(
+        self, size: int, cursor: str | None, muids: dict[str, str]
+    ) -> tuple[dict[str, dict[str, str]], str | None]:
+        after: dict[str, str] | None = utils.decode_cursor(cursor)
+        uid: str | None = muids.pop("uid", None)
+        if not uid and not any(muids.values()):
+            return {}, None
+        doc_count, hits_size = queries.get_min_doc_count_and_hits_size(muids, uid)
+        body: dict[str, Any] = queries.build_search_body(size, 0, muids, uid)
+        results: dict[str, dict[str, str]] = {}
+        while True:
+            body["aggs"] = queries.build_composite_aggs(hits_size, size, after)
+            es_results: dict[str, Any] = await self._search.search(index=settings.ES_SEGMENTS_INDEX, body=body)
+            after = queries.read_composite_page(es_results["aggregations"]["uids"], results, doc_count, size)
+            if after is None or len(results) == size:
+                break
+        if any(muids.values()):
+            results = queries.sort_segments(await self._get_segments_for_remaining_muids(results, muids))
+        return results, utils.encode_cursor(after) if after else None
+
+    async def _get_segments_for_remaining_muids(self, results, muids) -> dict[str, dict[str, str]]:
+        if not results:
+            return {}
+        uids: list[str] = queries.pop_found_muids(results, muids)
+        return queries.merge_missing_data(results, await self._get_missing_data(uids, muids.keys()))
+
+    async def _get_missing_data(self, uids, muids) -> dict[str, dict[str, str]]:
+        results: dict[str, dict[str, str]] = {uid: {} for uid in uids}
+        body, paged = queries.build_missing_data_body(uids, muids)
+        while True:
+            response: dict[str, Any] = await self._search.search(index=settings.ES_SEGMENTS_INDEX, body=body)
+            hits: list[dict[str, Any]] = response["hits"]["hits"]
+            queries.read_missing_data(hits, results)
+            if not paged or not hits:
+                return results
+            body["search_after"] = hits[-1].get("sort")
+
+    async def get_translation_hints(self, text_value: str, source_muid: str, target_muid: str) -> list[dict]:
+        return await cache.get_or_compute(
+            "hints",
+            [text_value, source_muid, target_muid],
+            lambda: self._get_translation_hints(text_value, source_muid, target_muid),
+        )
+
+    async def _get_translation_hints(self, text_value: str, source_muid: str, target_muid: str) -> list[dict]:
+        similar_phrases: list[dict] = await self.get_phrase_similar_segments(text_value, source_muid)
+        translation_hints: list[dict] = await self.get_segment_value_for_uids_and_muid(
+            [phrase.get("uid") for phrase in similar_phrases], target_muid
+        )
+        merged: list[dict] = queries.merge_segments_with_translation_hints(similar_phrases, translation_hints)
+        return queries.aggregate_similar_segments(merged)
+
+    async def get_phrase_similar_segments(
+        self, phrase_value: str, source_muid: str, size: int = 20
+    ) -> list[dict[str, str]]:
+        if not phrase_value or not phrase_value.strip():
+            return []
+        query: dict[str, Any] = queries.build_phrase_similar_query(phrase_value, source_muid)
+        return queries.read_sources(await self._search.search(index=settings.ES_SEGMENTS_INDEX, body=query, size=size))
+
+    async def get_segment_value_for_uids_and_muid(self, uids: list[str], muid: str, size: int = 250) -> list[dict]:
+        query: dict[str, Any] = queries.build_segment_values_query(uids, muid)
+        return queries.read_sources(await self._search.search(index=settings.ES_SEGMENTS_INDEX, body=query, size=size))
+
+    async def add_to_index(self, path: Path, refresh: bool = False) -> tuple[bool, Exception | None]:
+        actions: list[dict[str, Any]] = await asyncio.to_thread(
+            create_file_actions, path, settings.ES_INDEX, settings.ES_SEGMENTS_INDEX
+        )
+        try:
+            await helpers.async_bulk(
+                self._search,
+                actions,
+                chunk_size=settings.ES_BULK_CHUNK_SIZE,
+                raise_on_error=True,
+                refresh=refresh,
+            )
+        except (RequestError, helpers.BulkIndexError) as e:
+            return False, e
+        finally:
+            await cache.abump_generation()
+        return True, None
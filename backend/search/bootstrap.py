@@ -0,0 +1,58 @@
+import logging
+
+import redis
+from app.core.config import settings
+from redis.exceptions import LockError
+
+from .search import Search
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_LOCK: str = f"search-bootstrap:{settings.ES_INDEX}"
+# How long the bootstrap task waits before checking again on a migration or another bootstrap.
+RETRY_SECONDS: int = 60
+
+
+def _bootstrap() -> bool:
+    if not Search().bootstrap():
+        logger.info("The main index is still being migrated; bootstrap again once the reindex task is done")
+        return False
+    return True
+
+
+def bootstrap_indexes() -> bool:
+    """
+    Create and, if empty, populate the indexes from a single process.
+
+    Run by the bootstrap_search task that every API worker queues on startup, and by
+    `python -m search.bootstrap`. The process that takes the Redis lock does the work and the
+    others return straight away. Returns whether the indexes are ready, which is not the case
+    while another process holds the lock or the main index is still being migrated.
+    """
+    client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD)
+    lock = client.lock(BOOTSTRAP_LOCK, timeout=settings.SEARCH_BOOTSTRAP_LOCK_TIMEOUT, blocking=False)
+    try:
+        acquired: bool = lock.acquire()
+    except redis.RedisError:
+        logger.warning("Redis unavailable, bootstrapping search indexes without a lock", exc_info=True)
+        return _bootstrap()
+    if not acquired:
+        logger.info("Search indexes are being bootstrapped by another process")
+        return False
+    try:
+        return _bootstrap()
+    finally:
+        try:
+            lock.release()
+        except (LockError, redis.RedisError):
+            logger.warning("Failed to release the search bootstrap lock", exc_info=True)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    if not bootstrap_indexes():
+        print("Search indexes are being bootstrapped by another process or migrated; run again later")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable
+
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX: str = f"search-cache:{settings.ES_SEGMENTS_INDEX}"
+GENERATION_KEY: str = f"{_KEY_PREFIX}:generation"
+# Present while a write may not be searchable yet; nothing is cached until it expires.
+SETTLING_KEY: str = f"{_KEY_PREFIX}:settling"
+STATS_KEY: str = f"{_KEY_PREFIX}:stats"
+
+_client: redis.Redis | None = None
+_async_client: aioredis.Redis | None = None
+
+
+def _get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD)
+    return _client
+
+
+def _get_async_client() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD
+        )
+    return _async_client
+
+
+def _make_key(namespace: str, params: Any) -> str:
+    digest: str = hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    return f"{_KEY_PREFIX}:{namespace}:{digest}"
+
+
+def bump_generation(settle: float = settings.SEARCH_CACHE_SETTLE_SECONDS) -> None:
+    """
+    Invalidate every cached search result.
+
+    Entries remember the generation they were computed under and are ignored once it moves on,
+    so writers never have to know which keys a change affects. A write only becomes searchable
+    at the next refresh of the index, so for `settle` seconds results are computed but not
+    cached; otherwise a query landing before the refresh would cache what the write replaced.
+    """
+    if not settings.SEARCH_CACHE_ENABLED:
+        return
+    try:
+        with _get_client().pipeline() as pipe:
+            _queue_bump(pipe, settle)
+            pipe.execute()
+    except redis.RedisError:
+        logger.warning("Failed to invalidate the search cache", exc_info=True)
+
+
+async def abump_generation(settle: float = settings.SEARCH_CACHE_SETTLE_SECONDS) -> None:
+    if not settings.SEARCH_CACHE_ENABLED:
+        return
+    try:
+        async with _get_async_client().pipeline() as pipe:
+            _queue_bump(pipe, settle)
+            await pipe.execute()
+    except redis.RedisError:
+        logger.warning("Failed to invalidate the search cache", exc_info=True)
+
+
+def _queue_bump(pipe: redis.client.Pipeline | aioredis.client.Pipeline, settle: float) -> None:
+    milliseconds: int = max(int(settle * 1000), 1)
+    # Only ever extended, so a short settle never cuts a longer one short.
+    pipe.set(SETTLING_KEY, 1, px=milliseconds, nx=True)
+    pipe.pexpire(SETTLING_KEY, milliseconds, gt=True)
+    pipe.incr(GENERATION_KEY)
+
+
+def suspend(seconds: float) -> None:
+    """Keep results out of the cache for the next `seconds`, replacing any settle in progress."""
+    if not settings.SEARCH_CACHE_ENABLED:
+        return
+    try:
+        _get_client().set(SETTLING_KEY, 1, px=max(int(seconds * 1000), 1))
+    except redis.RedisError:
+        logger.warning("Failed to suspend the search cache", exc_info=True)
+
+
+async def get_or_compute(namespace: str, params: Any, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Return the cached result for params, or await compute and cache it. Redis errors fall through to ES."""
+    if not settings.SEARCH_CACHE_ENABLED:
+        return await compute()
+    key: str = _make_key(namespace, params)
+    client: aioredis.Redis = _get_async_client()
+    try:
+        generation, settling, entry = await client.mget(GENERATION_KEY, SETTLING_KEY, key)
+    except redis.RedisError:
+        logger.warning("Search cache unavailable", exc_info=True)
+        return await compute()
+
+    generation = int(generation or 0)
+    if entry is not None:
+        cached: dict[str, Any] = json.loads(entry)
+        if cached["g"] == generation:
+            await _record(client, namespace, "hits")
+            return cached["v"]
+
+    value: Any = await compute()
+    if settling is not None:
+        await _record(client, namespace, "misses")
+        return value
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            # Stored under the generation read before computing: a write that lands meanwhile
+            # bumps the counter and the entry is never served.
+            pipe.set(key, json.dumps({"g": generation, "v": value}, ensure_ascii=False), ex=settings.SEARCH_CACHE_TTL)
+            pipe.hincrby(STATS_KEY, f"{namespace}:misses", 1)
+            await pipe.execute()
+    except redis.RedisError:
+        logger.warning("Failed to store search cache entry", exc_info=True)
+    return value
+
+
+async def _record(client: aioredis.Redis, namespace: str, outcome: str) -> None:
+    try:
+        await client.hincrby(STATS_KEY, f"{namespace}:{outcome}", 1)
+    except redis.RedisError:
+        logger.debug("Failed to record search cache %s", outcome, exc_info=True)
+
+
+async def get_stats() -> dict[str, Any]:
+    client: aioredis.Redis = _get_async_client()
+    try:
+        generation, counters = await client.get(GENERATION_KEY), await client.hgetall(STATS_KEY)
+    except redis.RedisError:
+        logger.warning("Search cache unavailable", exc_info=True)
+        return {"available": False, "generation": None, "namespaces": {}}
+    namespaces: dict[str, dict[str, float]] = {}
+    for field, count in counters.items():
+        namespace, outcome = field.decode().rsplit(":", 1)
+        namespaces.setdefault(namespace, {"hits": 0, "misses": 0})[outcome] = int(count)
+    for stats in namespaces.values():
+        total = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / total, 4) if total else 0.0
+    return {"available": True, "generation": int(generation or 0), "namespaces": namespaces}
+
+
+async def close() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
@@ -0,0 +1,296 @@
+"""
+Request bodies and response readers shared by Search and AsyncSearch.
+
+The two clients only differ in how they send a request, so everything that decides what is
+asked of Elasticsearch and how the answer is read lives here, once.
+"""
+
+import string
+from typing import Any
+
+SCROLL: str = "1m"
+SCROLL_SIZE: int = 1000
+MISSING_DATA_CHUNK_SIZE: int = 10000
+
+
+def build_unique_query(field: str = None, prefix: str = None, size: int = 10000) -> dict[str, Any]:
+    query = {
+        "size": 0,
+        "aggs": {
+            "unique_data": {
+                "terms": {
+                    "field": field,
+                    "size": size,
+                    "order": {
+                        "_key": "asc",
+                    },
+                }
+            }
+        },
+    }
+    if prefix:
+        query["query"] = {"prefix": {field: prefix}}
+    return query
+
+
+def build_distinct_query(field: str, prefix: str = None, size: int = 10000) -> dict[str, Any]:
+    query: dict[str, Any] = build_unique_query(field=field, size=size)
+    query["query"] = {"term": {"prefix": {"value": prefix}}}
+    return query
+
+
+def read_bucket_keys(response: dict[str, Any]) -> list[str]:
+    return [bucket["key"] for bucket in response["aggregations"]["unique_data"]["buckets"]]
+
+
+def build_file_paths_query(
+    muid: str, prefix: str = None, exact: bool = False, _type: str = "root_path"
+) -> dict[str, Any]:
+    query = {
+        "query": {"bool": {"must": [{"term": {"muid": muid}}]}},
+        "_source": [_type],
+    }
+    if prefix is not None and not exact:
+        query["query"]["bool"]["must"].append({"prefix": {"prefix": prefix}})
+    elif prefix is not None and exact:
+        query["query"]["bool"]["must"].append({"term": {"prefix": prefix}})
+    return query
+
+
+def build_split_merge_paths_query(muid: str, prefix: str = None, _type: str = "root_path") -> dict[str, Any]:
+    query = {
+        "query": {"bool": {"must": [], "should": [{"term": {"muid": muid}}]}},
+        "_source": [_type],
+    }
+    if prefix is not None:
+        query["query"]["bool"]["must"].append({"term": {"prefix": prefix}})
+    return query
+
+
+def get_min_doc_count_and_hits_size(muids: dict[str, str], uid: str | None = None) -> tuple[int, int]:
+    if uid and not any(muids.values()):
+        return len(muids), len(muids)
+    doc_count: int = sum(1 for v in muids.values() if v != "")
+    hits_size: int = len(muids)
+    return doc_count, hits_size
+
+
+def build_search_body(size: int, from_: int, muids: dict[str, str], uid: str | None = None) -> dict[str, Any]:
+    doc_count, hits_size = get_min_doc_count_and_hits_size(muids, uid)
+    if uid and not any(muids.values()):
+        body: dict[str, Any] = {
+            "query": {
+                "bool": {
+                    "must": [
+                        {"bool": {"should": [{"terms": {"muid": [*muids.keys()]}}]}},
+                        {"prefix": {"uid": {"value": uid}}},
+                    ]
+                }
+            }
+        }
+    else:
+        body: dict[str, Any] = {
+            "query": {
+                "bool": {"should": []},
+            }
+        }
+        for muid, lookup in muids.items():
+            body["query"]["bool"]["should"].append(
+                {
+                    "bool": {
+                        "must": [
+                            {"term": {"muid": {"value": muid}}},
+                            {"match_phrase": {"segment": lookup}},
+                        ]
+                    }
+                }
+            )
+            if uid:
+                body["query"]["bool"]["should"][0]["bool"]["must"].append({"prefix": {"uid": {"value": uid}}})
+    body["aggs"] = build_aggs(doc_count, hits_size, size, from_)
+    body["size"] = 0
+    return body
+
+
+def build_aggs(doc_count: int, hits_size: int, size: int, from_: int) -> dict[str, Any]:
+    return {
+        "uids": {
+            "terms": {
+                "field": "uid",
+                "min_doc_count": doc_count,
+                "size": 10000,
+            },
+            "aggs": {
+                "top_uid_hits": {
+                    "top_hits": {
+                        "_source": {"includes": ["muid", "segment"]},
+                        "size": hits_size,
+                    }
+                },
+                "uids_bucket_sort": {"bucket_sort": {"sort": [], "from": from_, "size": size}},
+            },
+        }
+    }
+
+
+def build_composite_aggs(hits_size: int, size: int, after: dict[str, str] | None) -> dict[str, Any]:
+    composite: dict[str, Any] = {"size": size, "sources": [{"uid": {"terms": {"field": "uid"}}}]}
+    if after:
+        composite["after"] = after
+    return {
+        "uids": {
+            "composite": composite,
+            "aggs": {
+                "top_uid_hits": {
+                    "top_hits": {
+                        "_source": {"includes": ["muid", "segment"]},
+                        "size": hits_size,
+                    }
+                }
+            },
+        }
+    }
+
+
+def read_composite_page(
+    aggregation: dict[str, Any], results: dict[str, dict[str, str]], doc_count: int, size: int
+) -> dict[str, str] | None:
+    """
+    Add the buckets that match every lookup to results and return the key to resume after.
+
+    Composite aggregations have no min_doc_count, so sparse buckets are dropped here and the
+    caller keeps paging until a full page is collected or the buckets run out (None).
+    """
+    buckets: list[dict[str, Any]] = aggregation["buckets"]
+    for bucket in buckets:
+        if bucket["doc_count"] < doc_count:
+            continue
+        results[bucket["key"]["uid"]] = {
+            hit["_source"]["muid"]: hit["_source"]["segment"] for hit in bucket["top_uid_hits"]["hits"]["hits"]
+        }
+        if len(results) == size:
+            return bucket["key"]
+    if len(buckets) < size:
+        return None
+    return aggregation.get("after_key")
+
+
+def get_results(es_results: dict[str, Any]) -> dict[str, dict[str, str]]:
+    results: dict[str, dict[str, str]] = {}
+    for data in es_results["aggregations"]["uids"]["buckets"]:
+        uid: str = data["key"]
+        results[uid] = {}
+        for hit in data["top_uid_hits"]["hits"]["hits"]:
+            source: dict[str, str] = hit["_source"]
+            results[uid][source["muid"]] = source["segment"]
+    return results
+
+
+def sort_segments(results: dict[str, dict[str, str]]) -> dict[str, dict[str, str]]:
+    return dict(sorted(results.items(), key=lambda item: len(item[1]), reverse=True))
+
+
+def pop_found_muids(results: dict[str, dict[str, str]], muids: dict[str, str]) -> list[str]:
+    """Drop the muids the first result already has from muids and return the uids to complete."""
+    uids: list[str] = list(results.keys())
+    for muid in list(results[uids[0]].keys()):
+        del muids[muid]
+    return uids
+
+
+def merge_missing_data(
+    results: dict[str, dict[str, str]], missing_data: dict[str, dict[str, str]]
+) -> dict[str, dict[str, str]]:
+    return {uid: {**results.get(uid, {}), **missing_data.get(uid, {})} for uid in set(results) | set(missing_data)}
+
+
+def build_missing_data_body(uids, muids) -> tuple[dict[str, Any], bool]:
+    """The body of the first request for the missing segments and whether more pages follow it."""
+    size: int = len(uids) * len(muids)
+    body: dict[str, Any] = {
+        "size": min(size, MISSING_DATA_CHUNK_SIZE),
+        "query": {
+            "bool": {
+                "must": [
+                    {"terms": {"uid": [*uids]}},
+                    {"bool": {"should": [{"terms": {"muid": [*muids]}}]}},
+                ]
+            }
+        },
+    }
+    paged: bool = size > MISSING_DATA_CHUNK_SIZE
+    if paged:
+        body["sort"] = [{"uid": "asc"}, {"muid": "asc"}]
+    return body, paged
+
+
+def read_missing_data(hits: list[dict[str, Any]], results: dict[str, dict[str, str]]) -> None:
+    for hit in hits:
+        if source := hit.get("_source"):
+            results[source.get("uid")][source.get("muid")] = source.get("segment")
+
+
+def build_phrase_similar_query(phrase_value: str, source_muid: str) -> dict[str, Any]:
+    return {
+        "query": {
+            "bool": {
+                "must": [
+                    {
+                        "multi_match": {
+                            "query": phrase_value,
+                            "fields": ["segment"],
+                            "type": "best_fields",
+                            "fuzziness": "AUTO",
+                            "prefix_length": 2,
+                            "max_expansions": 15,
+                            "operator": "or",
+                        }
+                    },
+                    {"match": {"muid": source_muid}},
+                ]
+            }
+        },
+        "_source": ["segment", "muid", "uid"],
+    }
+
+
+def build_segment_values_query(uids: list[str], muid: str) -> dict[str, Any]:
+    return {
+        "query": {
+            "bool": {
+                "must": [
+                    {"terms": {"uid": uids}},
+                    {"term": {"muid": muid}},
+                ]
+            }
+        },
+        "_source": ["segment", "uid", "muid"],
+    }
+
+
+def read_sources(response: dict[str, Any]) -> list[dict[str, Any]]:
+    return [hit["_source"] for hit in response["hits"]["hits"]]
+
+
+def aggregate_similar_segments(hits: list[dict]) -> list[dict]:
+    unique_segments_dict = {}
+    for hit in hits:
+        segment = hit["translation_hints"].lower()
+        segment = segment.translate(str.maketrans("", "", string.punctuation))
+        if segment not in unique_segments_dict:
+            unique_segments_dict[segment] = hit
+            unique_segments_dict[segment]["strength"] = 1
+        else:
+            unique_segments_dict[segment]["strength"] += 1
+    return list(unique_segments_dict.values())
+
+
+def merge_segments_with_translation_hints(similar_phrases: list[dict], translation_hints: list[dict]) -> list[dict]:
+    hints_by_uid: dict[str, list[dict]] = {}
+    for hint in translation_hints:
+        hints_by_uid.setdefault(hint["uid"], []).append(hint)
+    return [
+        {**phrase, "translation_hints": hint["segment"]}
+        for phrase in similar_phrases
+        for hint in hints_by_uid.get(phrase["uid"], [])
+    ]
@@ -0,0 +1,177 @@
+"""
+Rebuild both search indexes without search downtime.
+
+New indexes named `<alias>-<timestamp>` are filled from the working tree with replicas and refresh
+disabled, checked against the filesystem and then swapped in for the aliases in one atomic
+update_aliases call. Readers and writers keep using the old indexes until that swap; files written
+or deleted meanwhile are caught up before it, and once more after it for the writes in between.
+Only one reindex runs at a time.
+
+Usage: python -m search.reindex [--keep-old]
+"""
+
+import argparse
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import redis
+from app.core.config import settings
+from redis.exceptions import LockError
+
+from . import cache, utils
+from .search import Search
+
+logger = logging.getLogger(__name__)
+
+REINDEX_LOCK: str = f"search-reindex:{settings.ES_INDEX}"
+# Catch-up passes get shorter as they go; a tree that keeps changing is caught up after the swap.
+MAX_CATCH_UP_PASSES: int = 10
+
+
+class ReindexError(Exception):
+    pass
+
+
+def reindex(keep_old: bool = False) -> dict[str, Any]:
+    client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD)
+    lock = client.lock(REINDEX_LOCK, timeout=settings.SEARCH_BOOTSTRAP_LOCK_TIMEOUT, blocking=False)
+    try:
+        acquired: bool = lock.acquire()
+    except redis.RedisError:
+        logger.warning("Redis unavailable, reindexing without a lock", exc_info=True)
+        return _reindex(keep_old)
+    if not acquired:
+        raise ReindexError("Another reindex is running")
+    try:
+        return _reindex(keep_old)
+    finally:
+        try:
+            lock.release()
+        except (LockError, redis.RedisError):
+            logger.warning("Failed to release the reindex lock", exc_info=True)
+
+
+def _reindex(keep_old: bool) -> dict[str, Any]:
+    search = Search()
+    client = search._search
+    timestamp: str = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    targets: dict[str, str] = {
+        settings.ES_INDEX: f"{settings.ES_INDEX}-{timestamp}",
+        settings.ES_SEGMENTS_INDEX: f"{settings.ES_SEGMENTS_INDEX}-{timestamp}",
+    }
+    index, segments_index = targets[settings.ES_INDEX], targets[settings.ES_SEGMENTS_INDEX]
+    for name, _type in ((index, "main"), (segments_index, "segments")):
+        client.indices.create(
+            index=name,
+            settings={**search._get_es_settings(), "number_of_replicas": 0, "refresh_interval": "-1"},
+            mappings=search._get_es_mappings(_type),
+        )
+
+    try:
+        since: float = time.time()
+        paths: set[Path] = set(utils.yield_file_path(settings.WORK_DIR))
+        search._process_data(index, segments_index, list(paths))
+        caught_up: int = 0
+        # Files written while a pass ran may have been read before the change; repeat until quiet.
+        for _ in range(MAX_CATCH_UP_PASSES):
+            changed, since, paths = _catch_up(search, index, segments_index, since, paths)
+            caught_up += changed
+            if not changed:
+                break
+        for name in targets.values():
+            client.indices.put_settings(index=name, settings={"number_of_replicas": 1, "refresh_interval": "1s"})
+            client.indices.refresh(index=name)
+        counts: dict[str, int] = _verify(search, index, segments_index)
+    except Exception:
+        client.indices.delete(index=list(targets.values()), ignore_unavailable=True)
+        raise
+
+    previous: list[str] = _swap_aliases(search, targets)
+    # Writes that went through the aliases to the old indexes between the last pass and the swap.
+    changed, _, _ = _catch_up(search, settings.ES_INDEX, settings.ES_SEGMENTS_INDEX, since, paths)
+    caught_up += changed
+    cache.bump_generation()
+    if previous and not keep_old:
+        client.indices.delete(index=previous, ignore_unavailable=True)
+    logger.info("Reindexed into %s and %s, replaced %s", index, segments_index, previous or "nothing")
+    return {"indexes": list(targets.values()), "replaced": previous, "caught_up": caught_up, **counts}
+
+
+def _catch_up(
+    search: Search, index: str, segments_index: str, since: float, indexed: set[Path]
+) -> tuple[int, float, set[Path]]:
+    """
+    Index the files modified since `since` and drop the files deleted from `indexed`.
+
+    Returns how many files were written or removed, when this pass started and the files the
+    indexes now hold.
+    """
+    started: float = time.time()
+    paths: set[Path] = set(utils.yield_file_path(settings.WORK_DIR))
+    changed: list[Path] = [path for path in paths if path not in indexed or _mtime(path) >= since]
+    deleted: list[Path] = list(indexed - paths)
+    if changed:
+        search._process_data(index, segments_index, changed)
+    if deleted:
+        # Deleting by query only sees documents that a refresh has made searchable.
+        search._search.indices.refresh(index=[index, segments_index])
+        search.delete_from_indexes(index, segments_index, deleted)
+    return len(changed) + len(deleted), started, paths
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def _verify(search: Search, index: str, segments_index: str) -> dict[str, int]:
+    client = search._search
+    expected_files: int = sum(1 for _ in utils.yield_file_path(settings.WORK_DIR))
+    files: int = client.count(index=index)["count"]
+    expected_segments: int = int(
+        client.search(index=index, size=0, aggs={"segments": {"sum": {"field": "segment_count"}}})["aggregations"][
+            "segments"
+        ]["value"]
+    )
+    segments: int = client.count(index=segments_index)["count"]
+    # Files created while verifying can only make the filesystem side larger.
+    if files < expected_files or segments != expected_segments:
+        raise ReindexError(
+            f"Count mismatch: {files} of {expected_files} files and {segments} of {expected_segments} segments indexed"
+        )
+    return {"files": files, "segments": segments}
+
+
+def _swap_aliases(search: Search, targets: dict[str, str]) -> list[str]:
+    """Point every alias at its new index in one request and return the indexes it replaced."""
+    client = search._search
+    actions: list[dict[str, Any]] = []
+    previous: list[str] = []
+    for alias, index in targets.items():
+        actions.append({"add": {"index": index, "alias": alias}})
+        if client.indices.exists_alias(name=alias):
+            current: list[str] = list(client.indices.get_alias(name=alias))
+            actions.extend({"remove": {"index": name, "alias": alias}} for name in current)
+            previous.extend(current)
+        elif client.indices.exists(index=alias):
+            # A concrete index still holds the alias name; it has to go in the same request.
+            actions.append({"remove_index": {"index": alias}})
+    client.indices.update_aliases(actions=actions)
+    return previous
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the search indexes and swap them in atomically.")
+    parser.add_argument("--keep-old", action="store_true", help="keep the replaced indexes instead of deleting them")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(reindex(keep_old=args.keep_old))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,160 @@
+import json
 import logging
-import string
+import os
+import time
+from functools import partial
+from itertools import batched
 from pathlib import Path
-from typing import Any, Generator, List
+from threading import Lock
+from typing import Any, Generator, Iterable, List
 
+import billiard
 from app.core.config import settings
 from elasticsearch import Elasticsearch, NotFoundError, RequestError, helpers
+from pygit2 import Oid, Repository
 
-from . import utils
+from . import cache, queries, utils
 
 logger = logging.getLogger(__name__)
 
 
 class Search:
     _instance = None
+    _main_index_version: int = 2
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Search, cls).__new__(cls)
-            cls._instance._search = None
+            cls._instance._client = None
+            cls._instance._client_lock = Lock()
         return cls._instance
 
     def __init__(self):
         self._batch_size: int = 125
-        if self._search is None:
-            self._search = Elasticsearch(
-                [
-                    {
-                        "host": settings.ES_HOST,
-                        "port": settings.ES_REQUESTS_PORT,
-                        "scheme": settings.ES_SCHEME,
-                    }
-                ],
-                basic_auth=(settings.ELASTIC_USERNAME, settings.ELASTIC_PASSWORD),
-                ca_certs=str(utils.get_ca_cert_path()),
-            )
-            self._search.options(ignore_status=400)
-            self._create_index(settings.ES_INDEX)
-            self._create_index(settings.ES_SEGMENTS_INDEX)
-            self._populate_index(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX)
+
+    @property
+    def _search(self) -> Elasticsearch:
+        # Connecting on first use keeps imports and worker startup independent of the cluster.
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> Elasticsearch:
+        return Elasticsearch(
+            [
+                {
+                    "host": settings.ES_HOST,
+                    "port": settings.ES_REQUESTS_PORT,
+                    "scheme": settings.ES_SCHEME,
+                }
+            ],
+            basic_auth=(settings.ELASTIC_USERNAME, settings.ELASTIC_PASSWORD),
+            ca_certs=str(utils.get_ca_cert_path()),
+        )
+
+    def bootstrap(self) -> bool:
+        """
+        Create missing indexes and fill empty ones. Run once per deployment, see search.bootstrap.
+
+        Returns False while the main index is still being migrated; calling it again picks the
+        migration up where it is.
+        """
+        migrated: bool = self._create_main_index(settings.ES_INDEX)
+        self._create_index(settings.ES_SEGMENTS_INDEX)
+        self._populate_index(settings.ES_INDEX, settings.ES_SEGMENTS_INDEX)
+        return migrated
 
     def _create_index(self, index: str) -> None:
+        mapping = self._get_es_mappings("segments")
         if not self._index_exists(index):
-            mapping = self._get_es_mappings() if index == settings.ES_INDEX else self._get_es_mappings("segments")
             self._search.indices.create(
                 index=index,
                 settings=self._get_es_settings(),
                 mappings=mapping,
             )
+        else:
+            # Adding fields is allowed on a live index, so older indexes pick up new keyword fields here.
+            self._search.indices.put_mapping(index=index, properties=mapping["properties"])
+
+    def _create_main_index(self, alias: str) -> bool:
+        """
+        Serve the main index through an alias over a versioned index and return whether it is.
+
+        A main index that predates the alias is copied into the current version in a background
+        reindex task, which is recorded in the `_meta` of the versioned index. Each call checks on
+        that task without waiting for it: a finished copy replaces the old index by the alias in
+        one atomic swap, and a failed or lost one is started again.
+        """
+        mapping: dict[str, Any] = self._get_es_mappings()
+        if self._search.indices.exists_alias(name=alias):
+            self._search.indices.put_mapping(index=alias, properties=mapping["properties"])
+            return True
+        legacy_index: bool = self._index_exists(alias)
+        versioned_index: str = f"{alias}-v{self._main_index_version}"
+        try:
+            self._search.indices.create(
+                index=versioned_index,
+                settings=self._get_es_settings(),
+                mappings=mapping,
+                aliases={} if legacy_index else {alias: {}},
+            )
+        except RequestError as e:
+            if e.error != "resource_already_exists_exception":
+                raise
+        if not legacy_index:
+            return True
+        return self._migrate_main_index(alias, versioned_index)
+
+    def _migrate_main_index(self, legacy_index: str, versioned_index: str) -> bool:
+        mappings: dict[str, Any] = self._search.indices.get_mapping(index=versioned_index)[versioned_index]["mappings"]
+        task_id: str | None = mappings.get("_meta", {}).get("migration_task")
+        if task_id:
+            try:
+                status: dict[str, Any] | None = self._search.tasks.get(task_id=task_id)
+            except NotFoundError:
+                status = None
+            if status is not None and not status["completed"]:
+                logger.info("Migration of %s to %s is still running", legacy_index, versioned_index)
+                return False
+            if status is not None and not (status.get("error") or status.get("response", {}).get("failures")):
+                self._search.indices.update_aliases(
+                    actions=[
+                        {"add": {"index": versioned_index, "alias": legacy_index}},
+                        {"remove_index": {"index": legacy_index}},
+                    ]
+                )
+                logger.info("Migrated %s to %s", legacy_index, versioned_index)
+                return True
+            logger.warning("Migration of %s to %s failed, starting it again: %s", legacy_index, versioned_index, status)
+        # Writes that reach the legacy index while the reindex runs are not copied; the content
+        # hashes make the next sync of those files rewrite them in full.
+        task_id = self._search.reindex(
+            source={"index": legacy_index},
+            dest={"index": versioned_index},
+            script={
+                "lang": "painless",
+                "source": (
+                    "if (ctx._source.segments != null) {"
+                    "  List uids = new ArrayList();"
+                    "  for (def segment : ctx._source.segments) { uids.add(segment.uid); }"
+                    "  ctx._source.uids = uids;"
+                    "  ctx._source.segment_count = uids.size();"
+                    "  ctx._source.remove('segments');"
+                    "}"
+                ),
+            },
+            wait_for_completion=False,
+        )["task"]
+        self._search.indices.put_mapping(index=versioned_index, meta={"migration_task": task_id})
+        logger.info("Started migrating %s to %s in task %s", legacy_index, versioned_index, task_id)
+        return False
 
     def _populate_index(self, index: str, segments_index: str) -> None:
         if self._is_index_empty(index):
+            # Writes made meanwhile are only searchable after the slow refresh interval below.
+            cache.suspend(settings.SEARCH_BOOTSTRAP_LOCK_TIMEOUT)
             self._search.indices.put_settings(
                 index=index,
                 body={"index": {"refresh_interval": "180s", "number_of_replicas": 0}},
@@ -67,6 +172,8 @@ class Search:
                 index=segments_index,
                 body={"index": {"refresh_interval": "1s", "number_of_replicas": 1}},
             )
+            cache.suspend(settings.SEARCH_CACHE_SETTLE_SECONDS)
+            cache.bump_generation()
 
     def _get_es_settings(self) -> dict:
         return {
@@ -88,21 +195,12 @@ class Search:
                     "file_path": {"type": "keyword"},
                     "prefix": {"type": "keyword"},
                     "filename": {"type": "keyword"},
-                    "segments": {
-                        "type": "nested",
-                        "properties": {
-                            "uid": {"type": "keyword"},
-                            "segment": {
-                                "type": "text",
-                                "analyzer": "lowercase_analyzer",
-                                "search_analyzer": "lowercase_analyzer",
-                            },
-                            "muid": {"type": "keyword"},
-                        },
-                    },
+                    "uids": {"type": "keyword"},
+                    "segment_count": {"type": "integer"},
                     "muid": {"type": "keyword"},
                     "is_root": {"type": "boolean"},
                     "root_path": {"type": "keyword"},
+                    "content_hash": {"type": "keyword"},
                 }
             }
         elif _type == "segments":
@@ -120,22 +218,34 @@ class Search:
             }
         return mapping
 
-    def _yield_data(self, custom_file_paths: list[Path] = None) -> Generator[list, None, None]:
-        buffer: list = []
-        iterator = custom_file_paths if custom_file_paths else utils.yield_file_path(settings.WORK_DIR)
-        for file_path in iterator:
-            buffer.append(self._process_file(file_path))
-            if len(buffer) >= self._batch_size:
-                yield buffer
-                buffer = []
-        if buffer:
-            yield buffer
-
-    def _process_file(self, file_path: Path) -> dict[str, Any]:
+    def _yield_actions(
+        self, index: str, segments_index: str, paths: list[Path] | Generator = None
+    ) -> Generator[dict[str, Any], None, None]:
+        file_paths: Iterable[Path] = paths if paths else utils.yield_file_path(settings.WORK_DIR)
+        workers: int = self._get_index_workers()
+        if workers <= 1 or (isinstance(paths, list) and len(paths) < self._batch_size):
+            for file_path in file_paths:
+                yield from create_file_actions(file_path, index, segments_index)
+            return
+        # Parsing JSON and hashing ids is CPU bound, so it runs in a process pool while
+        # parallel_bulk keeps several requests in flight from the consuming threads. The pool is
+        # billiard's, which unlike multiprocessing may be started from a Celery prefork child.
+        create = partial(create_file_actions, index=index, segments_index=segments_index)
+        with billiard.Pool(processes=workers) as pool:
+            for batch in batched(file_paths, workers * self._batch_size):
+                for actions in pool.imap(create, batch, chunksize=self._batch_size):
+                    yield from actions
+
+    @staticmethod
+    def _get_index_workers() -> int:
+        return settings.ES_INDEX_WORKERS or os.cpu_count() or 1
+
+    @staticmethod
+    def _process_file(file_path: Path) -> dict[str, Any]:
         doc_id: str = utils.create_doc_id(file_path)
         prefix: str = utils.get_prefix(file_path)
         filename: str = utils.get_filename(file_path)
-        segments: list[dict[str, str]] = self._prepare_json_data(utils.get_json_data(file_path))
+        data: dict[str, str] = utils.get_json_data(file_path)
         muid: str = utils.get_muid(file_path)
         is_root: bool = utils.is_root(file_path)
         root_path: Path | None = utils.find_root_path(file_path)
@@ -145,51 +255,59 @@ class Search:
                 "file_path": str(file_path),
                 "prefix": prefix,
                 "filename": filename,
-                "segments": segments,
+                "uids": list(data),
+                "segment_count": len(data),
                 "muid": muid,
                 "is_root": is_root,
                 "root_path": str(root_path) if root_path else None,
+                "content_hash": utils.create_content_hash(data),
             },
+            # Only written to the segments index; the main document keeps the uids.
+            "segments": Search._prepare_json_data(data),
         }
 
-    def _prepare_json_data(self, data: dict[str, str]) -> List[dict[str, str]]:
+    @staticmethod
+    def _prepare_json_data(data: dict[str, str]) -> List[dict[str, str]]:
         return [{"uid": item, "segment": data[item]} for item in data]
 
+    @staticmethod
+    def _create_actions(document: dict[str, Any], index: str, segments_index: str) -> list[dict[str, Any]]:
+        source: dict[str, Any] = document["_source"]
+        file_path = Path(source["file_path"])
+        actions: list[dict[str, Any]] = [{"_index": index, "_id": document["_id"], "_source": {**source}}]
+        for item in document["segments"]:
+            actions.append(Search._create_segment_action(segments_index, file_path, document, item))
+        return actions
+
+    @staticmethod
+    def _create_segment_action(
+        segments_index: str, file_path: Path, document: dict[str, Any], item: dict[str, str]
+    ) -> dict[str, Any]:
+        return {
+            "_index": segments_index,
+            "_id": utils.create_doc_id(file_path, item["uid"]),
+            "_source": {
+                "main_doc_id": document["_id"],
+                "muid": document["_source"]["muid"],
+                "uid": item["uid"],
+                "segment": item["segment"],
+            },
+        }
+
     def _index_exists(self, index: str) -> bool:
         return self._search.indices.exists(index=index)
 
     def _is_index_empty(self, index: str) -> bool:
         return self._search.count(index=index)["count"] == 0
 
-    def _build_unique_query(self, field: str = None, prefix: str = None, size: int = 10000) -> dict[str, Any]:
-        query = {
-            "size": 0,
-            "aggs": {
-                "unique_data": {
-                    "terms": {
-                        "field": field,
-                        "size": size,
-                        "order": {
-                            "_key": "asc",
-                        },
-                    }
-                }
-            },
-        }
-        if prefix:
-            query["query"] = {"prefix": {field: prefix}}
-        return query
-
     def _scroll_search(self, query, index: str = settings.ES_INDEX) -> Generator:
-        scroll = "1m"
-        size = 1000
-        response = self._search.search(index=index, body=query, scroll=scroll, size=size)
+        response = self._search.search(index=index, body=query, scroll=queries.SCROLL, size=queries.SCROLL_SIZE)
         scroll_id = response.get("_scroll_id")
         try:
             hits = response.get("hits", {}).get("hits", [])
             while hits:
                 yield from hits
-                response = self._search.scroll(scroll_id=scroll_id, scroll=scroll)
+                response = self._search.scroll(scroll_id=scroll_id, scroll=queries.SCROLL)
                 scroll_id = response.get("_scroll_id", scroll_id)
                 hits = response.get("hits", {}).get("hits", [])
         finally:
@@ -200,10 +318,8 @@ class Search:
                     logger.debug("Failed to clear scroll context", exc_info=True)
 
     def find_unique_data(self, field: str = None, prefix: str = None, size: int = 10000) -> list[str]:
-        results = self._search.search(index=settings.ES_INDEX, body=self._build_unique_query(field, prefix, size=size))[
-            "aggregations"
-        ]["unique_data"]["buckets"]
-        return [result["key"] for result in results]
+        response = self._search.search(index=settings.ES_INDEX, body=queries.build_unique_query(field, prefix, size))
+        return queries.read_bucket_keys(response)
 
     def get_root_paths(self, text: str, field: str = "muid") -> set[str]:
         query = {"query": {"term": {field: text}}, "_source": ["root_path"]}
@@ -217,319 +333,182 @@ class Search:
         return root_paths
 
     def get_file_paths(self, muid: str, prefix: str = None, exact: bool = False, _type: str = "root_path") -> set[str]:
-        query = {
-            "query": {"bool": {"must": [{"term": {"muid": muid}}]}},
-            "_source": [_type],
-        }
+        query: dict[str, Any] = queries.build_file_paths_query(muid, prefix, exact, _type)
+        return {hit["_source"][_type] for hit in self._scroll_search(query) if hit["_source"][_type] is not None}
 
-        if prefix is not None and not exact:
-            query["query"]["bool"]["must"].append({"prefix": {"prefix": prefix}})
-        elif prefix is not None and exact:
-            query["query"]["bool"]["must"].append({"term": {"prefix": prefix}})
-
-        paths: set[str] = set()
-        for hit in self._scroll_search(query):
-            path = hit["_source"][_type]
-            if path is not None:
-                paths.add(path)
-
-        return paths
-
-    def get_file_paths_for_split_merge(self, muid: str, prefix: str = None, exact: bool = False, _type: str = "root_path") -> set[str]:
-        query = {
-            "query": {
-                "bool": {
-                    "must": [],
-                    "should": [
-                        {"term": {"muid": muid}}
-                    ]
-                }
-            },
-            "_source": [_type],
-        }
-        exact = True
-        if prefix is not None and not exact:
-            query["query"]["bool"]["must"].append({"prefix": {"prefix": prefix + '_'}})
-        elif prefix is not None and exact:
-            query["query"]["bool"]["must"].append({"term": {"prefix": prefix}})
-
-        paths: set[str] = set()
-        for hit in self._scroll_search(query):
-            path = hit["_source"][_type]
-            if path is not None:
-                paths.add(path)
-
-        return paths
+    def get_file_paths_for_split_merge(
+        self, muid: str, prefix: str = None, exact: bool = False, _type: str = "root_path"
+    ) -> set[str]:
+        query: dict[str, Any] = queries.build_split_merge_paths_query(muid, prefix, _type)
+        return {hit["_source"][_type] for hit in self._scroll_search(query) if hit["_source"][_type] is not None}
 
     def update_segments(self, file_path: Path, data: dict[str, str]) -> tuple[bool, Exception | None]:
+        doc_id: str = utils.create_doc_id(file_path)
+        segment_ids: dict[str, str] = {uid: utils.create_doc_id(file_path, uid) for uid in data}
+        main_source: list[str] | bool = False if settings.ES_SCRIPTED_SEGMENT_UPDATES else ["uids", "content_hash"]
+        docs: list[dict[str, Any]] = [{"_index": settings.ES_INDEX, "_id": doc_id, "_source": main_source}]
+        docs.extend(
+            {"_index": settings.ES_SEGMENTS_INDEX, "_id": segment_id, "_source": ["segment"]}
+            for segment_id in segment_ids.values()
+        )
         try:
-            self.update_segments_main_index(file_path, data)
-            self.update_segments_segments_index(file_path, data)
-        except (RequestError, NotFoundError) as e:
+            main_doc, *segment_docs = self._search.mget(docs=docs)["docs"]
+            actions: list[dict[str, Any]] = [
+                *self._create_main_update_actions(file_path, doc_id, main_doc, data),
+                *self._create_segment_update_actions(file_path, doc_id, segment_ids, segment_docs, data),
+            ]
+            if actions:
+                helpers.bulk(
+                    self._search,
+                    actions,
+                    chunk_size=len(actions),
+                    max_chunk_bytes=settings.ES_BULK_MAX_CHUNK_BYTES,
+                    raise_on_error=True,
+                )
+        except (RequestError, NotFoundError, helpers.BulkIndexError) as e:
             return False, e
+        finally:
+            cache.bump_generation()
         return True, None
 
-    def update_segments_main_index(self, file_path: Path, data: dict[str, str]) -> None:
-        doc_id: str = utils.create_doc_id(file_path)
-        doc: dict[str, Any] = self._search.get(index=settings.ES_INDEX, id=doc_id)["_source"]
-
-        segments_dict: dict[str, dict[str, str]] = {segment["uid"]: segment for segment in doc["segments"]}
-
-        for uid, new_segment in data.items():
-            if uid in segments_dict:
-                segments_dict[uid]["segment"] = new_segment
-            else:
-                segments_dict[uid] = {"uid": uid, "segment": new_segment}
-
-        doc["segments"] = list(segments_dict.values())
-        self._search.index(index=settings.ES_INDEX, id=doc_id, body=doc)
+    def _create_main_update_actions(
+        self, file_path: Path, doc_id: str, main_doc: dict[str, Any], data: dict[str, str]
+    ) -> list[dict[str, Any]]:
+        if not main_doc.get("found"):
+            document: dict[str, Any] = self._process_file(file_path)
+            segments: dict[str, str] = {item["uid"]: item["segment"] for item in document["segments"]}
+            segments.update(data)
+            source: dict[str, Any] = {
+                **document["_source"],
+                "uids": list(segments),
+                "segment_count": len(segments),
+                "content_hash": utils.create_content_hash(segments),
+            }
+            return [{"_index": settings.ES_INDEX, "_id": doc_id, "_source": source}]
+        # The hash is only known when data covers every uid of the file, which is what the editor
+        # sends; a partial save clears it so the next sync rewrites the file.
+        content_hash: str | None = utils.create_content_hash(data)
+        if settings.ES_SCRIPTED_SEGMENT_UPDATES:
+            return [
+                {
+                    "_op_type": "update",
+                    "_index": settings.ES_INDEX,
+                    "_id": doc_id,
+                    "script": {
+                        "source": (
+                            "boolean complete = params.uids.containsAll(ctx._source.uids);"
+                            "for (def uid : params.uids) {"
+                            "  if (!ctx._source.uids.contains(uid)) { ctx._source.uids.add(uid); }"
+                            "}"
+                            "ctx._source.segment_count = ctx._source.uids.size();"
+                            "ctx._source.content_hash = complete ? params.content_hash : null;"
+                        ),
+                        "params": {"uids": list(data), "content_hash": content_hash},
+                    },
+                }
+            ]
+        source = main_doc["_source"]
+        indexed_uids: list[str] = source.get("uids", [])
+        known_uids: set[str] = set(indexed_uids)
+        uids: list[str] = indexed_uids + [uid for uid in data if uid not in known_uids]
+        if not known_uids <= data.keys():
+            content_hash = None
+        if uids == indexed_uids and content_hash is not None and source.get("content_hash") == content_hash:
+            return []
+        return [
+            {
+                "_op_type": "update",
+                "_index": settings.ES_INDEX,
+                "_id": doc_id,
+                "doc": {"uids": uids, "segment_count": len(uids), "content_hash": content_hash},
+            }
+        ]
 
-    def update_segments_segments_index(self, file_path: Path, data: dict[str, str]) -> None:
-        uids: list[str] = list(data.keys())
-        doc_ids: list[str] = [utils.create_doc_id(file_path, uid) for uid in uids]
-        for uid, doc_id in zip(uids, doc_ids):
-            try:
-                doc: dict[str, Any] = self._search.get(index=settings.ES_SEGMENTS_INDEX, id=doc_id)["_source"]
-            except NotFoundError:
-                doc: dict[str, Any] = {
-                    "main_doc_id": utils.create_doc_id(file_path),
-                    "muid": utils.get_muid(file_path),
-                    "uid": uid,
+    @staticmethod
+    def _create_segment_update_actions(
+        file_path: Path,
+        doc_id: str,
+        segment_ids: dict[str, str],
+        segment_docs: list[dict[str, Any]],
+        data: dict[str, str],
+    ) -> list[dict[str, Any]]:
+        muid: str = utils.get_muid(file_path)
+        actions: list[dict[str, Any]] = []
+        for (uid, segment_id), segment_doc in zip(segment_ids.items(), segment_docs):
+            if segment_doc.get("found") and segment_doc["_source"].get("segment") == data[uid]:
+                continue
+            actions.append(
+                {
+                    "_op_type": "update",
+                    "_index": settings.ES_SEGMENTS_INDEX,
+                    "_id": segment_id,
+                    "doc": {"segment": data[uid]},
+                    "upsert": {"main_doc_id": doc_id, "muid": muid, "uid": uid, "segment": data[uid]},
                 }
-            doc["segment"] = data[uid]
-            self._search.index(index=settings.ES_SEGMENTS_INDEX, id=doc_id, body=doc)
+            )
+        return actions
 
     def get_segments(self, size: int, page: int, muids: dict[str, str]) -> dict[str, dict[str, str]] | dict:
         from_: int = page * size
         uid: str | None = muids.pop("uid", None)
-        if uid:
-            if any(muids.values()):
-                return self._uid_muids_lookup(size, from_, uid, muids)
-            else:
-                return self._uid_lookup(size, from_, uid, muids)
-        if any(muids.values()):
-            return self._muids_lookup(size, from_, muids)
-        return {}
-
-    def _uid_lookup(self, size: int, from_: int, uid: str | None, muids: dict[str, str]) -> dict[str, dict[str, str]]:
-        body: dict[str, Any] = self._build_search_body(size, from_, muids, uid)
-        es_results: dict[str, Any] = self._search.search(
-            index=settings.ES_SEGMENTS_INDEX,
-            body=body,
-        )
-        return self._get_results(es_results)
-
-    def _muids_lookup(self, size: int, from_: int, muids: dict[str, str]) -> dict[str, dict[str, str]]:
-        body: dict[str, Any] = self._build_search_body(size, from_, muids)
-        es_results: dict[str, Any] = self._search.search(
-            index=settings.ES_SEGMENTS_INDEX,
-            body=body,
-        )
-        return self._sort_segments(self._get_segments_for_remaining_muids(self._get_results(es_results), muids))
-
-    def _uid_muids_lookup(
-        self, size: int, from_: int, uid: str | None, muids: dict[str, str]
-    ) -> dict[str, dict[str, str]]:
-        body: dict[str, Any] = self._build_search_body(size, from_, muids, uid)
-        es_results: dict[str, Any] = self._search.search(
-            index=settings.ES_SEGMENTS_INDEX,
-            body=body,
+        if not uid and not any(muids.values()):
+            return {}
+        body: dict[str, Any] = queries.build_search_body(size, from_, muids, uid)
+        results: dict[str, dict[str, str]] = queries.get_results(
+            self._search.search(index=settings.ES_SEGMENTS_INDEX, body=body)
         )
-        return self._sort_segments(self._get_segments_for_remaining_muids(self._get_results(es_results), muids))
-
-    def _build_search_body(
-        self,
-        size: int,
-        from_: int,
-        muids: dict[str, str],
-        uid: str | None = None,
-    ) -> dict[str, Any]:
-        if uid and not any(muids.values()):
-            doc_count = hits_size = len(muids)
-            body: dict[str, Any] = {
-                "query": {
-                    "bool": {
-                        "must": [
-                            {"bool": {"should": [{"terms": {"muid": [*muids.keys()]}}]}},
-                            {"prefix": {"uid": {"value": uid}}},
-                        ]
-                    }
-                }
-            }
-        else:
-            doc_count, hits_size = self._get_min_doc_count_and_hot_hits_size(muids)
-            body: dict[str, Any] = {
-                "query": {
-                    "bool": {"should": []},
-                }
-            }
-            for muid, lookup in muids.items():
-                body["query"]["bool"]["should"].append(
-                    {
-                        "bool": {
-                            "must": [
-                                {"term": {"muid": {"value": muid}}},
-                                {"match_phrase": {"segment": lookup}},
-                            ]
-                        }
-                    }
-                )
-                if uid:
-                    body["query"]["bool"]["should"][0]["bool"]["must"].append({"prefix": {"uid": {"value": uid}}})
-        body["aggs"] = self._build_aggs(doc_count, hits_size, size, from_)
-        body["size"] = 0
-        return body
-
-    def _get_min_doc_count_and_hot_hits_size(self, muids: dict[str, str]) -> tuple[int, int]:
-        doc_count: int = sum(1 for v in muids.values() if v != "")
-        hits_size: int = len(muids)
-        return doc_count, hits_size
-
-    def _build_aggs(self, doc_count: int, hits_size: int, size: int, from_: int) -> dict[str, Any]:
-        return {
-            "uids": {
-                "terms": {
-                    "field": "uid",
-                    "min_doc_count": doc_count,
-                    "size": 10000,
-                },
-                "aggs": {
-                    "top_uid_hits": {
-                        "top_hits": {
-                            "_source": {"includes": ["muid", "segment"]},
-                            "size": hits_size,
-                        }
-                    },
-                    "uids_bucket_sort": {"bucket_sort": {"sort": [], "from": from_, "size": size}},
-                },
-            }
-        }
-
-    def _get_results(self, es_results: dict[str, Any]) -> dict[str, dict[str, str]]:
-        results: dict[str, dict[str, str]] = {}
-        for data in es_results["aggregations"]["uids"]["buckets"]:
-            uid: str = data["key"]
-            results[uid]: dict[str, str] = {}
-            for hit in data["top_uid_hits"]["hits"]["hits"]:
-                source: dict[str, str] = hit["_source"]
-                results[uid][source["muid"]] = source["segment"]
-        return results
-
-    def _sort_segments(self, results: dict[str, dict[str, str]]) -> dict[str, dict[str, str]]:
-        return dict(sorted(results.items(), key=lambda item: len(item[1]), reverse=True))
+        if not any(muids.values()):
+            return results
+        return queries.sort_segments(self._get_segments_for_remaining_muids(results, muids))
 
     def _get_segments_for_remaining_muids(self, results, muids) -> dict[str, dict[str, str]]:
         if not results:
             return {}
-        uids: list[str] = list(results.keys())
-        muids_to_remove: list[str] = results[uids[0]].keys()
-        for muid in muids_to_remove:
-            del muids[muid]
-        missing_data: dict[str, dict[str, str]] = self._get_missing_data(uids, muids.keys())
-        data: dict[str, dict[str, str]] = {
-            uid: {**results.get(uid, {}), **missing_data.get(uid, {})} for uid in set(results) | set(missing_data)
-        }
-        return data
+        uids: list[str] = queries.pop_found_muids(results, muids)
+        return queries.merge_missing_data(results, self._get_missing_data(uids, muids.keys()))
 
     def _get_missing_data(self, uids, muids) -> dict[str, dict[str, str]]:
-        size: int = len(uids) * len(muids)
-        if size > 10000:
-            return self._get_missing_data_by_chunks(uids, muids)
-        body: dict[str, Any] = self._build_missing_data_body(uids, muids, size)
-        es_results: dict[str, Any] = self._search.search(index=settings.ES_SEGMENTS_INDEX, body=body)
-        results: dict[str, dict[str, str]] = {uid: {} for uid in uids}
-        if hits := es_results.get("hits").get("hits"):
-            for hit in hits:
-                if source := hit.get("_source"):
-                    results[source.get("uid")][source.get("muid")] = source.get("segment")
-        return results
-
-    def _get_missing_data_by_chunks(self, uids, muids) -> dict[str, dict[str, str]]:
-        chunk_size: int = 10000
         results: dict[str, dict[str, str]] = {uid: {} for uid in uids}
-        body: dict[str, Any] = self._build_missing_data_body(uids, muids, chunk_size)
-        body["sort"] = [{"uid": "asc"}, {"muid": "asc"}]
+        body, paged = queries.build_missing_data_body(uids, muids)
         while True:
-            es_results: dict[str, Any] = self._search.search(index=settings.ES_SEGMENTS_INDEX, body=body)
-
-            if not es_results.get("hits").get("hits"):
-                break
-
-            for hit in es_results.get("hits").get("hits"):
-                if source := hit.get("_source"):
-                    results[source.get("uid")][source.get("muid")] = source.get("segment")
-
-            last_hit: dict[str, Any] = es_results.get("hits").get("hits")[-1]
-            body["search_after"] = last_hit.get("sort")
-        return results
-
-    def _build_missing_data_body(self, uids, muids, size) -> dict[str, Any]:
-        return {
-            "size": size,
-            "query": {
-                "bool": {
-                    "must": [
-                        {"terms": {"uid": [*uids]}},
-                        {"bool": {"should": [{"terms": {"muid": [*muids]}}]}},
-                    ]
-                }
-            },
-        }
+            response: dict[str, Any] = self._search.search(index=settings.ES_SEGMENTS_INDEX, body=body)
+            hits: list[dict[str, Any]] = response["hits"]["hits"]
+            queries.read_missing_data(hits, results)
+            if not paged or not hits:
+                return results
+            body["search_after"] = hits[-1].get("sort")
 
     def _process_data(
         self, index: str, segments_index: str, paths: list[Path] | Generator = None, delete: bool = False
-    ):
+    ) -> int:
         if delete:
             self.delete_from_indexes(index, segments_index, paths)
-        else:
-            for data in self._yield_data(paths):
-                actions_main: list[dict[str, Any]] = []
-                actions_segments: list[dict[str, Any]] = []
-                for document in data:
-                    source: dict[str, Any] = document["_source"]
-                    main_doc = {
-                        "_index": index,
-                        "_id": document["_id"],
-                        "_source": {**source},
-                    }
-                    actions_main.append(main_doc)
-                    file_path = Path(source["file_path"])
-                    for item in source["segments"]:
-                        uid = item["uid"]
-                        segments_doc = {
-                            "_index": segments_index,
-                            "_id": utils.create_doc_id(file_path, uid),
-                            "_source": {
-                                "main_doc_id": document["_id"],
-                                "muid": source["muid"],
-                                "uid": uid,
-                                "segment": item["segment"],
-                            },
-                        }
-                        actions_segments.append(segments_doc)
-                helpers.bulk(
-                    self._search,
-                    actions_main,
-                    chunk_size=self._batch_size,
-                    raise_on_error=True,
-                )
-                helpers.bulk(
-                    self._search,
-                    actions_segments,
-                    chunk_size=self._batch_size,
-                    raise_on_error=True,
-                )
+            return 0
+        indexed: int = 0
+        start: float = time.perf_counter()
+        for success, _ in helpers.parallel_bulk(
+            self._search,
+            self._yield_actions(index, segments_index, paths),
+            thread_count=settings.ES_BULK_THREAD_COUNT,
+            chunk_size=settings.ES_BULK_CHUNK_SIZE,
+            max_chunk_bytes=settings.ES_BULK_MAX_CHUNK_BYTES,
+            raise_on_error=True,
+        ):
+            indexed += success
+        elapsed: float = time.perf_counter() - start
+        logger.info(
+            "Indexed %d documents into %s and %s in %.1fs (%.0f docs/s)",
+            indexed,
+            index,
+            segments_index,
+            elapsed,
+            indexed / elapsed if elapsed else 0,
+        )
+        return indexed
 
     def get_distinct_data(self, field: str, prefix: str = None, size: int = 10000) -> list[str]:
-        query: dict[str, Any] = self._build_unique_query(field=field, size=size)
-        query["query"] = {"term": {"prefix": {"value": prefix}}}
-        result: list[dict[str, Any]] = (
-            self._search.search(index=settings.ES_INDEX, body=query)
-            .get("aggregations")
-            .get("unique_data")
-            .get("buckets")
-        )
-        return [item["key"] for item in result]
+        response = self._search.search(index=settings.ES_INDEX, body=queries.build_distinct_query(field, prefix, size))
+        return queries.read_bucket_keys(response)
 
     def is_in_index(self, query: dict[str, Any]):
         result: list[dict[str, Any]] = self._search.search(index=settings.ES_INDEX, query=query).get("hits").get("hits")
@@ -549,7 +528,7 @@ class Search:
         except RequestError as e:
             return False, e
         segment_actions: list[dict[str, Any]] = []
-        for item in source["segments"]:
+        for item in data["segments"]:
             segments_doc = {
                 "_index": settings.ES_SEGMENTS_INDEX,
                 "_id": utils.create_doc_id(path, item["uid"]),
@@ -570,6 +549,8 @@ class Search:
             )
         except RequestError as e:
             return False, e
+        finally:
+            cache.bump_generation()
         return True, None
 
     def get_muids_by_prefix(self, prefix: str) -> set[str]:
@@ -592,16 +573,105 @@ class Search:
     def update_indexes(self, index, segments_index, paths: list[Path], delete: bool = False):
         if not paths:
             return
-        self._process_data(index, segments_index, paths, delete)
+        try:
+            self._process_data(index, segments_index, paths, delete)
+        finally:
+            cache.bump_generation()
 
     def delete_from_indexes(self, index, segments_index, paths: list[Path]):
         if not paths:
             return
-        for path in paths:
-            self._search.delete_by_query(index=index, body={"query": {"match": {"file_path": str(path)}}})
-            self._search.delete_by_query(
-                index=segments_index, body={"query": {"match": {"main_doc_id": utils.create_doc_id(path)}}}
+        doc_ids: list[str] = [utils.create_doc_id(path) for path in paths]
+        self._search.delete_by_query(index=index, body={"query": {"ids": {"values": doc_ids}}})
+        self._search.delete_by_query(index=segments_index, body={"query": {"terms": {"main_doc_id": doc_ids}}})
+
+    def sync_changes(self, index: str, segments_index: str, repo: Repository, changes: list[utils.FileChange]) -> int:
+        """
+        Bring both indexes in line with a git diff using a single bulk request.
+
+        Each main document stores a hash of the file it was built from. A file whose hash already
+        matches is skipped; when the index still holds the pre-diff blob, only the segments that
+        differ between the two blobs are written, otherwise the file's segments are replaced.
+
+        Files are indexed as they are in the working tree and only removed once they are gone from
+        it. A pull after a local commit diffs that commit with the remote, which reports files the
+        commit added as deleted while they are still on disk.
+        """
+        work_dir = Path(repo.workdir)
+        changes = [change for change in changes if utils.is_indexable(change.path, work_dir)]
+        if not changes:
+            return 0
+        doc_ids: list[str] = [utils.create_doc_id(change.path) for change in changes]
+        response: dict[str, Any] = self._search.mget(
+            index=index, ids=doc_ids, source_includes=["content_hash", "uids"]
+        )
+        indexed: dict[str, dict[str, Any]] = {
+            doc["_id"]: doc["_source"] for doc in response["docs"] if doc.get("found")
+        }
+
+        actions: list[dict[str, Any]] = []
+        for change, doc_id in zip(changes, doc_ids):
+            current: dict[str, Any] | None = indexed.get(doc_id)
+            indexed_uids: set[str] = set(current.get("uids", [])) if current else set()
+            old_data: dict[str, str] | None = self._read_blob(repo, change.old_oid)
+
+            if not change.path.exists():
+                if current:
+                    actions.append({"_op_type": "delete", "_index": index, "_id": doc_id})
+                stale_uids: set[str] = indexed_uids | set(old_data or {})
+                actions.extend(self._create_delete_actions(segments_index, change.path, stale_uids))
+                continue
+
+            document: dict[str, Any] = self._process_file(change.path)
+            indexed_hash: str | None = current.get("content_hash") if current else None
+            if indexed_hash == document["_source"]["content_hash"]:
+                continue
+            items: list[dict[str, str]] = document["segments"]
+            new_uids: set[str] = {item["uid"] for item in items}
+            if old_data is not None and indexed_hash == utils.create_content_hash(old_data):
+                changed_items = [item for item in items if old_data.get(item["uid"]) != item["segment"]]
+                stale_uids = set(old_data) - new_uids
+            else:
+                changed_items = items
+                stale_uids = indexed_uids - new_uids
+
+            actions.append({"_index": index, "_id": doc_id, "_source": document["_source"]})
+            actions.extend(
+                self._create_segment_action(segments_index, change.path, document, item) for item in changed_items
             )
+            actions.extend(self._create_delete_actions(segments_index, change.path, stale_uids))
+
+        if not actions:
+            return 0
+        try:
+            success, _ = helpers.bulk(
+                self._search,
+                actions,
+                chunk_size=len(actions),
+                max_chunk_bytes=settings.ES_BULK_MAX_CHUNK_BYTES,
+                raise_on_error=True,
+                ignore_status=(404,),
+            )
+        finally:
+            cache.bump_generation()
+        logger.info("Synced %d changed files with %d bulk actions", len(changes), len(actions))
+        return success
+
+    @staticmethod
+    def _create_delete_actions(segments_index: str, file_path: Path, uids: Iterable[str]) -> list[dict[str, Any]]:
+        return [
+            {"_op_type": "delete", "_index": segments_index, "_id": utils.create_doc_id(file_path, uid)} for uid in uids
+        ]
+
+    @staticmethod
+    def _read_blob(repo: Repository, oid: Oid | None) -> dict[str, str] | None:
+        if oid is None:
+            return None
+        try:
+            data = json.loads(repo[oid].data)
+        except (KeyError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
 
     def remove_segments(self, path: Path) -> tuple[bool, Exception | None]:
         doc_id: str = utils.create_doc_id(path)
@@ -614,6 +684,7 @@ class Search:
                     )
                 except NotFoundError:
                     pass
+                cache.bump_generation()
                 return True, None
             data = self._process_file(path)
             self._search.index(index=settings.ES_INDEX, id=doc_id, body=data["_source"])
@@ -624,7 +695,7 @@ class Search:
             except NotFoundError:
                 pass
             segment_actions: list[dict[str, Any]] = []
-            for item in data["_source"]["segments"]:
+            for item in data["segments"]:
                 segments_doc = {
                     "_index": settings.ES_SEGMENTS_INDEX,
                     "_id": utils.create_doc_id(path, item["uid"]),
@@ -645,81 +716,29 @@ class Search:
             return True, None
         except RequestError as e:
             return False, e
+        finally:
+            cache.bump_generation()
 
     def get_phrase_similar_segments(self, phrase_value: str, source_muid: str, size: int = 20) -> list[dict[str, str]]:
         if not phrase_value or not phrase_value.strip():
             return []
-
-        query = {
-            "query": {
-                "bool": {
-                    "must": [
-                        {
-                            "multi_match": {
-                                "query": phrase_value,
-                                "fields": ["segment"],
-                                "type": "best_fields",
-                                "fuzziness": "AUTO",
-                                "prefix_length": 2,
-                                "max_expansions": 15,
-                                "operator": "or",
-                            }
-                        },
-                        {"match": {"muid": source_muid}},
-                    ]
-                }
-            },
-            "_source": ["segment", "muid", "uid"],
-        }
-        response = self._search.search(index=settings.ES_SEGMENTS_INDEX, body=query, size=size)
-        return [hit["_source"] for hit in response["hits"]["hits"]]
+        query: dict[str, Any] = queries.build_phrase_similar_query(phrase_value, source_muid)
+        return queries.read_sources(self._search.search(index=settings.ES_SEGMENTS_INDEX, body=query, size=size))
 
     def get_segment_value_for_uids_and_muid(self, uids: list[str], muid: str, size: int = 250) -> list[dict]:
-        query = {
-            "query": {
-                "bool": {
-                    "must": [
-                        {"terms": {"uid": uids}},
-                        {"term": {"muid": muid}},
-                    ]
-                }
-            },
-            "_source": ["segment", "uid", "muid"],
-        }
-        response = self._search.search(index=settings.ES_SEGMENTS_INDEX, body=query, size=size)
-        return [hit["_source"] for hit in response["hits"]["hits"]]
-
-    @staticmethod
-    def aggregate_similar_segments(hits: list[dict]) -> list[dict]:
-        unique_segments_dict = {}
-        for hit in hits:
-            segment = hit["translation_hints"].lower()
-            segment = segment.translate(str.maketrans("", "", string.punctuation))
-            if segment not in unique_segments_dict:
-                unique_segments_dict[segment] = hit
-                unique_segments_dict[segment]["strength"] = 1
-            else:
-                unique_segments_dict[segment]["strength"] += 1
-        return list(unique_segments_dict.values())
-
-    @staticmethod
-    def merge_segments_with_translation_hints(similar_phrases: list[dict], translation_hints: list[dict]) -> list[dict]:
-        hints_by_uid: dict[str, list[dict]] = {}
-        for hint in translation_hints:
-            hints_by_uid.setdefault(hint["uid"], []).append(hint)
-        return [
-            {**phrase, "translation_hints": hint["segment"]}
-            for phrase in similar_phrases
-            for hint in hints_by_uid.get(phrase["uid"], [])
-        ]
+        query: dict[str, Any] = queries.build_segment_values_query(uids, muid)
+        return queries.read_sources(self._search.search(index=settings.ES_SEGMENTS_INDEX, body=query, size=size))
 
     def get_uids(self, muid: str, prefix: str) -> list[str]:
         query = {
             "query": {"bool": {"must": [{"match": {"muid": muid}}, {"match": {"prefix": prefix}}]}},
-            "_source": ["segments.uid"],
+            "_source": ["uids"],
         }
         uids = []
         for hit in self._scroll_search(query):
-            for seg in hit["_source"]["segments"]:
-                uids.append(seg["uid"])
+            uids.extend(hit["_source"].get("uids", []))
         return uids
+
+
+def create_file_actions(file_path: Path, index: str, segments_index: str) -> list[dict[str, Any]]:
+    return Search._create_actions(Search._process_file(file_path), index, segments_index)
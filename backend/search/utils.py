@@ -1,10 +1,27 @@
+import base64
+import binascii
 import hashlib
 import json
 import os
+from dataclasses import dataclass
 from pathlib import Path
+from threading import Lock
 from typing import Generator
 
 from app.core.config import settings
+from pygit2 import Oid
+
+_root_path_index: dict[str, Path] = {}
+_root_path_index_signature: tuple[int, int] | None = None
+_root_path_index_is_built: bool = False
+_root_path_index_lock = Lock()
+
+
+@dataclass(frozen=True)
+class FileChange:
+    path: Path
+    old_oid: Oid | None
+    new_oid: Oid | None
 
 
 def get_ca_cert_path() -> Path:
@@ -35,13 +52,55 @@ def is_root(file_path: Path) -> bool:
 def find_root_path(file_path: Path) -> Path | None:
     if is_root(file_path):
         return file_path
+    return _lookup_root_path(get_prefix(file_path))
+
 
-    prefix: str = f"{get_prefix(file_path)}_"
-    for path in yield_file_path(settings.WORK_DIR / "root", level=1):
-        if path.stem.startswith(prefix):
-            return path
+def invalidate_root_path_index() -> None:
+    """Force the next root path lookup to rescan the root directory."""
+    global _root_path_index_is_built
+    with _root_path_index_lock:
+        _root_path_index_is_built = False
 
-    return None
+
+def get_work_dir_signature() -> tuple[int, int] | None:
+    """
+    Return a cheap fingerprint of the working tree state.
+
+    Every commit, pull and checkout rewrites the git index of the unpublished checkout, so its
+    mtime and size change whenever files may have been added or removed, in any process.
+    """
+    try:
+        stat = (settings.WORK_DIR / ".git" / "index").stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _build_root_path_index() -> dict[str, Path]:
+    root_dir: Path = settings.WORK_DIR / "root"
+    index: dict[str, Path] = {}
+    if not root_dir.is_dir():
+        return index
+    for path in yield_file_path(root_dir, level=1):
+        index.setdefault(get_prefix(path), path)
+    return index
+
+
+def _lookup_root_path(prefix: str) -> Path | None:
+    global _root_path_index, _root_path_index_signature, _root_path_index_is_built
+    with _root_path_index_lock:
+        signature = get_work_dir_signature()
+        if _root_path_index_is_built:
+            path: Path | None = _root_path_index.get(prefix)
+            if path is not None and path.exists():
+                return path
+            # A miss is only worth a rescan if files may have been added since the last build.
+            if path is None and signature == _root_path_index_signature:
+                return None
+        _root_path_index = _build_root_path_index()
+        _root_path_index_signature = signature
+        _root_path_index_is_built = True
+        return _root_path_index.get(prefix)
 
 
 def get_muid(file_path: Path) -> str:
@@ -70,7 +129,37 @@ def yield_file_path(work_dir: Path, level: int = 0) -> Generator[Path, None, Non
             yield full_path
 
 
+def create_content_hash(data: dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def is_indexable(file_path: Path, work_dir: Path) -> bool:
+    """Mirror the filter applied by yield_file_path, for paths that come from a git diff."""
+    try:
+        parts: tuple[str, ...] = file_path.relative_to(work_dir).parts
+    except ValueError:
+        return False
+    return len(parts) > 1 and file_path.suffix == ".json" and not any(part.startswith(".") for part in parts)
+
+
 def create_doc_id(file_path: Path, uid: str | None = None) -> str:
     if uid is not None:
         return hashlib.sha256((str(file_path) + uid).encode()).hexdigest()
     return hashlib.sha256(str(file_path).encode()).hexdigest()
+
+
+def encode_cursor(key: dict[str, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> dict[str, str] | None:
+    """Turn a `next` token back into a composite aggregation key. An empty token starts from the beginning."""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if not isinstance(key, dict) or not isinstance(key.get("uid"), str):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return {"uid": key["uid"]}
@@ -7,6 +7,8 @@ function tree() {
         directoryCache: new Map(),
         cacheTTL: 5 * 60 * 1000,
         maxCacheEntries: 200,
+        progressPollInterval: 5 * 1000,
+        progressPolls: new Map(),
         // Publish Modal State
         showPublishModal: false,
         publishingFile: null,
@@ -249,25 +251,53 @@ function tree() {
                 element.add(new Element(directory, base, false, false));
             }
 
-            const progressMap = {};
-            if (files_with_progress) {
-                for (const fp of files_with_progress) {
-                    progressMap[fp.name] = fp;
-                }
-            }
-
+            const progressMap = this.getProgressMap(files_with_progress);
             for (const file of files) {
                 const fileElement = new Element(file, base, false, true);
-
-                const progressData = progressMap[file];
-                if (progressData) {
-                    fileElement.progress = progressData.progress;
-                    fileElement.totalKeys = progressData.total_keys || 0;
-                    fileElement.translatedKeys = progressData.translated_keys || 0;
-                }
-
+                this.applyProgress(fileElement, progressMap[file]);
                 element.add(fileElement);
             }
+            this.pollPendingProgress(element);
+        },
+        getProgressMap(filesWithProgress) {
+            const progressMap = {};
+            for (const fp of filesWithProgress || []) {
+                progressMap[fp.name] = fp;
+            }
+            return progressMap;
+        },
+        applyProgress(fileElement, progressData) {
+            if (!progressData) return;
+            fileElement.pending = Boolean(progressData.pending);
+            fileElement.progress = progressData.pending ? null : progressData.progress;
+            fileElement.totalKeys = progressData.total_keys || 0;
+            fileElement.translatedKeys = progressData.translated_keys || 0;
+        },
+        pollPendingProgress(element) {
+            // Files without stored progress are computed by a background job; re-fetch the
+            // listing until it has them, updating only the progress so open subdirectories stay.
+            const fullName = element.fullName;
+            if (this.progressPolls.has(fullName) || !element.children.some(child => child.pending)) {
+                return;
+            }
+            const timeoutId = setTimeout(async () => {
+                this.progressPolls.delete(fullName);
+                const target = this.getElementByName(fullName);
+                if (!target || !target.isOpen) return;
+                try {
+                    const data = await this.fetchDirectoryData(fullName, { force: true });
+                    const progressMap = this.getProgressMap(data.files_with_progress);
+                    for (const child of target.children) {
+                        if (child.isFile) {
+                            this.applyProgress(child, progressMap[child.name]);
+                        }
+                    }
+                } catch (error) {
+                    console.error(`Progress refresh failed for ${fullName}:`, error);
+                }
+                this.pollPendingProgress(target);
+            }, this.progressPollInterval);
+            this.progressPolls.set(fullName, timeoutId);
         },
         async addData(element, { force = false } = {}) {
             const data = await this.fetchDirectoryData(element.fullName, { force });
@@ -338,7 +368,11 @@ function tree() {
                 </a>`;
 
             const isTranslationFile = element.fullName && element.fullName.startsWith('translation/');
-            if (element.isFile && isTranslationFile && element.progress !== null && element.progress >= 0) {
+            if (element.isFile && isTranslationFile && element.pending) {
+                result += `<span class="translation-progress pending" title="Calculating translation progress">
+                    <span class="progress-text">…</span>
+                </span>`;
+            } else if (element.isFile && isTranslationFile && element.progress !== null && element.progress >= 0) {
                 const progressClass = element.progress >= 90 ? 'high' : (element.progress >= 50 ? 'medium' : 'low');
                 result += `<span class="translation-progress ${progressClass}" title="${element.progress}% translated (${element.translatedKeys}/${element.totalKeys})">
                     <span class="progress-bar" style="width: ${element.progress}%"></span>
@@ -652,6 +686,7 @@ class Element {
         this.prefix = this.isFile ? getPrefix(this.name) : null;
         this.children = [];
         this.progress = null;  // null = loading, -1 = error, 0-100 = actual progress
+        this.pending = false;  // Progress is being computed in the background
         this.totalKeys = 0;
         this.translatedKeys = 0;
         this.loading = false;  // Node loading state